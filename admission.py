@@ -0,0 +1,276 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """Request refused; retry_after is a hint in seconds for the Retry-After header"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `burst` stored"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume a token; returns 0 on success or seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Ticket:
+    """A request's place in line; granted once it holds a concurrency slot"""
+
+    def __init__(self, controller: "AdmissionController", client_id: str):
+        self.controller = controller
+        self.client_id = client_id
+        self.granted = False
+        self.released = False
+        self.enqueued_at = time.monotonic()
+        # Background tickets only: called (without locks held) when the slot is taken back
+        self.on_preempt: Optional[Callable[[], None]] = None
+        self.preempted = False
+
+    @property
+    def position(self) -> int:
+        """1-based queue position, 0 once admitted"""
+        return self.controller.position(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until admitted or timeout; returns whether the slot was granted"""
+        return self.controller.wait(self, timeout)
+
+    def release(self):
+        self.controller.release(self)
+
+
+class AdmissionController:
+    """
+    Global concurrency cap with a bounded FIFO wait queue and per-client token
+    buckets in front of /generate.
+
+    The cap follows live latency with AIMD: when the smoothed time-to-first-
+    token exceeds the target the cap shrinks multiplicatively, otherwise it
+    grows by one slot per `cap` samples. The queue bound follows from Little's
+    law, sized so a queued request waits at most about `max_wait` seconds.
+
+    Background work (speculative generation) only takes spare slots, always
+    leaving one free, and is preempted when a regular request would queue.
+    """
+
+    def __init__(self, max_concurrent: int = 8, min_concurrent: int = 2, max_limit: int = 32,
+                 max_wait: float = 60.0, min_queue: int = 4, client_rate: float = 0.1,
+                 client_burst: float = 3, target_latency: float = 3.0):
+        self.limit = max_concurrent
+        self.min_limit = min_concurrent
+        self.max_limit = max_limit
+        self.max_wait = max_wait
+        self.min_queue = min_queue
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.target_latency = target_latency
+
+        self.active = 0
+        self.queue: deque = deque()
+        self.background: deque = deque()  # Preemptible granted tickets, oldest first
+        self.preempted = 0
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.condition = threading.Condition()
+
+        self.latency_ewma: Optional[float] = None
+        self.service_time_ewma = 30.0  # Seconds per lesson until measured
+        self.samples_since_increase = 0
+        self.rejected = 0
+
+    @property
+    def max_queue(self) -> int:
+        # Little's law: queued requests drain at limit / service_time per second
+        return max(self.min_queue, int(self.max_wait * self.limit / self.service_time_ewma))
+
+    def _estimated_wait(self, queued: int) -> float:
+        return (queued + 1) * self.service_time_ewma / max(1, self.limit)
+
+    def enter(self, client_id: str) -> Ticket:
+        """Admit or enqueue a request; raises AdmissionRejected when rate-limited or full"""
+        with self.condition:
+            ticket, victim = self._enter(client_id)
+        if victim is not None:
+            victim.on_preempt()  # Outside the lock: it stops the speculative job
+        return ticket
+
+    def charge(self, client_id: str):
+        """Take a token from the client's bucket for work served without a new ticket"""
+        with self.condition:
+            self._take_token(client_id)
+
+    def _take_token(self, client_id: str) -> TokenBucket:
+        """Charge the client's bucket under the lock; raises AdmissionRejected when it is empty"""
+        bucket = self.buckets.get(client_id)
+        if bucket is None:
+            bucket = self.buckets[client_id] = TokenBucket(self.client_rate, self.client_burst)
+            if len(self.buckets) > 10000:
+                self._prune_buckets()
+        wait_for_token = bucket.take()
+        if wait_for_token:
+            self.rejected += 1
+            raise AdmissionRejected("rate_limited", wait_for_token)
+        return bucket
+
+    def _enter(self, client_id: str):
+        """enter() under the lock; returns (ticket, preempted background ticket or None)"""
+        bucket = self._take_token(client_id)
+        ticket = Ticket(self, client_id)
+        if self.active < self.limit and not self.queue:
+            self.active += 1
+            ticket.granted = True
+            return ticket, None
+        if self.background:
+            # Hand a speculative request's slot to this one
+            victim = self.background.popleft()
+            victim.preempted = victim.released = True
+            self.preempted += 1
+            ticket.granted = True
+            return ticket, victim
+        if len(self.queue) >= self.max_queue:
+            self.rejected += 1
+            bucket.tokens = min(bucket.burst, bucket.tokens + 1)  # Do not charge refused requests
+            raise AdmissionRejected("queue_full", self._estimated_wait(len(self.queue)))
+        self.queue.append(ticket)
+        return ticket, None
+
+    def try_enter_background(self, client_id: str, on_preempt: Callable[[], None]) -> Optional[Ticket]:
+        """
+        A preemptible slot for a client's low-priority work if one is spare,
+        else None (never queued). Charged to the client's bucket like enter(),
+        raising AdmissionRejected when it is empty.
+        """
+        with self.condition:
+            if self.queue or self.active >= self.limit - 1:
+                return None
+            self._take_token(client_id)
+            ticket = Ticket(self, client_id)
+            ticket.granted = True
+            ticket.on_preempt = on_preempt
+            self.active += 1
+            self.background.append(ticket)
+            return ticket
+
+    def promote(self, ticket: Ticket) -> bool:
+        """Make a background ticket a regular one; False if it was preempted or released"""
+        with self.condition:
+            if ticket.released:
+                return False
+            try:
+                self.background.remove(ticket)
+            except ValueError:
+                pass
+            ticket.on_preempt = None
+            return True
+
+    def _prune_buckets(self):
+        now = time.monotonic()
+        for client_id, bucket in list(self.buckets.items()):
+            if bucket.tokens + (now - bucket.updated) * bucket.rate >= bucket.burst:
+                del self.buckets[client_id]
+
+    def _grant_waiting(self):
+        while self.queue and self.active < self.limit:
+            ticket = self.queue.popleft()
+            ticket.granted = True
+            self.active += 1
+        self.condition.notify_all()
+
+    def position(self, ticket: Ticket) -> int:
+        with self.condition:
+            if ticket.granted:
+                return 0
+            try:
+                return self.queue.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def wait(self, ticket: Ticket, timeout: Optional[float] = None) -> bool:
+        with self.condition:
+            if not ticket.granted:
+                self.condition.wait_for(lambda: ticket.granted, timeout)
+            return ticket.granted
+
+    def release(self, ticket: Ticket):
+        """Give back the slot (or leave the queue); safe to call more than once"""
+        with self.condition:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket.granted:
+                self.active -= 1
+                if ticket.on_preempt is not None:
+                    try:
+                        self.background.remove(ticket)
+                    except ValueError:
+                        pass
+            else:
+                try:
+                    self.queue.remove(ticket)
+                except ValueError:
+                    pass
+            self._grant_waiting()
+
+    def record_latency(self, seconds: float):
+        """Feed a time-to-first-token sample into the AIMD controller"""
+        with self.condition:
+            self.latency_ewma = seconds if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * seconds
+            if self.latency_ewma > self.target_latency:
+                self.limit = max(self.min_limit, int(self.limit * 0.8))
+                self.samples_since_increase = 0
+            else:
+                self.samples_since_increase += 1
+                if self.samples_since_increase >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self.samples_since_increase = 0
+                    self._grant_waiting()
+
+    def record_service_time(self, seconds: float):
+        """Feed a full request duration, used to size the queue and Retry-After"""
+        with self.condition:
+            self.service_time_ewma = 0.8 * self.service_time_ewma + 0.2 * seconds
+
+    def status(self) -> Dict:
+        with self.condition:
+            return {
+                "limit": self.limit,
+                "active": self.active,
+                "queued": len(self.queue),
+                "max_queue": self.max_queue,
+                "latency_ewma": self.latency_ewma,
+                "service_time_ewma": self.service_time_ewma,
+                "rejected": self.rejected,
+                "background": len(self.background),
+                "preempted": self.preempted,
+            }
+
+
+# Global controller instance, tunable from the environment
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "8")),
+    max_limit=int(os.getenv("ADMISSION_MAX_LIMIT", "32")),
+    max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "60")),
+    client_rate=float(os.getenv("ADMISSION_CLIENT_RATE", "0.1")),
+    client_burst=float(os.getenv("ADMISSION_CLIENT_BURST", "3")),
+    target_latency=float(os.getenv("ADMISSION_TARGET_TTFT", "3.0")),
+)
@@ -2,7 +2,7 @@ import time
 import random
 import threading
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import json
 
 class AgenticLogger:
@@ -14,8 +14,15 @@ class AgenticLogger:
     def __init__(self):
         self.logs: List[Dict[str, Any]] = []
         self.lock = threading.Lock()
+        # Signalled on every new entry and on clear, for live log streams
+        self.changed = threading.Condition(self.lock)
         self.session_start = time.time()
         
+        # Monotonic sequence numbers (never reset, also not by clear_logs), so
+        # clients can page and stream with "entries after seq N" cursors
+        self.next_seq = 1
+        self.cleared_seq = 0  # Last seq at the most recent clear
+        
         # Simulate local model stats
         self.model_name = "Ogrenix-Gemma-2-9B"
         self.base_tps = random.uniform(12.5, 18.3)  # Base tokens per second
@@ -44,11 +51,14 @@ class AgenticLogger:
         """Internal logging method"""
         with self.lock:
             log_entry = {
+                "seq": self.next_seq,
                 "timestamp": self._generate_timestamp(),
                 "message": message,
                 "details": details or {}
             }
             self.logs.append(log_entry)
+            self.next_seq += 1
+            self.changed.notify_all()
             
             # Print to console for real-time visibility
             print(f"[{log_entry['timestamp']}] {message}")
@@ -107,6 +117,27 @@ Toplam Uzunluk: {prompt_length}""",
             "İçerik üretimi tamamlandı"
         )
     
+    def log_outline(self, title: str, headings: list, parallel: int):
+        """Log the outline of a lesson generated section by section"""
+        self._log_event(
+            "Ders planı hazırlandı, bölümler paralel üretiliyor",
+            {
+                "başlık": title,
+                "bölümler": headings,
+                "eşzamanlı": parallel
+            }
+        )
+    
+    def log_client_disconnect(self, received_chars: int, cancelled_charts: int):
+        """Log a client leaving before its lesson was complete"""
+        self._log_event(
+            "İstemci bağlantısı kesildi, üretim durduruldu",
+            {
+                "alınan_karakter": received_chars,
+                "iptal_edilen_grafik": cancelled_charts
+            }
+        )
+    
     def log_error(self, error_type: str, error_message: str, context: str = None):
         """Log errors during generation"""
         self._log_event(
@@ -157,6 +188,33 @@ Toplam Uzunluk: {prompt_length}""",
         with self.lock:
             return self.logs[-count:] if len(self.logs) >= count else self.logs
     
+    def get_logs_since(self, seq: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Entries with a sequence number above seq, oldest first"""
+        with self.lock:
+            return self._logs_since(seq, limit)
+    
+    def _logs_since(self, seq: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        if not self.logs:
+            return []
+        # Sequence numbers in self.logs are consecutive
+        start = max(0, seq - self.logs[0]["seq"] + 1)
+        end = len(self.logs) if limit is None else start + limit
+        return self.logs[start:end]
+    
+    def wait_for_logs(self, seq: int, timeout: float, limit: Optional[int] = None):
+        """Block until there are entries after seq, the logs are cleared or timeout passes.
+        
+        Returns (entries after seq, seq of the most recent clear).
+        """
+        with self.changed:
+            self.changed.wait_for(lambda: self.next_seq - 1 > seq or self.cleared_seq > seq, timeout)
+            return self._logs_since(seq, limit), self.cleared_seq
+    
+    @property
+    def last_seq(self) -> int:
+        with self.lock:
+            return self.next_seq - 1
+    
     def start_new_session(self):
         """Start a new session - clear deduplication but keep logs visible"""
         with self.lock:
@@ -172,6 +230,8 @@ Toplam Uzunluk: {prompt_length}""",
             self.total_tokens_generated = 0
             self.logged_code_hashes.clear()  # Clear deduplication tracking
             self.last_stream_log_time = 0.0
+            self.cleared_seq = self.next_seq - 1
+            self.changed.notify_all()
 
 # Global logger instance
 agentic_logger = AgenticLogger()
@@ -0,0 +1,912 @@
+from startup import startup
+from flask import Flask, render_template, request, jsonify, Response, abort
+from markupsafe import escape
+from prompts import build_answer_messages, build_outline_messages, build_section_messages, messages_length
+from generate_html import generate_html, generate_html_streaming, generate_html_shell, iter_chart_blocks, submit_chart, cancel_chart, chart_element_id, get_cached_chart
+from agentic_logger import agentic_logger
+from response_cache import response_cache, lesson_id
+from lesson_export import export_lesson, export_lessons
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.utils import secure_filename
+from llm_router import build_router, UpstreamAbort
+from admission import admission, AdmissionRejected
+from jobs import generation_jobs
+from speculation import speculations
+from sections import parse_outline, stitch_sections, SECTION_PARALLELISM
+from sse_compression import negotiate_encoding, compress_events
+import argparse
+import json
+from functools import partial
+import threading
+import time
+import os
+
+# Backend router shared by all requests; OGRENIX_MODE selects "cloud" (OpenRouter)
+# or "local" (vLLM replicas with cloud fallback)
+router = build_router(os.getenv("OGRENIX_MODE", "cloud"))
+
+DEFAULT_PORTS = {"cloud": 5002, "local": 5001}
+
+# Raw text deltas are batched into one `chunk` event per interval or size
+CHUNK_FLUSH_MS = float(os.getenv("CHUNK_FLUSH_MS", "100"))
+CHUNK_FLUSH_CHARS = int(os.getenv("CHUNK_FLUSH_CHARS", "1024"))
+
+# Reverse proxies in front of the app (e.g. 1 behind ngrok); only then is
+# X-Forwarded-For trusted for the client address used by rate limiting
+ADMISSION_TRUSTED_PROXIES = int(os.getenv("ADMISSION_TRUSTED_PROXIES", "0"))
+
+# Idle /logs/stream connections get a comment line this often
+LOG_STREAM_KEEPALIVE_S = 15
+
+# Outline first, then the sections as parallel streams ("sections" in the request overrides)
+LESSON_SECTIONS = os.getenv("LESSON_SECTIONS", "0") == "1"
+OUTLINE_MAX_TOKENS = 600
+
+def configure_router(mode):
+    """Replace the backend router, e.g. when an entry point selects a mode"""
+    global router
+    router.stop_health_checks()
+    router = build_router(mode)
+    return router
+
+def llm_stream(messages, max_tokens=10000, prefix="", capped=False, on_finish=None, abort=None):
+    """
+    Stream LLM response from the best available backend, continuing after
+    `prefix` if given. max_tokens is only sent upstream when `capped`;
+    `abort` (an UpstreamAbort) stops it from another thread.
+    """
+    # Start new session to clear deduplication tracking
+    agentic_logger.start_new_session()
+    
+    # Log model initialization (simulating local model)
+    agentic_logger.log_model_init()
+    
+    # Extract topic from prompt for logging
+    prompt = messages[-1]["content"]
+    prompt_length = messages_length(messages)
+    topic = prompt.split("QUESTION/TOPIC:")[1].split("```")[1].strip() if "QUESTION/TOPIC:" in prompt else "Genel Konu"
+    agentic_logger.log_prompt_analysis(prompt_length, topic[:50])
+    
+    # Estimate tokens and start generation logging
+    estimated_tokens = prompt_length // 4 + max_tokens // 2
+    agentic_logger.log_content_generation_start(estimated_tokens)
+    
+    chunk_count = 0
+    start_time = time.time()
+    
+    router_kwargs = {"max_tokens": max_tokens} if capped else {}
+    upstream = router.stream(messages, prefix=prefix, on_finish=on_finish, abort=abort, **router_kwargs)
+    try:
+        for content in upstream:
+            chunk_count += 1
+            
+            # Log streaming chunks periodically
+            agentic_logger.log_content_chunk(content, chunk_count)
+            
+            yield content
+    finally:
+        # Closes the upstream HTTP stream right away when our caller stops early
+        upstream.close()
+    
+    # Log completion
+    total_time = time.time() - start_time
+    final_tokens = chunk_count * 10  # Rough estimation
+    agentic_logger.log_generation_complete(total_time, final_tokens)
+
+def speculative_llm_stream(messages, speculation, abort=None):
+    """
+    LLM stream of a speculative job: capped at speculation.max_tokens until
+    the user submits the question. A stream that hit the cap waits for that
+    and then continues where it stopped.
+    """
+    if speculation.cancelled:
+        return
+    finish_reasons = []
+    text = ""
+    capped = not speculation.promoted
+    llm_kwargs = {"max_tokens": speculation.max_tokens, "capped": True} if capped else {}
+    for content in llm_stream(messages, on_finish=finish_reasons.append, abort=abort, **llm_kwargs):
+        text += content
+        yield content
+    if not capped or finish_reasons[-1:] != ["length"]:
+        return  # The whole lesson fit under the cap
+    speculation.wait_for_promotion()
+    yield from llm_stream(messages, prefix=text, abort=abort)
+
+def sectioned_llm_stream(question, abort=None):
+    """
+    LLM stream of a lesson generated outline first: a short outline request,
+    then one stream per section, run concurrently and stitched in order.
+    Falls back to a single stream when the outline cannot be parsed.
+    """
+    outline_text = "".join(llm_stream(build_outline_messages(question), max_tokens=OUTLINE_MAX_TOKENS,
+                                      capped=True, abort=abort))
+    outline = parse_outline(outline_text)
+    if outline is None:
+        yield from llm_stream(build_answer_messages(question), abort=abort)
+        return
+    agentic_logger.log_outline(outline["title"], [section["heading"] for section in outline["sections"]],
+                               min(SECTION_PARALLELISM, len(outline["sections"])))
+    openers = [partial(router.stream, build_section_messages(question, outline, index), abort=abort)
+               for index in range(len(outline["sections"]))]
+    yield "```md\n" + (f"# {outline['title']}\n\n" if outline["title"] else "")
+    yield from stitch_sections(openers)
+    yield "\n```"
+
+def llm(messages, max_tokens=10000, capped=False, on_usage=None):
+    """
+    Non-streaming version for backwards compatibility. max_tokens is only
+    sent upstream when `capped`; `on_usage` receives the reported token usage.
+    """
+    # Start new session to clear deduplication tracking
+    agentic_logger.start_new_session()
+    
+    # Log model initialization (simulating local model)
+    agentic_logger.log_model_init()
+    
+    # Extract topic from prompt for logging
+    prompt = messages[-1]["content"]
+    prompt_length = messages_length(messages)
+    topic = prompt.split("QUESTION/TOPIC:")[1].split("```")[1].strip() if "QUESTION/TOPIC:" in prompt else "Genel Konu"
+    agentic_logger.log_prompt_analysis(prompt_length, topic[:50])
+    
+    # Estimate tokens and start generation logging
+    estimated_tokens = prompt_length // 4 + max_tokens // 2
+    agentic_logger.log_content_generation_start(estimated_tokens)
+    
+    start_time = time.time()
+    
+    router_kwargs = {"max_tokens": max_tokens} if capped else {}
+    response = router.complete(messages, on_usage=on_usage, **router_kwargs)
+    
+    # Log completion
+    total_time = time.time() - start_time
+    final_tokens = len(response) // 4  # Rough estimation
+    agentic_logger.log_generation_complete(total_time, final_tokens)
+    
+    return response
+
+app = Flask(__name__)
+if ADMISSION_TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=ADMISSION_TRUSTED_PROXIES)
+
+@app.route("/")
+def index():
+    return render_template("index.html")
+
+@app.route("/logs")
+def view_logs():
+    """Display agent logs for demonstration purposes"""
+    logs = agentic_logger.get_recent_logs(50)  # Get last 50 logs
+    # New entries are pushed over /logs/stream from the last one shown
+    cursor = logs[-1]['seq'] if logs else agentic_logger.last_seq
+    
+    # Format logs for display
+    formatted_logs = []
+    for log in logs:
+        formatted_log = {
+            'timestamp': log['timestamp'],
+            'level': log.get('level', ''),
+            'message': escape(log['message']),
+            'details': {key: escape(value) for key, value in log.get('details', {}).items()}
+        }
+        formatted_logs.append(formatted_log)
+    
+    # Create a simple HTML page to display logs
+    html_content = '''
+<!DOCTYPE html>
+<html lang="tr">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>AI Agent Logları - Teknofest Demo</title>
+    <style>
+        body { 
+            font-family: 'Courier New', monospace; 
+            background: #1a1a1a; 
+            color: #00ff41; 
+            padding: 20px; 
+            margin: 0;
+        }
+        .container { max-width: 1200px; margin: 0 auto; }
+        .header { 
+            border-bottom: 2px solid #00ff41; 
+            padding-bottom: 10px; 
+            margin-bottom: 20px; 
+        }
+        .log-entry { 
+            margin: 10px 0; 
+            padding: 8px; 
+            border-left: 3px solid #00ff41; 
+            background: rgba(0, 255, 65, 0.1); 
+        }
+        .timestamp { color: #888; font-size: 0.9em; }
+        .level { 
+            font-weight: bold; 
+            padding: 2px 6px; 
+            border-radius: 3px; 
+            margin: 0 5px; 
+        }
+        .level-SİSTEM { background: #4CAF50; color: white; }
+        .level-ANALİZ { background: #2196F3; color: white; }
+        .level-ÜRETİM { background: #FF9800; color: white; }
+        .level-INFO { background: #9C27B0; color: white; }
+        .level-TAMAMLANDI { background: #8BC34A; color: white; }
+        .level-HATA { background: #F44336; color: white; }
+        .details { 
+            margin-top: 5px; 
+            font-size: 0.9em; 
+            color: #ccc; 
+        }
+        .details-item { margin: 2px 0; }
+        .code-snippet { 
+            background: #2a2a2a; 
+            padding: 10px; 
+            border-radius: 4px; 
+            font-size: 0.85em; 
+            overflow-x: auto;
+            white-space: pre-wrap;
+        }
+        .refresh-btn {
+            background: #00ff41;
+            color: #1a1a1a;
+            border: none;
+            padding: 10px 20px;
+            border-radius: 4px;
+            cursor: pointer;
+            font-weight: bold;
+            margin-bottom: 20px;
+        }
+        .refresh-btn:hover { background: #00cc33; }
+    </style>
+    <script>
+        function refreshLogs() {
+            location.reload();
+        }
+        
+        // Live tail: the server pushes only entries after the last one on the page
+        // (EventSource resends the last seen id as Last-Event-ID when it reconnects)
+        const MAX_ENTRIES = 200;
+        
+        // Same markup as the server-rendered entries below
+        function renderEntry(log) {
+            const entry = document.createElement('div');
+            entry.className = 'log-entry';
+            const timestamp = document.createElement('span');
+            timestamp.className = 'timestamp';
+            timestamp.textContent = `[${log.timestamp}]`;
+            const level = document.createElement('span');
+            level.className = `level level-${log.level || ''}`;
+            level.textContent = log.level || '';
+            const message = document.createElement('span');
+            message.className = 'message';
+            message.textContent = log.message;
+            entry.append(timestamp, ' ', level, ' ', message);
+            const details = Object.entries(log.details || {});
+            if (details.length) {
+                const box = document.createElement('div');
+                box.className = 'details';
+                details.forEach(([key, value]) => {
+                    const item = document.createElement('div');
+                    item.className = 'details-item';
+                    const label = document.createElement('strong');
+                    label.textContent = `${key}:`;
+                    box.append(item);
+                    if ((key === 'kod' && value) || key === 'generated_code') {
+                        item.append(label);
+                        const code = document.createElement('div');
+                        code.className = 'code-snippet';
+                        code.textContent = value;
+                        box.append(code);
+                    } else {
+                        item.append(label, ` ${value}`);
+                    }
+                });
+                entry.append(box);
+            }
+            return entry;
+        }
+        
+        window.addEventListener('DOMContentLoaded', () => {
+            const container = document.querySelector('.logs');
+            const source = new EventSource(`/logs/stream?since=${CURSOR}`);
+            source.onmessage = event => {
+                container.append(renderEntry(JSON.parse(event.data)));
+                while (container.children.length > MAX_ENTRIES) container.firstElementChild.remove();
+            };
+            source.addEventListener('clear', () => { container.innerHTML = ''; });
+        });
+    </script>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🤖 AI Agent Logları - Teknofest Demo</h1>
+            <p>Yerel LLM Agent işlemlerinin gerçek zamanlı logları</p>
+            <button class="refresh-btn" onclick="refreshLogs()">Logları Yenile</button>
+        </div>
+        <div class="logs">
+'''.replace("CURSOR", str(cursor))
+    
+    for log in formatted_logs:
+        details_html = ""
+        if log['details']:
+            details_html = "<div class='details'>"
+            for key, value in log['details'].items():
+                if key == 'kod' and value:
+                    details_html += f"<div class='details-item'><strong>{key}:</strong></div><div class='code-snippet'>{value}</div>"
+                elif key == 'generated_code':
+                    details_html += f"<div class='details-item'><strong>{key}:</strong></div><div class='code-snippet'>{value}</div>"
+                else:
+                    details_html += f"<div class='details-item'><strong>{key}:</strong> {value}</div>"
+            details_html += "</div>"
+        
+        html_content += f'''
+        <div class="log-entry">
+            <span class="timestamp">[{log['timestamp']}]</span>
+            <span class="level level-{log['level']}">{log['level']}</span>
+            <span class="message">{log['message']}</span>
+            {details_html}
+        </div>
+        '''
+    
+    html_content += '''
+        </div>
+    </div>
+</body>
+</html>
+    '''
+    
+    return html_content
+
+@app.route("/ready")
+def ready():
+    """Readiness probe: 200 once the warmup phase finished, 503 while warming up"""
+    status = startup.status()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+@app.route("/admission")
+def admission_status():
+    """Concurrency limit, queue depth and latency estimates of admission control"""
+    return jsonify(admission.status())
+
+@app.route("/backends")
+def backends_status():
+    """Health, circuit state and load of each LLM backend, plus retry/hedging metrics"""
+    return jsonify(router.status())
+
+@app.route("/logs/json")
+def logs_json():
+    """Return logs as JSON for API access (?since=<seq> pages forward from a cursor)"""
+    since = request.args.get("since", type=int)
+    limit = min(request.args.get("limit", 100, type=int), 1000)
+    if since is None:
+        return jsonify(agentic_logger.get_recent_logs(limit))
+    return jsonify(agentic_logger.get_logs_since(since, limit))
+
+@app.route("/logs/stream")
+def logs_stream():
+    """Server-sent log entries after a cursor (?since=<seq> or Last-Event-ID; default: new entries only)"""
+    since = request.headers.get("Last-Event-ID", type=int)
+    if since is None:
+        since = request.args.get("since", type=int)
+    if since is None:
+        since = agentic_logger.last_seq
+
+    def generate(cursor):
+        _, cleared_seq = agentic_logger.wait_for_logs(cursor, 0)
+        if cursor > agentic_logger.last_seq:
+            # A cursor from before a server restart: the viewer starts over with the current logs
+            cursor = cleared_seq
+            yield "event: clear\ndata: {}\n\n"
+        while True:
+            entries, latest_clear = agentic_logger.wait_for_logs(cursor, LOG_STREAM_KEEPALIVE_S, limit=100)
+            if latest_clear != cleared_seq:
+                cleared_seq = latest_clear
+                yield "event: clear\ndata: {}\n\n"
+            if not entries:
+                cursor = max(cursor, latest_clear)
+                yield ": keepalive\n\n"  # Also detects disconnected viewers
+                continue
+            for entry in entries:
+                yield f"id: {entry['seq']}\ndata: {json.dumps(entry, ensure_ascii=False)}\n\n"
+            cursor = entries[-1]["seq"]
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(generate(since), mimetype="text/event-stream", headers=headers)
+
+@app.route("/logs/clear")
+def clear_logs():
+    """Clear all logs"""
+    agentic_logger.clear_logs()
+    return jsonify({"status": "success", "message": "Tüm loglar temizlendi"})
+
+@app.route("/logs/demo")
+def demo_logs():
+    """Generate demo logs to show capabilities"""
+    agentic_logger.clear_logs()
+    
+    # Generate some demo logs
+    agentic_logger.log_model_init()
+    agentic_logger.log_prompt_analysis(150, "Matematik fonksiyonları")
+    agentic_logger.log_content_generation_start(500)
+    agentic_logger.log_tool_usage("matplotlib", "plt.plot([1,2,3], [4,5,6])\nplt.title('Demo Graf')")
+    agentic_logger.log_tool_usage("mermaid", "flowchart TD\n  A --> B")
+    agentic_logger.log_generation_complete(5.2, 423)
+    
+    return jsonify({"status": "success", "message": "Demo loglar oluşturuldu"})
+
+@app.route("/test/warnings")
+def test_warnings():
+    """Test route to verify matplotlib warnings are suppressed"""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import numpy as np
+        
+        # This should NOT generate warnings anymore - including pcolormesh warnings
+        for i in range(3):
+            plt.figure()
+            x = np.linspace(0, 10, 100)
+            y = np.sin(x + i)
+            plt.plot(x, y)
+            plt.title(f'Test Graph {i+1}')
+            
+            # Test pcolormesh which was causing warnings
+            X, Y = np.meshgrid(np.random.rand(10), np.random.rand(10))
+            Z = np.random.rand(10, 10)
+            plt.pcolormesh(X, Y, Z)
+            
+        plt.close('all')
+        return jsonify({"status": "success", "message": "Test completed - check console for warnings"})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+@app.route("/generate", methods=["POST"])
+def generate():
+    data = request.json
+    question = data.get("question")
+    stream = data.get("stream", False)
+
+    if not question:
+        return jsonify({"error": "Question/topic is required"}), 400
+
+    response_cache.log_request(question, data.get("class_id"))
+
+    # Continue the lesson speculatively started while the question was typed
+    if stream:
+        try:
+            speculation = speculations.claim(client_key(), question, lesson_options(data))
+        except AdmissionRejected as e:
+            return admission_rejected_response(e)
+        if speculation is not None:
+            return lesson_event_response(speculation.job.stream(), {'X-Job-Id': speculation.job.id})
+
+    # Cached lessons are cheap; everything else goes through admission control
+    ticket = None
+    if not response_cache.is_fresh(question):
+        try:
+            ticket = admission.enter(client_key())
+        except AdmissionRejected as e:
+            return admission_rejected_response(e)
+
+    if stream:
+        chunks, render = lesson_options(data)
+        return generate_stream(question, ticket, chunks=chunks, render=render,
+                               sections=bool(data.get("sections", LESSON_SECTIONS)))
+    
+    try:
+        if ticket is not None:
+            ticket.wait()
+        start_time = time.time()
+        cached = response_cache.get(question)
+        if cached:
+            md_content = cached["markdown"]
+        else:
+            md_response = llm(build_answer_messages(question))
+            
+            # Remove first ```md tag and last ``` tag for proper formatting
+            md_content = clean_markdown_response(md_response)
+            response_cache.put(question, md_content)
+            admission.record_service_time(time.time() - start_time)
+
+        html_output = generate_html(md_content)
+        
+        return jsonify({"html": html_output, "lesson_id": lesson_id(question)})
+    except Exception as e:
+        print(f"Error during generation: {e}")
+        return jsonify({"error": "Failed to generate HTML"}), 500
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+def admission_rejected_response(e):
+    """429 with Retry-After for a request refused by admission control"""
+    response = jsonify({"error": "Server is busy, please retry later", "reason": e.reason,
+                        "retry_after": e.retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+@app.route("/generate/speculate", methods=["POST"])
+def speculate():
+    """
+    Opt-in prefetch while the question is being typed: start a token-capped
+    job on a spare, preemptible slot. A later /generate with the same question
+    and options attaches to it. 204 when nothing was started, 429 when the
+    client's rate limit is used up (speculations count against it).
+    """
+    data = request.json
+    question = (data.get("question") or "").strip()
+    if not question or response_cache.is_fresh(question):
+        return "", 204
+    chunks, render = lesson_options(data)
+    try:
+        speculation = speculations.start(
+            client_key(), question, (chunks, render),
+            lambda spec: generation_jobs.start(
+                lambda job: lesson_events(question, spec.ticket, chunks, render, speculation=spec, job=job)))
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    if speculation is None:
+        return "", 204
+    return jsonify({"job_id": speculation.job.id}), 202
+
+@app.route("/generate/speculate/<job_id>", methods=["DELETE"])
+def cancel_speculation(job_id):
+    """Drop this client's speculation (the question text changed)"""
+    return ("", 204) if speculations.cancel(client_key(), job_id) else ("", 404)
+
+def lesson_options(data):
+    """Request options that change the event stream; a speculation only serves a request with the same ones"""
+    return bool(data.get("chunks", True)), data.get("render", "server")
+
+@app.route("/lessons/<lesson_id>/export")
+def export_lesson_bundle(lesson_id):
+    """Offline ZIP of one lesson, streamed while it is built"""
+    lesson = response_cache.get_lesson(lesson_id)
+    if lesson is None:
+        abort(404)
+    headers = {"Content-Disposition": f'attachment; filename="ogrenix-{lesson_id}.zip"'}
+    return Response(export_lesson(lesson), mimetype="application/zip", headers=headers)
+
+@app.route("/classes/<class_id>/export")
+def export_class_bundle(class_id):
+    """Offline ZIP of every lesson a class asked for (optionally since a unix timestamp)"""
+    since = request.args.get("since", type=float)
+    lessons = response_cache.class_lessons(class_id, since)
+    if not lessons:
+        abort(404)
+    name = secure_filename(class_id) or "sinif"
+    headers = {"Content-Disposition": f'attachment; filename="ogrenix-{name}.zip"'}
+    return Response(export_lessons(lessons, f"{class_id} - Ders Arşivi"), mimetype="application/zip", headers=headers)
+
+def client_key():
+    """
+    Identify the client for rate limiting. X-Forwarded-For is only honoured
+    behind ADMISSION_TRUSTED_PROXIES proxies (ProxyFix sets remote_addr from
+    it), since clients can send any value themselves.
+    """
+    return request.remote_addr or "unknown"
+
+def clean_markdown_response(md_response):
+    """Clean the markdown response by removing markdown code fences"""
+    # Remove first ```md and last ``` tags
+    if md_response.startswith('```md\n'):
+        md_response = md_response[6:]  # Remove ```md\n
+    elif md_response.startswith('```markdown\n'):
+        md_response = md_response[12:]  # Remove ```markdown\n
+    
+    if md_response.endswith('\n```'):
+        md_response = md_response[:-4]  # Remove \n```
+    elif md_response.endswith('```'):
+        md_response = md_response[:-3]  # Remove ```
+    
+    return md_response.strip()
+
+class ChartAssets:
+    """
+    Dispatches chart renders the moment a matplotlib fence closes and turns
+    finished renders into `asset` events, so the text stream never waits on a
+    chart. Each chart gets a quick preview followed by the full-quality render.
+
+    Previews go first: a full render is only queued while no preview is
+    waiting, one at a time, so a new chart's preview never queues behind more
+    than one full render. Once the text is complete (finish()), all remaining
+    full renders are queued. Charts already rendered in full skip the preview.
+
+    cancel() may come from another thread (a job's cancel hook); after it,
+    nothing more is submitted.
+    """
+
+    def __init__(self):
+        self.dispatched = set()
+        self.pending = []  # (key, quality, code, future)
+        self.awaiting_full = []  # (key, code) in lesson order
+        self.full_sent = set()
+        self.closed = False
+        self.cancelled = 0
+        self.lock = threading.Lock()
+
+    def dispatch(self, md_str):
+        with self.lock:
+            for key, code in iter_chart_blocks(md_str):
+                if self.closed:
+                    return
+                if key in self.dispatched:
+                    continue
+                self.dispatched.add(key)
+                if get_cached_chart(key) is not None:
+                    self.pending.append((key, 'full', code, submit_chart(code, 'full', owner=self)))
+                else:
+                    self.pending.append((key, 'preview', code, submit_chart(code, 'preview', owner=self)))
+                    self.awaiting_full.append((key, code))
+            self._queue_full()
+
+    def finish(self):
+        """The lesson text is complete: queue every remaining full render"""
+        with self.lock:
+            self._queue_full(text_complete=True)
+
+    def _queue_full(self, text_complete=False):
+        while self.awaiting_full and not self.closed:
+            if not text_complete and any(not future.done() for _, _, _, future in self.pending):
+                return  # Previews (or the previous full render) still waiting
+            key, code = self.awaiting_full.pop(0)
+            self.pending.append((key, 'full', code, submit_chart(code, 'full', owner=self)))
+
+    def cancel(self):
+        """Withdraw from renders not yet delivered; returns how many were cancelled in total"""
+        with self.lock:
+            self.closed = True
+            pending, self.pending, self.awaiting_full = self.pending, [], []
+        self.cancelled += sum(1 for _, quality, code, future in pending
+                              if not future.done() and cancel_chart(code, quality, owner=self))
+        return self.cancelled
+
+    def ready_events(self):
+        """Yield `asset` events for renders finished since the last call"""
+        with self.lock:
+            pending = list(self.pending)
+        still_pending = []
+        for key, quality, code, future in pending:
+            if not future.done():
+                still_pending.append((key, quality, code, future))
+                continue
+            if key in self.full_sent:
+                continue
+            try:
+                image = future.result()
+            except Exception as e:
+                if quality == 'full':
+                    agentic_logger.log_error("Matplotlib Execution Error", str(e), f"Code: {code[:100]}...")
+                    self.full_sent.add(key)
+                    yield f"data: {json.dumps({'type': 'asset', 'kind': 'chart', 'id': chart_element_id(key), 'key': key, 'error': str(e)})}\n\n"
+                continue
+            if quality == 'full':
+                agentic_logger.log_tool_usage("matplotlib", code)
+                self.full_sent.add(key)
+            yield f"data: {json.dumps({'type': 'asset', 'kind': 'chart', 'id': chart_element_id(key), 'key': key, 'quality': quality, 'src': f'data:image/png;base64,{image}'})}\n\n"
+        with self.lock:
+            if self.closed:
+                return
+            self.pending = still_pending
+            self._queue_full()
+
+def lesson_events(question, ticket=None, chunks=True, render="server", sections=False, speculation=None,
+                  job=None):
+    """
+    Generate the lesson's SSE events.
+
+    chunks=False omits the raw text `chunk` events. Chart images are rendered
+    in the background and delivered as `asset` events keyed by chart key.
+    render="client" skips interim `content` events: the browser renders the
+    markdown chunks into the shell from the `start` event. `complete` always
+    carries the server-rendered HTML.
+
+    sections=True generates the lesson outline first, then its sections in
+    parallel (see sectioned_llm_stream). With a speculation, the LLM output
+    is a single stream capped until the user submits.
+
+    Run as `job`, cancelling the job stops the upstream streams, withdraws
+    the chart renders and frees the admission slot right away, without
+    waiting for the generator to reach its next event.
+    """
+    client_render = render == "client"
+    chunks = chunks or client_render
+    def generate():
+        upstream = None
+        charts = ChartAssets()
+        abort = UpstreamAbort()
+        completed = False
+        accumulated_response = ""
+
+        def stop():
+            abort.abort()
+            charts.cancel()
+            if ticket is not None:
+                ticket.release()
+
+        if job is not None:
+            job.on_cancel(stop)
+        try:
+            # Hold the connection with queue position updates until admitted
+            while ticket is not None and not ticket.granted:
+                yield f"data: {json.dumps({'type': 'queued', 'position': ticket.position})}\n\n"
+                ticket.wait(timeout=1.0)
+            
+            messages = build_answer_messages(question)
+            
+            request_start = time.time()
+            first_output_time = None
+            chunk_count = 0
+            last_html_time = 0.0
+            
+            # Send initial event
+            start_event = {'type': 'start', 'message': 'Starting generation...'}
+            if client_render:
+                start_event['shell'] = generate_html_shell()
+            yield f"data: {json.dumps(start_event)}\n\n"
+            
+            # Serve pre-generated (e.g. cache-warmed) lessons without calling the LLM
+            cached = response_cache.get(question)
+            if cached:
+                final_md = cached['markdown']
+                final_html = generate_html_streaming(final_md)
+                yield f"data: {json.dumps({'type': 'complete', 'html': final_html, 'markdown': final_md, 'lesson_id': cached['lesson_id'], 'cached': True})}\n\n"
+                yield f"data: {json.dumps({'type': 'end'})}\n\n"
+                completed = True
+                startup.record_first_request(time.time() - request_start, time.time() - request_start)
+                return
+            
+            service_start = time.time()
+            pending_chunk = ""
+            last_chunk_time = service_start
+            if speculation:
+                upstream = speculative_llm_stream(messages, speculation, abort=abort)
+            elif sections:
+                upstream = sectioned_llm_stream(question, abort=abort)
+            else:
+                upstream = llm_stream(messages, abort=abort)
+            for chunk in upstream:
+                if chunk_count == 0:
+                    admission.record_latency(time.time() - service_start)
+                accumulated_response += chunk
+                chunk_count += 1
+                
+                # Start rendering charts as soon as their closing fence arrives
+                if '`' in chunk:
+                    charts.dispatch(accumulated_response)
+                yield from charts.ready_events()
+                
+                # Coalesce upstream deltas into one text event per interval or size
+                now = time.time()
+                if chunks:
+                    pending_chunk += chunk
+                    if (now - last_chunk_time) * 1000 >= CHUNK_FLUSH_MS or len(pending_chunk) >= CHUNK_FLUSH_CHARS:
+                        first_output_time = first_output_time or time.time()
+                        yield f"data: {json.dumps({'type': 'chunk', 'chunk': pending_chunk})}\n\n"
+                        pending_chunk = ""
+                        last_chunk_time = now
+                
+                # Generate HTML on a short time-based cadence to keep UI smooth
+                # (the browser renders it itself in client mode)
+                if not client_render and now - last_html_time >= 0.12:
+                    try:
+                        cleaned_md = clean_markdown_response(accumulated_response)
+                        # Charts still rendering stay placeholders until their `asset` event
+                        current_html = generate_html_streaming(cleaned_md, chart_quality='preview',
+                                                               wait_for_charts=False)
+                        first_output_time = first_output_time or time.time()
+                        yield f"data: {json.dumps({'type': 'content', 'html': current_html})}\n\n"
+                    except Exception as html_error:
+                        # Continue with text-only if HTML generation fails
+                        pass
+                    finally:
+                        last_html_time = now
+                
+                # No artificial delay; rely on time-based cadence above
+            if pending_chunk:
+                yield f"data: {json.dumps({'type': 'chunk', 'chunk': pending_chunk})}\n\n"
+            charts.finish()
+            admission.record_service_time(time.time() - service_start)
+            
+            # Send final complete HTML
+            if accumulated_response.strip():
+                try:
+                    final_md = clean_markdown_response(accumulated_response)
+                    final_html = generate_html_streaming(final_md)
+                    response_cache.put(question, final_md)
+                    first_output_time = first_output_time or time.time()
+                    yield f"data: {json.dumps({'type': 'complete', 'html': final_html, 'markdown': final_md, 'lesson_id': lesson_id(question)})}\n\n"
+                except Exception as e:
+                    yield f"data: {json.dumps({'type': 'error', 'error': f'Final HTML generation failed: {str(e)}'})}\n\n"
+            else:
+                yield f"data: {json.dumps({'type': 'error', 'error': 'No content received from API'})}\n\n"
+            
+            # Send explicit end signal
+            yield f"data: {json.dumps({'type': 'end'})}\n\n"
+            completed = True
+            if first_output_time:
+                startup.record_first_request(first_output_time - request_start, time.time() - request_start)
+            
+        except Exception as e:
+            if job is not None and job.cancelled.is_set():
+                return  # Upstream was aborted by the cancel hook; nobody is listening
+            completed = True
+            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+            yield f"data: {json.dumps({'type': 'end'})}\n\n"
+        finally:
+            # Also runs when the job is cancelled (GeneratorExit): free the
+            # slot first, then stop the upstream stream and queued chart renders
+            if ticket is not None:
+                ticket.release()
+            if upstream is not None:
+                upstream.close()
+            cancelled_charts = charts.cancel()
+            if not completed:
+                agentic_logger.log_client_disconnect(len(accumulated_response), cancelled_charts)
+    
+    return generate()
+
+def generate_stream(question, ticket=None, chunks=True, render="server", sections=False):
+    """
+    Generate streaming response.
+
+    Generation runs as a detached job (id in the X-Job-Id header); events
+    carry `id:` lines so a client that lost the connection can resume from
+    /jobs/<id>/events with Last-Event-ID instead of generating again.
+    """
+    job = generation_jobs.start(lambda job: lesson_events(question, ticket, chunks, render, sections, job=job))
+    return lesson_event_response(job.stream(), {'X-Job-Id': job.id})
+
+def lesson_event_response(events, extra_headers=None):
+    """SSE response for lesson events, compressed when the client accepts it"""
+    headers = {
+        'Cache-Control': 'no-cache, no-transform',
+        'Connection': 'keep-alive',
+        'X-Accel-Buffering': 'no',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'X-Job-Id',
+        'Vary': 'Accept-Encoding'
+    }
+    headers.update(extra_headers or {})
+    # Compress ourselves (flushed per event) since no-transform keeps proxies out
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        return Response(compress_events(events, encoding), mimetype='text/event-stream', headers=headers)
+    return Response(events, mimetype='text/event-stream', headers=headers)
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    """Replay a generation job's events after Last-Event-ID (or ?since=), then follow it live"""
+    since = request.headers.get("Last-Event-ID", type=int)
+    if since is None:
+        since = request.args.get("since", 0, type=int)
+    events = generation_jobs.stream(job_id, since)
+    if events is None:
+        abort(404)
+    return lesson_event_response(events, {'X-Job-Id': job_id})
+
+@app.route("/jobs")
+def jobs_status():
+    """Number of running and finished generation jobs and their connected readers, plus speculation counts"""
+    return jsonify({**generation_jobs.status(), "speculation": speculations.status()})
+
+startup.mark_imported()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ogrenix lesson server")
+    parser.add_argument("--mode", choices=sorted(DEFAULT_PORTS), default=os.getenv("OGRENIX_MODE", "cloud"),
+                        help="cloud: OpenRouter; local: vLLM replicas from VLLM_URLS with cloud fallback")
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    configure_router(args.mode).start_health_checks()
+    startup.start_warmup()
+    app.run(debug=True, port=args.port or DEFAULT_PORTS[args.mode], use_reloader=False)
+
+if __name__ == "__main__":
+    main()
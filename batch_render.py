@@ -0,0 +1,140 @@
+"""Batch markdown -> HTML renderer for re-rendering the lesson archive.
+
+Usage:
+    python3 batch_render.py lessons/ -o rendered/
+    python3 batch_render.py lessons.jsonl -o rendered/ --workers 8
+
+A directory input renders every *.md / *.txt file in it. A JSONL input expects
+one lesson per line with an "id" and a "markdown" field; ids with path
+separators or ".." are reported as failures, not written. Lessons are rendered
+with generate_html across a process pool; matplotlib results are shared between
+workers through an on-disk chart cache, so identical charts run only once.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DEFAULT_CHART_CACHE_DIR = ".chart_cache"
+
+
+def load_lessons(source):
+    """Yield (lesson_id, markdown) pairs from a directory or a JSONL file"""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if not name.endswith((".md", ".txt")):
+                continue
+            with open(os.path.join(source, name), encoding="utf-8") as f:
+                yield os.path.splitext(name)[0], f.read()
+        return
+
+    with open(source, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            lesson_id = str(entry.get("id") or f"lesson_{line_no}")
+            yield lesson_id, entry["markdown"]
+
+
+def check_lesson_id(lesson_id):
+    """Raise ValueError for ids that would write outside the output directory"""
+    if not lesson_id or lesson_id in (".", "..") or any(sep in lesson_id for sep in ("/", "\\", os.sep)) \
+            or ".." in lesson_id:
+        raise ValueError(f"Geçersiz ders kimliği: {lesson_id!r}")
+
+
+def write_atomic(path, content):
+    """Write a file via a temporary sibling and rename, so readers never see partial output"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _init_worker(chart_cache_dir, quiet):
+    from generate_html import set_chart_cache_dir
+
+    set_chart_cache_dir(chart_cache_dir)
+    if quiet:
+        # Tool-usage logs from every worker would drown the timing report
+        sys.stdout = open(os.devnull, "w")
+
+
+def _render_one(lesson_id, md_str, out_dir):
+    from generate_html import generate_html
+
+    start_time = time.perf_counter()
+    html = generate_html(md_str)
+    out_path = os.path.join(out_dir, f"{lesson_id}.html")
+    write_atomic(out_path, html)
+    return lesson_id, out_path, time.perf_counter() - start_time
+
+
+def render_batch(source, out_dir, workers=None, chart_cache_dir=DEFAULT_CHART_CACHE_DIR, quiet=True):
+    """Render all lessons from source into out_dir, printing per-file timings.
+
+    Returns a list of (lesson_id, seconds) for successful renders and a list of
+    (lesson_id, error) for failures.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    if chart_cache_dir:
+        os.makedirs(chart_cache_dir, exist_ok=True)
+
+    timings = []
+    failures = []
+    batch_start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(chart_cache_dir, quiet)) as pool:
+        futures = {}
+        for lesson_id, md_str in load_lessons(source):
+            try:
+                check_lesson_id(lesson_id)
+            except ValueError as e:
+                failures.append((lesson_id, str(e)))
+                print(f"[HATA] {lesson_id}: {e}", file=sys.stderr)
+                continue
+            futures[pool.submit(_render_one, lesson_id, md_str, out_dir)] = lesson_id
+        for future in as_completed(futures):
+            lesson_id = futures[future]
+            try:
+                _, out_path, elapsed = future.result()
+            except Exception as e:
+                failures.append((lesson_id, str(e)))
+                print(f"[HATA] {lesson_id}: {e}", file=sys.stderr)
+                continue
+            timings.append((lesson_id, elapsed))
+            print(f"[{elapsed * 1000:8.1f} ms] {lesson_id} -> {out_path}")
+
+    total_time = time.perf_counter() - batch_start
+    if timings:
+        slowest = max(timings, key=lambda t: t[1])
+        print(f"\n{len(timings)} ders {total_time:.2f} sn içinde oluşturuldu "
+              f"(ortalama {sum(t for _, t in timings) / len(timings) * 1000:.1f} ms, "
+              f"en yavaş {slowest[0]}: {slowest[1] * 1000:.1f} ms)")
+    if failures:
+        print(f"{len(failures)} ders başarısız oldu", file=sys.stderr)
+    return timings, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a directory or JSONL of markdown lessons to HTML")
+    parser.add_argument("source", help="Directory of .md/.txt files or a JSONL file with id/markdown fields")
+    parser.add_argument("-o", "--out", default="html_output", help="Output directory (default: html_output)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chart-cache", default=DEFAULT_CHART_CACHE_DIR,
+                        help=f"Shared chart cache directory (default: {DEFAULT_CHART_CACHE_DIR}, '' to disable)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show worker tool-usage logs")
+    args = parser.parse_args(argv)
+
+    _, failures = render_batch(args.source, args.out, args.workers, args.chart_cache or None,
+                               quiet=not args.verbose)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""Work done after a client disconnects from the /generate SSE stream.
+
+Usage:
+    python3 bench_disconnect.py                 # client-side rendering, 20 tokens/s
+    python3 bench_disconnect.py --render server --settle 15
+    python3 bench_disconnect.py --runs 10       # spread of the leftover CPU
+
+Streams a lesson with several slow charts from the built-in mock server and
+drops the connection once every chart fence has arrived, while the LLM is
+still generating and the charts are queued. Then it waits --settle seconds and
+reports what was still spent: tokens the mock server streamed (what a
+provider would bill), chart renders that still completed and process CPU
+time (chart renders, HTML rendering). A render already drawing its figure
+when the client leaves cannot be interrupted, so at most that one may still
+finish and CPU may exceed the margin by at most one render, measured on a
+chart of the same size first; the exit status is 1 otherwise. The leftover
+depends on whether a render is drawing at the moment of the disconnect, so
+--runs repeats it with fresh charts and reports the min/median/max CPU. The job's
+reconnect grace period (JOB_DETACHED_GRACE_S) defaults to 0 here, so the
+measurement starts when an abandoned job would be cancelled.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+# Isolate the benchmark from the real response cache and admission limits
+os.environ.setdefault("OGRENIX_CACHE_DB", os.path.join(tempfile.mkdtemp(), "bench_cache.sqlite3"))
+os.environ.setdefault("ADMISSION_CLIENT_BURST", "1000")
+os.environ.setdefault("CHART_WORKERS", "1")
+os.environ.setdefault("JOB_DETACHED_GRACE_S", "0")
+
+from mock_llm_server import MockConfig, start_in_thread
+
+CHART_COUNT = 6
+
+# Dense scatter plots take a noticeable time to render
+CHART = """```python.matplotlib
+import numpy as np
+rng = np.random.default_rng({seed})
+x, y = rng.random(500000), rng.random(500000)
+plt.scatter(x, y, s=1, alpha=0.3)
+plt.title('Dağılım {seed}')
+```"""
+
+
+
+def lesson(run):
+    """The lesson for one run; its charts get their own seeds so none is cached yet"""
+    seeds = range(2 + run * CHART_COUNT, 2 + (run + 1) * CHART_COUNT)
+    return "```md\n# Bağlantı Testi\n\n" + "\n\n".join(CHART.format(seed=seed) for seed in seeds) + \
+        "\n\n## Uzun Açıklama\n\n" + "Bu paragraf dersin geri kalanını uzatır. " * 150 + "\n```"
+
+# Allowed leftovers: a piece or two in flight, one chart render already running
+MAX_TOKENS_AFTER = 5
+MAX_RENDERS_AFTER = 1
+MAX_CPU_AFTER_S = 0.25  # On top of the running render
+
+
+def chart_code(seed):
+    return CHART.format(seed=seed).split("\n", 1)[1].rsplit("\n```", 1)[0]
+
+
+def rendered_charts(text):
+    """Renders of the lesson's charts that are cached, previews and full quality"""
+    from generate_html import get_cached_chart, iter_chart_blocks
+    return sum(1 for key, _ in iter_chart_blocks(text) for cache_key in (key, f"{key}-preview")
+               if get_cached_chart(cache_key) is not None)
+
+
+def render_cpu():
+    """CPU seconds of one full-quality render of a chart like the lesson's"""
+    from generate_html import render_matplotlib_chart
+    render_matplotlib_chart(chart_code(0), "preview")  # Imports and font cache
+    start = time.process_time()
+    render_matplotlib_chart(chart_code(1), "full")
+    return time.process_time() - start
+
+
+def disconnect_mid_lesson(client, question, render):
+    """Read the stream until every chart fence has arrived, then drop it; returns events read"""
+    response = client.post("/generate", json={"question": question, "stream": True, "render": render},
+                           buffered=False)
+    events = 0
+    text = ""
+    for data in response.response:
+        for line in data.decode("utf-8").splitlines():
+            if line.startswith("data: "):
+                events += 1
+                text += json.loads(line[len("data: "):]).get("chunk", "")
+        if "## Uzun" in text:
+            break  # The text after the last chart has started
+    response.close()  # What the server sees when the tab is closed
+    return events
+
+
+def measure(client, stats, text, render, settle):
+    """One disconnect: what the server still spent during the settle period"""
+    tokens_start = stats["tokens_streamed"]
+    events = disconnect_mid_lesson(client, f"Bağlantı testi {time.time()}", render)
+    tokens_before = stats["tokens_streamed"]
+    renders_before = rendered_charts(text)
+    cpu_before = time.process_time()
+    time.sleep(settle)
+    return {
+        "events": events,
+        "tokens_before": tokens_before - tokens_start,
+        "tokens_after": stats["tokens_streamed"] - tokens_before,
+        "renders_after": rendered_charts(text) - renders_before,
+        "cpu_after": time.process_time() - cpu_before,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure upstream tokens and CPU spent after a disconnect")
+    parser.add_argument("--render", choices=["client", "server"], default="client")
+    parser.add_argument("--tps", type=float, default=20.0, help="Mock tokens per second")
+    parser.add_argument("--settle", type=float, default=8.0, help="Seconds to measure after the disconnect")
+    parser.add_argument("--runs", type=int, default=1, help="Disconnects to measure, one after another")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(tps=args.tps, response_text=lesson(0))
+    server, base_url = start_in_thread(config=config)
+    os.environ["VLLM_URLS"] = base_url
+    os.environ["VLLM_MODEL"] = "mock-model"
+    import app as app_module
+
+    app_module.configure_router("local")
+    client = app_module.app.test_client()
+    stats = server.app.config["STATS"]
+    results = []
+    try:
+        one_render = render_cpu()
+        for run in range(args.runs):
+            config.response_text = lesson(run)
+            streams_closed = stats["streams_closed"]
+            result = measure(client, stats, config.response_text, args.render, args.settle)
+            result["streams_closed"] = stats["streams_closed"] - streams_closed
+            result["admission"] = {key: app_module.admission.status()[key] for key in ("active", "queued")}
+            results.append(result)
+    finally:
+        server.shutdown()
+
+    total_tokens = len(lesson(0)) // 4
+    for run, result in enumerate(results, 1):
+        ok = result["tokens_after"] <= MAX_TOKENS_AFTER and result["renders_after"] <= MAX_RENDERS_AFTER and \
+            result["cpu_after"] <= MAX_CPU_AFTER_S + one_render and \
+            result["admission"] == {"active": 0, "queued": 0}
+        result["ok"] = ok
+        print(f"run {run}: {result['events']} events and {result['tokens_before']} of ~{total_tokens} tokens "
+              f"before; after: {result['tokens_after']} tokens, {result['renders_after']} of "
+              f"{CHART_COUNT * 2} chart renders, {result['cpu_after'] * 1000:.0f} ms CPU, "
+              f"{result['streams_closed']} upstream closed early, admission {result['admission']}"
+              f"{'' if ok else '  FAIL'}")
+    cpu = sorted(result["cpu_after"] * 1000 for result in results)
+    print(f"CPU after disconnect:          min {cpu[0]:.0f} / median {statistics.median(cpu):.0f} / "
+          f"max {cpu[-1]:.0f} ms over {args.settle:.1f} s (one chart render: {one_render * 1000:.0f} ms)")
+    print(f"tokens streamed after:         max {max(result['tokens_after'] for result in results)}")
+    print(f"chart renders finished after:  max {max(result['renders_after'] for result in results)}")
+    ok = all(result["ok"] for result in results)
+    print("OK" if ok else "FAIL: work continued after the client left")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
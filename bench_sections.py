@@ -0,0 +1,125 @@
+"""Lesson latency: one long stream vs. outline first with parallel sections.
+
+Usage:
+    python3 bench_sections.py                       # 5 sections, 40 tokens/s per stream
+    python3 bench_sections.py --sections 8 --tps 25 --runs 3
+
+Streams the same lesson from the built-in mock server through /generate in
+both modes and reports time to the first text chunk and to the end of the
+stream. The mock streams every request at --tps concurrently, like a vLLM
+server batching them, so the sectioned mode should finish in roughly the
+outline time plus the longest section. Both modes must produce the same
+markdown, which checks that the sections are stitched in order.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import tempfile
+import time
+
+# Isolate the benchmark from the real response cache and admission limits
+os.environ.setdefault("OGRENIX_CACHE_DB", os.path.join(tempfile.mkdtemp(), "bench_cache.sqlite3"))
+os.environ.setdefault("ADMISSION_CLIENT_BURST", "1000")
+
+from mock_llm_server import MockConfig, start_in_thread
+
+TITLE = "Örnek Ders"
+PARAGRAPH = "Bu bölüm konunun bir yönünü örneklerle ve ayrıntılı olarak açıklar. "
+
+DIAGRAM = """```mermaid
+flowchart LR
+    A["Soru"] --> B["Ders"]
+```"""
+
+
+def section_text(index, paragraphs):
+    body = "\n\n".join(PARAGRAPH * 3 for _ in range(paragraphs))
+    text = f"## Bölüm {index + 1}\n\n{body}"
+    if index == 0:
+        text += "\n\n" + DIAGRAM  # A section may end with a code fence of its own
+    return text
+
+
+def make_responder(section_count, paragraphs):
+    """Mock replies for the outline, section and single-stream prompts"""
+    outline = {"title": TITLE, "sections": [{"heading": f"Bölüm {index + 1}", "points": "Açıklama"}
+                                            for index in range(section_count)]}
+    sections = [section_text(index, paragraphs) for index in range(section_count)]
+
+    def respond(messages):
+        prompt = messages[-1]["content"]
+        if "Do not write the lesson yet" in prompt:
+            return "```json\n" + json.dumps(outline, ensure_ascii=False) + "\n```"
+        match = re.search(r"Now write ONLY section (\d+)", prompt)
+        if match:
+            index = int(match.group(1)) - 1
+            # Models sometimes wrap a section anyway; the stitcher removes that
+            return f"```md\n{sections[index]}\n```" if index == 1 else sections[index]
+        return f"```md\n# {TITLE}\n\n" + "\n\n".join(sections) + "\n```"
+
+    return respond
+
+
+def stream_lesson(client, question, sections):
+    """Seconds to the first text chunk and to the end of the stream, and the final markdown"""
+    start = time.perf_counter()
+    response = client.post("/generate", json={"question": question, "stream": True, "render": "client",
+                                              "sections": sections}, buffered=False)
+    first_chunk = None
+    markdown = None
+    for data in response.response:
+        for line in data.decode("utf-8").splitlines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event["type"] == "chunk" and first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            elif event["type"] == "complete":
+                markdown = event["markdown"]
+            elif event["type"] == "error":
+                raise RuntimeError(event["error"])
+    return first_chunk, time.perf_counter() - start, markdown
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare single-stream and section-parallel lesson latency")
+    parser.add_argument("--sections", type=int, default=5)
+    parser.add_argument("--paragraphs", type=int, default=3, help="Paragraphs per section")
+    parser.add_argument("--tps", type=float, default=40.0, help="Mock tokens per second, per stream")
+    parser.add_argument("--runs", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    config = MockConfig(tps=args.tps, responder=make_responder(args.sections, args.paragraphs))
+    server, base_url = start_in_thread(config=config)
+    os.environ["VLLM_URLS"] = base_url
+    os.environ["VLLM_MODEL"] = "mock-model"
+    import app as app_module
+
+    app_module.configure_router("local")
+    client = app_module.app.test_client()
+    results = {}
+    try:
+        stream_lesson(client, "Isınma sorusu", False)  # Imports and connection setup
+        for mode, sections in (("single", False), ("sections", True)):
+            runs = [stream_lesson(client, f"{mode} {run} {time.time()}", sections) for run in range(args.runs)]
+            results[mode] = runs
+    finally:
+        server.shutdown()
+
+    for mode, runs in results.items():
+        first = statistics.median(run[0] for run in runs)
+        total = statistics.median(run[1] for run in runs)
+        print(f"{mode:>8}: first chunk {first * 1000:6.0f} ms   end of stream {total * 1000:6.0f} ms")
+    speedup = statistics.median(run[1] for run in results["single"]) / \
+        statistics.median(run[1] for run in results["sections"])
+    print(f"end-of-stream speedup: {speedup:.2f}x with {args.sections} sections")
+    markdowns = {run[2] for runs in results.values() for run in runs}
+    ok = len(markdowns) == 1 and None not in markdowns
+    print("OK: both modes produced the same lesson" if ok else "FAIL: the stitched lesson differs")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
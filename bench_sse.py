@@ -0,0 +1,98 @@
+"""Bytes-on-the-wire and framing benchmark for the /generate SSE stream.
+
+Usage:
+    python3 bench_sse.py                  # mock LLM at 80 tokens/s, default lesson
+    python3 bench_sse.py --lesson ders.md --tps 200
+
+Streams the same lesson through the Flask app backed by the built-in mock
+server, once per mode (one chunk event per upstream delta, coalesced, no chunk
+events, client-side rendering) and content encoding (identity, gzip and, when installed, br/zstd).
+Reports bytes sent, frames written and server CPU time per lesson. Lessons
+run as detached jobs, so the CPU time is the whole process's: the job thread
+(coalescing, HTML rendering), the reader thread (compression) and the mock
+server, which streams the same lesson in every mode.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+# Isolate the benchmark from the real response cache and admission limits
+os.environ.setdefault("OGRENIX_CACHE_DB", os.path.join(tempfile.mkdtemp(), "bench_cache.sqlite3"))
+os.environ.setdefault("ADMISSION_CLIENT_BURST", "1000")
+
+from mock_llm_server import DEFAULT_LESSON, MockConfig, start_in_thread
+from sse_compression import COMPRESSORS
+
+
+# name -> (CHUNK_FLUSH_MS, send chunk events, render mode)
+MODES = {
+    "per-delta": (0, True, "server"),
+    "coalesced": (None, True, "server"),
+    "no-chunks": (None, False, "server"),
+    "client": (None, True, "client"),
+}
+
+
+def stream_lesson(client, question, encoding, chunks, render="server"):
+    """POST one streaming request; returns (wire bytes, frames, server CPU seconds, seconds)"""
+    headers = {"Accept-Encoding": encoding} if encoding != "identity" else {}
+    start_time = time.perf_counter()
+    cpu_start = time.process_time()  # The generator runs in the job's thread, not this one
+    response = client.post("/generate", json={"question": question, "stream": True, "chunks": chunks, "render": render},
+                           headers=headers, buffered=False)
+    wire_bytes = 0
+    frames = 0
+    for data in response.response:
+        if data:
+            wire_bytes += len(data)
+            frames += 1
+    response.close()
+    assert response.headers.get("Content-Encoding", "identity") == encoding, response.headers
+    return wire_bytes, frames, time.process_time() - cpu_start, time.perf_counter() - start_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure SSE bytes on the wire per lesson")
+    parser.add_argument("--lesson", help="Markdown file the mock LLM streams (default: built-in sample)")
+    parser.add_argument("--tps", type=float, default=80.0, help="Mock tokens per second")
+    args = parser.parse_args(argv)
+
+    response_text = DEFAULT_LESSON
+    if args.lesson:
+        with open(args.lesson, encoding="utf-8") as f:
+            response_text = "```md\n" + f.read() + "\n```"
+
+    server, base_url = start_in_thread(config=MockConfig(tps=args.tps, response_text=response_text))
+    os.environ["VLLM_URLS"] = base_url
+    os.environ["VLLM_MODEL"] = "mock-model"
+    import app as app_module
+
+    app_module.configure_router("local")
+    client = app_module.app.test_client()
+    default_flush_ms = app_module.CHUNK_FLUSH_MS
+    encodings = ["identity"] + [enc for enc in ("gzip", "br", "zstd") if enc in COMPRESSORS]
+    results = []
+    try:
+        stream_lesson(client, f"SSE benchmark warm-up {time.time()}", "identity", True)  # Imports, chart cache
+        for mode, (flush_ms, chunks, render) in MODES.items():
+            app_module.CHUNK_FLUSH_MS = default_flush_ms if flush_ms is None else flush_ms
+            for encoding in encodings:
+                question = f"SSE benchmark {time.time()} {mode} {encoding}"
+                results.append((mode, encoding) + stream_lesson(client, question, encoding, chunks, render))
+    finally:
+        app_module.CHUNK_FLUSH_MS = default_flush_ms
+        server.shutdown()
+
+    baseline = results[0][2]
+    print(f"{'mode':<11}{'encoding':<10}{'bytes':>12}{'ratio':>8}{'frames':>8}{'cpu ms':>9}{'wall s':>8}")
+    for mode, encoding, wire_bytes, frames, cpu, wall in results:
+        print(f"{mode:<11}{encoding:<10}{wire_bytes:>12,}{baseline / wire_bytes:>7.1f}x"
+              f"{frames:>8}{cpu * 1000:>9.0f}{wall:>8.2f}")
+    missing = [enc for enc in ("br", "zstd") if enc not in COMPRESSORS]
+    if missing:
+        print(f"\nNot installed: {', '.join(missing)} (pip install brotli zstandard)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Time-to-first-token benchmark: question-first vs. static-prefix-first prompts.
+
+Usage:
+    python3 bench_ttft.py                      # against the built-in mock server
+    python3 bench_ttft.py --base-url http://0.0.0.0:8000/v1 \
+        --model unsloth/GLM-4-32B-0414-unsloth-bnb-4bit   # against local vLLM
+
+Each layout gets one warm-up request, then --runs requests with distinct
+questions. With a prefix cache, the static-prefix layout only pays prefill for
+the question part, so its TTFT should be markedly lower.
+"""
+import argparse
+import statistics
+import time
+
+from openai import OpenAI
+
+from prompts import ANSWER_INSTRUCTIONS, ANSWER_QUESTION_TEMPLATE, build_answer_messages
+
+QUESTIONS = [
+    "Kara delikler nasıl oluşur?",
+    "Fotosentez nasıl çalışır?",
+    "Türev nedir ve ne işe yarar?",
+    "DNA nasıl kopyalanır?",
+    "Enflasyon neden olur?",
+    "Yapay sinir ağları nasıl öğrenir?",
+    "Işığın kırılması nasıl oluşur?",
+    "Osmanlı Devleti nasıl kuruldu?",
+]
+
+
+def question_first_messages(question):
+    """Previous layout: the variable question precedes the static instructions"""
+    return [{"role": "user", "content": ANSWER_QUESTION_TEMPLATE.format(question=question) + "\n\n" + ANSWER_INSTRUCTIONS}]
+
+
+LAYOUTS = {
+    "question-first": question_first_messages,
+    "prefix-first": build_answer_messages,
+}
+
+
+def measure_ttft(client, model, messages):
+    """Seconds until the first non-empty content delta"""
+    start_time = time.perf_counter()
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True, max_tokens=16)
+    ttft = None
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                ttft = time.perf_counter() - start_time
+                break
+    finally:
+        stream.close()
+    return ttft
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(client, model, runs):
+    results = {}
+    for name, build in LAYOUTS.items():
+        measure_ttft(client, model, build(f"Isınma sorusu ({name})"))
+        samples = []
+        for i in range(runs):
+            question = f"{QUESTIONS[i % len(QUESTIONS)]} ({name} #{i})"
+            ttft = measure_ttft(client, model, build(question))
+            if ttft is not None:
+                samples.append(ttft)
+        results[name] = samples
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare TTFT of prompt layouts")
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint (default: start the mock server)")
+    parser.add_argument("--api-key", default="EMPTY")
+    parser.add_argument("--model", default="mock-model")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        from mock_llm_server import start_in_thread
+
+        server, base_url = start_in_thread()
+    try:
+        client = OpenAI(base_url=base_url, api_key=args.api_key)
+        results = run(client, args.model, args.runs)
+    finally:
+        if server:
+            server.shutdown()
+
+    print(f"{'layout':<16}{'n':>4}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}")
+    for name, samples in results.items():
+        if not samples:
+            print(f"{name:<16}{0:>4}{'-':>10}{'-':>10}{'-':>10}")
+            continue
+        print(f"{name:<16}{len(samples):>4}{statistics.mean(samples) * 1000:>10.1f}"
+              f"{percentile(samples, 50) * 1000:>10.1f}{percentile(samples, 90) * 1000:>10.1f}")
+    if all(results.values()):
+        baseline = statistics.mean(results["question-first"])
+        improved = statistics.mean(results["prefix-first"])
+        print(f"\nTTFT improvement: {(1 - improved / baseline) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,16 @@
 import re
-import markdown
 import base64
 import io
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-from markdown.extensions import codehilite, tables, toc
 import hashlib
+import os
 import uuid
-import requests
 import threading
 import time
 import warnings
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
 from agentic_logger import agentic_logger
+from shared_cache import shared_cache
 
 # Suppress matplotlib warnings for cleaner console output
 warnings.filterwarnings('ignore', category=UserWarning, module='matplotlib')
@@ -22,13 +20,203 @@ warnings.filterwarnings('ignore', category=UserWarning, message='.*FigureCanvasA
 warnings.filterwarnings('ignore', category=UserWarning, message='.*cell centers.*')
 warnings.filterwarnings('ignore', category=UserWarning, message='.*cell edges.*')
 warnings.filterwarnings('ignore', category=UserWarning, message='.*monotonically.*')
-matplotlib.pyplot.ioff()  # Turn off interactive mode
-plt.rcParams['figure.max_open_warning'] = 0  # Disable figure limit warnings
 
-# Additional matplotlib configuration to prevent warnings
-import matplotlib
-matplotlib.rcParams['axes.formatter.useoffset'] = False
-matplotlib.rcParams['figure.raise_window'] = False
+# matplotlib and markdown/Pygments are imported on first use so that CLI tools
+# and the log endpoints start instantly; servers call warmup() instead.
+_plt = None
+_import_lock = threading.Lock()
+
+def _pyplot():
+    """Import and configure matplotlib (Agg) on first use"""
+    global _plt
+    if _plt is None:
+        with _import_lock:
+            if _plt is None:
+                import matplotlib
+                matplotlib.use('Agg')  # Use non-interactive backend
+                import matplotlib.pyplot as plt
+                plt.ioff()  # Turn off interactive mode
+                plt.rcParams['figure.max_open_warning'] = 0  # Disable figure limit warnings
+                # Additional matplotlib configuration to prevent warnings
+                matplotlib.rcParams['axes.formatter.useoffset'] = False
+                matplotlib.rcParams['figure.raise_window'] = False
+                _plt = plt
+    return _plt
+
+# Pygments output shared by all requests: (lexer, code hash) -> HTML. Streaming
+# re-renders the whole lesson every tick, so each code block would otherwise be
+# re-tokenized on every tick of every stream.
+HIGHLIGHT_CACHE_SIZE = int(os.getenv("HIGHLIGHT_CACHE_SIZE", "4096"))
+_highlight_cache = OrderedDict()
+_highlight_cache_lock = threading.Lock()
+_highlight_cache_installed = False
+
+def _highlight_cache_key(lang, src, shebang):
+    digest = hashlib.sha1(src.encode('utf-8')).hexdigest()
+    return f"{lang or 'auto'}:{int(shebang)}:{digest}"
+
+def _remember_highlight(key, html):
+    with _highlight_cache_lock:
+        _highlight_cache[key] = html
+        _highlight_cache.move_to_end(key)
+        while len(_highlight_cache) > HIGHLIGHT_CACHE_SIZE:
+            _highlight_cache.popitem(last=False)
+
+def get_cached_highlight(key):
+    with _highlight_cache_lock:
+        html = _highlight_cache.get(key)
+        if html is not None:
+            _highlight_cache.move_to_end(key)
+            return html
+    if shared_cache is None:
+        return None
+    html = shared_cache.get('highlight', key)
+    if html is not None:
+        _remember_highlight(key, html)
+    return html
+
+def store_cached_highlight(key, html):
+    _remember_highlight(key, html)
+    if shared_cache is not None:
+        shared_cache.set('highlight', key, html)
+
+def _install_highlight_cache():
+    """Route codehilite (fenced and indented code) through the highlight cache"""
+    global _highlight_cache_installed
+    from markdown.extensions import codehilite, fenced_code
+    
+    class CachedCodeHilite(codehilite.CodeHilite):
+        def hilite(self, shebang=True):
+            key = _highlight_cache_key(self.lang, self.src, shebang)
+            html = get_cached_highlight(key)
+            if html is None:
+                html = super().hilite(shebang)
+                # Already highlighted: tell highlight.js in the browser to skip the block
+                html = html.replace('<code>', '<code class="nohighlight">', 1)
+                store_cached_highlight(key, html)
+            return html
+    
+    codehilite.CodeHilite = CachedCodeHilite
+    fenced_code.CodeHilite = CachedCodeHilite
+    _highlight_cache_installed = True
+
+_pygments_css_text = None
+
+def _pygments_css():
+    """Style rules for codehilite output, generated once"""
+    global _pygments_css_text
+    if _pygments_css_text is None:
+        from pygments.formatters import HtmlFormatter
+        css = HtmlFormatter(style='default').get_style_defs('.highlight')
+        # Keep the theme's own code block background
+        _pygments_css_text = css + "\n.highlight { background: none; }"
+    return _pygments_css_text
+
+def _markdown_processor():
+    """Markdown converter with the lesson extensions (imports markdown on first use)"""
+    import markdown
+    if not _highlight_cache_installed:
+        with _import_lock:
+            if not _highlight_cache_installed:
+                _install_highlight_cache()
+    return markdown.Markdown(
+        extensions=[
+            'codehilite',
+            'tables',
+            'toc',
+            'fenced_code',
+            'attr_list',
+            'def_list',
+            'footnotes',
+            'md_in_html'
+        ],
+        extension_configs={
+            'codehilite': {
+                'css_class': 'highlight',
+                'use_pygments': True
+            },
+            'toc': {
+                'title': 'İçindekiler'
+            }
+        }
+    )
+
+# Rendered chart cache: code hash -> base64 PNG. The in-memory LRU serves the
+# current process; an optional directory lets several processes (e.g. the
+# batch renderer's pool) share results so each chart is executed only once,
+# and the shared cache backend does the same for pre-forked server workers
+# (and serves entries evicted from memory).
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "256"))
+_chart_cache = OrderedDict()
+_chart_cache_lock = threading.Lock()
+_chart_cache_dir = os.getenv("CHART_CACHE_DIR") or None
+
+def set_chart_cache_dir(path):
+    """Enable the on-disk chart cache shared between processes (None disables it)"""
+    global _chart_cache_dir
+    if path:
+        os.makedirs(path, exist_ok=True)
+    _chart_cache_dir = path or None
+
+# Chart render tiers: cheap previews for interim streaming ticks, full quality
+# once the lesson is complete
+CHART_QUALITY = {
+    'full': {'dpi': 150, 'bbox_inches': 'tight'},
+    'preview': {'dpi': 50, 'bbox_inches': None},
+}
+
+# pyplot keeps global state, so charts are executed one at a time per process
+_matplotlib_lock = threading.Lock()
+
+def _chart_cache_key(code, quality='full'):
+    key = hashlib.sha1(code.encode('utf-8')).hexdigest()
+    return key if quality == 'full' else f"{key}-{quality}"
+
+def _remember_chart(key, img_str):
+    with _chart_cache_lock:
+        _chart_cache[key] = img_str
+        _chart_cache.move_to_end(key)
+        while len(_chart_cache) > CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)
+
+def get_cached_chart(key):
+    """Return the cached base64 PNG for a chart key, or None"""
+    with _chart_cache_lock:
+        img_str = _chart_cache.get(key)
+        if img_str is not None:
+            _chart_cache.move_to_end(key)
+            return img_str
+    if _chart_cache_dir:
+        try:
+            with open(os.path.join(_chart_cache_dir, f"{key}.b64"), encoding='ascii') as f:
+                img_str = f.read()
+        except OSError:
+            pass
+    if img_str is None and shared_cache is not None:
+        img_str = shared_cache.get('chart', key)
+    if img_str is None:
+        return None
+    _remember_chart(key, img_str)
+    return img_str
+
+def store_cached_chart(key, img_str):
+    """Store a rendered chart in memory and, if enabled, on disk and in the shared cache"""
+    _remember_chart(key, img_str)
+    if shared_cache is not None:
+        shared_cache.set('chart', key, img_str)
+    if not _chart_cache_dir:
+        return
+    path = os.path.join(_chart_cache_dir, f"{key}.b64")
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='ascii') as f:
+            f.write(img_str)
+        os.replace(tmp_path, path)  # Atomic so readers never see partial files
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
 
 def generate_html(md_str):
     """
@@ -56,27 +244,7 @@ def generate_html(md_str):
     # AI image blocks removed
     
     # Step 5: Convert markdown to HTML
-    md_processor = markdown.Markdown(
-        extensions=[
-            'codehilite',
-            'tables',
-            'toc',
-            'fenced_code',
-            'attr_list',
-            'def_list',
-            'footnotes',
-            'md_in_html'
-        ],
-        extension_configs={
-            'codehilite': {
-                'css_class': 'highlight',
-                'use_pygments': True
-            },
-            'toc': {
-                'title': 'İçindekiler'
-            }
-        }
-    )
+    md_processor = _markdown_processor()
     
     html_content = md_processor.convert(processed_md)
     
@@ -85,14 +253,18 @@ def generate_html(md_str):
     
     return full_html
 
-def generate_html_streaming(md_str):
-    """Streaming-safe HTML rendering"""
+def generate_html_streaming(md_str, chart_quality='full', wait_for_charts=True):
+    """Streaming-safe HTML rendering.
+    
+    Interim ticks pass chart_quality='preview' and wait_for_charts=False so
+    unfinished charts become placeholders instead of blocking the tick.
+    """
     
     # Step 0: Replace any incomplete special code fences with placeholders
     md_str = preprocess_incomplete_blocks(md_str)
     
     # Step 1: Process matplotlib code blocks
-    processed_md = process_matplotlib_blocks(md_str)
+    processed_md = process_matplotlib_blocks(md_str, chart_quality, wait_for_charts)
     
     # Step 2: Process mermaid diagrams
     processed_md = process_mermaid_blocks(processed_md)
@@ -103,27 +275,7 @@ def generate_html_streaming(md_str):
     # AI image blocks removed in streaming
     
     # Step 5: Convert markdown to HTML
-    md_processor = markdown.Markdown(
-        extensions=[
-            'codehilite',
-            'tables',
-            'toc',
-            'fenced_code',
-            'attr_list',
-            'def_list',
-            'footnotes',
-            'md_in_html'
-        ],
-        extension_configs={
-            'codehilite': {
-                'css_class': 'highlight',
-                'use_pygments': True
-            },
-            'toc': {
-                'title': 'İçindekiler'
-            }
-        }
-    )
+    md_processor = _markdown_processor()
     
     html_content = md_processor.convert(processed_md)
     
@@ -193,146 +345,362 @@ def preprocess_incomplete_blocks(md_str: str) -> str:
     md_str = replace_incomplete(md_str, 'python.matplotlib', mpl_placeholder)
     return md_str
 
-def process_matplotlib_blocks(md_str):
-    """Extract and execute matplotlib code blocks, replace with img tags"""
-    
-    # Pattern to match ```python.matplotlib code blocks
-    pattern = r'```python\.matplotlib\n(.*?)\n```'
-    
-    def clean_matplotlib_code(code):
-        """Remove emoji characters from matplotlib title functions, fix string literals, and clean plt.show() calls"""
-        import re
-        
-        def clean_title_text(text):
-            # Remove emoji and special Unicode characters, keep only ASCII letters, numbers, and common symbols
-            # Also replace newlines with spaces
-            text = re.sub(r'\n+', ' ', text)  # Replace newlines with spaces
-            return re.sub(r'[^\w\s\(\)\[\]\{\}\+\-\*\/\=\.\,\:\;\|\^\$\\\\°\']+', '', text).strip()
-        
-        # Remove plt.show() calls to prevent warnings in non-interactive mode
-        code = re.sub(r'plt\.show\(\s*\)', '', code, flags=re.MULTILINE)
-        
-        # Simple approach: fix all multi-line strings in the code first
-        lines = code.split('\n')
-        in_multiline_string = False
-        quote_char = None
-        fixed_lines = []
-        current_line = ""
-        
-        for line in lines:
-            if not in_multiline_string:
-                # Check if this line starts a multi-line string
-                if ("title(" in line or "set_title(" in line):
-                    # Look for unclosed quotes
-                    single_quotes = line.count("'") - line.count("\\'")
-                    double_quotes = line.count('"') - line.count('\\"')
-                    
-                    # If odd number of quotes, this starts a multi-line string
-                    if single_quotes % 2 == 1:
-                        in_multiline_string = True
-                        quote_char = "'"
-                        current_line = line
-                        continue
-                    elif double_quotes % 2 == 1:
-                        in_multiline_string = True 
-                        quote_char = '"'
-                        current_line = line
-                        continue
+def clean_matplotlib_code(code):
+    """Remove emoji characters from matplotlib title functions, fix string literals, and clean plt.show() calls"""
+    import re
+    
+    def clean_title_text(text):
+        # Remove emoji and special Unicode characters, keep only ASCII letters, numbers, and common symbols
+        # Also replace newlines with spaces
+        text = re.sub(r'\n+', ' ', text)  # Replace newlines with spaces
+        return re.sub(r'[^\w\s\(\)\[\]\{\}\+\-\*\/\=\.\,\:\;\|\^\$\\\\°\']+', '', text).strip()
+    
+    # Remove plt.show() calls to prevent warnings in non-interactive mode
+    code = re.sub(r'plt\.show\(\s*\)', '', code, flags=re.MULTILINE)
+    
+    # Simple approach: fix all multi-line strings in the code first
+    lines = code.split('\n')
+    in_multiline_string = False
+    quote_char = None
+    fixed_lines = []
+    current_line = ""
+    
+    for line in lines:
+        if not in_multiline_string:
+            # Check if this line starts a multi-line string
+            if ("title(" in line or "set_title(" in line):
+                # Look for unclosed quotes
+                single_quotes = line.count("'") - line.count("\\'")
+                double_quotes = line.count('"') - line.count('\\"')
                 
-                fixed_lines.append(line)
-            else:
-                # We're in a multi-line string, look for the closing quote
-                current_line += "\\n" + line  # Add escaped newline
-                if quote_char and quote_char in line and not line.endswith('\\' + quote_char):
-                    # Found the closing quote, end multi-line string
-                    in_multiline_string = False
-                    fixed_lines.append(current_line)
-                    current_line = ""
-                    quote_char = None
-        
-        code = '\n'.join(fixed_lines)
-        
-        # Now clean the titles - remove emojis and normalize
-        code = re.sub(r"(\w*\.?(?:title|set_title))\('([^']*)'", 
-                     lambda m: f"{m.group(1)}('{clean_title_text(m.group(2))}'", code)
-        
-        code = re.sub(r'(\w*\.?(?:title|set_title))\("([^"]*)"',
-                     lambda m: f'{m.group(1)}("{clean_title_text(m.group(2))}"', code)
-        
-        return code
+                # If odd number of quotes, this starts a multi-line string
+                if single_quotes % 2 == 1:
+                    in_multiline_string = True
+                    quote_char = "'"
+                    current_line = line
+                    continue
+                elif double_quotes % 2 == 1:
+                    in_multiline_string = True 
+                    quote_char = '"'
+                    current_line = line
+                    continue
+            
+            fixed_lines.append(line)
+        else:
+            # We're in a multi-line string, look for the closing quote
+            current_line += "\\n" + line  # Add escaped newline
+            if quote_char and quote_char in line and not line.endswith('\\' + quote_char):
+                # Found the closing quote, end multi-line string
+                in_multiline_string = False
+                fixed_lines.append(current_line)
+                current_line = ""
+                quote_char = None
     
-    def replace_matplotlib(match):
-        code = match.group(1)
+    code = '\n'.join(fixed_lines)
+    
+    # Now clean the titles - remove emojis and normalize
+    code = re.sub(r"(\w*\.?(?:title|set_title))\('([^']*)'", 
+                 lambda m: f"{m.group(1)}('{clean_title_text(m.group(2))}'", code)
+    
+    code = re.sub(r'(\w*\.?(?:title|set_title))\("([^"]*)"',
+                 lambda m: f'{m.group(1)}("{clean_title_text(m.group(2))}"', code)
+    
+    return code
+
+def render_matplotlib_chart(code, quality='full'):
+    """Execute matplotlib code and return the figure as a base64 PNG string.
+    
+    Results are cached by code hash and quality, so repeated renders of the
+    same block (streaming ticks, re-renders of archived lessons) skip
+    execution. A 'preview' request is served from the full-quality render
+    when that already exists. Raises on execution errors; callers decide how
+    to present them.
+    """
+    if quality != 'full':
+        img_str = get_cached_chart(_chart_cache_key(code))
+        if img_str is not None:
+            return img_str
+    cache_key = _chart_cache_key(code, quality)
+    img_str = get_cached_chart(cache_key)
+    if img_str is not None:
+        return img_str
+    
+    try:
+        with _matplotlib_lock:
+            img_str = _execute_matplotlib_chart(code, CHART_QUALITY[quality],
+                                                abandoned=lambda: cache_key in _chart_abandoned)
+    finally:
+        _chart_abandoned.discard(cache_key)
+    store_cached_chart(cache_key, img_str)
+    return img_str
+
+def _execute_matplotlib_chart(code, save_options, abandoned=None):
+    """Run chart code and encode the figure; stops with CancelledError once `abandoned()` is true"""
+    plt = _pyplot()
+    import matplotlib
+    try:
+        # Clean the code to remove emojis from titles and plt.show() calls
+        cleaned_code = clean_matplotlib_code(code)
+    
+        # Close any existing figures to prevent memory leaks and warnings
+        plt.close('all')
+    
+        # Create a new figure with minimal styling
+        plt.figure(figsize=(10, 6))
+        plt.style.use('seaborn-v0_8-whitegrid')
+    
+        # Create execution context with necessary imports
+        exec_globals = {
+            'plt': plt,
+            'matplotlib': matplotlib,
+            '__builtins__': __builtins__
+        }
+    
+        # Add optional imports with error handling
+        try:
+            import numpy as np
+            exec_globals['np'] = np
+            exec_globals['numpy'] = np
+        except ImportError:
+            pass
         
         try:
-            # Clean the code to remove emojis from titles and plt.show() calls
-            cleaned_code = clean_matplotlib_code(code)
-            
-            # Close any existing figures to prevent memory leaks and warnings
-            plt.close('all')
-            
-            # Create a new figure with minimal styling
-            plt.figure(figsize=(10, 6))
-            plt.style.use('seaborn-v0_8-whitegrid')
-            
-            # Create execution context with necessary imports
-            exec_globals = {
-                'plt': plt,
-                'matplotlib': matplotlib,
-                '__builtins__': __builtins__
-            }
-            
-            # Add optional imports with error handling
-            try:
-                import numpy as np
-                exec_globals['np'] = np
-                exec_globals['numpy'] = np
-            except ImportError:
-                pass
-                
+            import seaborn as sns
+            exec_globals['sns'] = sns
+            exec_globals['seaborn'] = sns
+        except ImportError:
+            pass
+        
+        try:
+            import pandas as pd
+            exec_globals['pd'] = pd
+            exec_globals['pandas'] = pd
+        except ImportError:
+            pass
+        
+        # Add standard library modules
+        import math
+        import random
+        exec_globals['math'] = math
+        exec_globals['random'] = random
+    
+        if abandoned is not None and abandoned():
+            raise CancelledError("Chart render abandoned")
+        
+        # Execute the cleaned matplotlib code with comprehensive warning suppression
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            exec(cleaned_code, exec_globals)
+    
+        # Drawing is the expensive part; skip it when nobody wants the chart anymore
+        if abandoned is not None and abandoned():
+            raise CancelledError("Chart render abandoned")
+        
+        # Save plot to base64 string with warning suppression
+        img_buffer = io.BytesIO()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            plt.savefig(img_buffer, format='png', facecolor='#faf9f7', edgecolor='none', **save_options)
+        img_buffer.seek(0)
+        img_str = base64.b64encode(img_buffer.getvalue()).decode()
+        plt.close('all')  # Close all figures to free memory and prevent warnings
+    except Exception:
+        # Ensure cleanup even on error
+        plt.close('all')
+        raise
+    return img_str
+
+# Background chart execution, so streaming never blocks on a chart. One worker
+# suffices since execution is serialized by _matplotlib_lock anyway.
+_chart_executor = ThreadPoolExecutor(max_workers=int(os.getenv("CHART_WORKERS", "1")), thread_name_prefix="chart")
+_chart_futures = {}  # (cache key) -> Future; failed renders stay to avoid re-running them
+_chart_owners = {}  # (cache key) -> requests that may withdraw from the pending render
+_chart_abandoned = set()  # (cache key) of running renders every owner withdrew from
+_chart_futures_lock = threading.Lock()
+
+def _forget_chart_future(key, future):
+    with _chart_futures_lock:
+        if _chart_futures.get(key) is future:
+            _chart_owners.pop(key, None)
+            if future.cancelled() or isinstance(future.exception(), (type(None), CancelledError)):
+                _chart_futures.pop(key, None)  # The chart cache holds the result now
+
+def submit_chart(code, quality='full', owner=None):
+    """Dispatch a chart render; returns a Future of the base64 PNG.
+    
+    Requests for the same chart and quality share one future, and cached
+    charts return an already completed one. An `owner` (e.g. a streaming
+    request) can later withdraw with cancel_chart(); callers that block on
+    the future must resubmit if it was cancelled.
+    """
+    key = _chart_cache_key(code, quality)
+    with _chart_futures_lock:
+        future = _chart_futures.get(key)
+        if future is not None:
+            if owner is not None and not future.done():
+                _chart_owners.setdefault(key, set()).add(owner)
+            return future
+        img_str = get_cached_chart(key)
+        if img_str is None and quality != 'full':
+            img_str = get_cached_chart(_chart_cache_key(code))
+        if img_str is not None:
+            future = Future()
+            future.set_result(img_str)
+            return future
+        if len(_chart_futures) > 1024:
+            _chart_futures.clear()
+            _chart_owners.clear()
+        _chart_abandoned.discard(key)  # Wanted again: a running render may finish after all
+        future = _chart_futures[key] = _chart_executor.submit(render_matplotlib_chart, code, quality)
+        if owner is not None:
+            _chart_owners[key] = {owner}
+    future.add_done_callback(lambda f: _forget_chart_future(key, f))
+    return future
+
+def cancel_chart(code, quality='full', owner=None):
+    """Withdraw `owner`'s interest in a chart render (e.g. its client left).
+
+    The render is cancelled when no other owner remains; one that already
+    runs stops before drawing the figure. Returns whether it was cancelled.
+    """
+    key = _chart_cache_key(code, quality)
+    with _chart_futures_lock:
+        future = _chart_futures.get(key)
+        if future is None or future.done():
+            return False
+        owners = _chart_owners.get(key, set())
+        owners.discard(owner)
+        if owners:
+            return False
+        # Forget it first so nobody picks up a future that is about to be cancelled
+        _chart_futures.pop(key, None)
+        _chart_owners.pop(key, None)
+    if future.cancel():  # Runs the done callback, so not under the lock
+        return True
+    with _chart_futures_lock:
+        if future.done() or key in _chart_futures:
+            return False  # Finished meanwhile, or someone asked for it again
+        _chart_abandoned.add(key)
+    return True
+
+WARMUP_CHART = """x = np.linspace(0, 2 * np.pi, 50)
+plt.plot(x, np.sin(x), label='sin')
+plt.title('Warmup')
+plt.legend()"""
+
+WARMUP_MARKDOWN = """# Isınma
+
+Bir **paragraf**, `kod` ve bir tablo.
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+```python
+print("merhaba")
+```
+
+```javascript
+console.log("merhaba");
+```
+"""
+
+def warmup():
+    """Import heavy libraries and run the rendering pipeline once.
+    
+    Returns per-phase timings in milliseconds. Nothing is cached, so the first
+    real chart and lesson still render normally, just without cold-start cost.
+    """
+    timings = {}
+    
+    def phase(name, fn):
+        start = time.perf_counter()
+        fn()
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+    
+    def import_chart_libraries():
+        # Optional libraries the chart sandbox exposes
+        for module in ('numpy', 'pandas', 'seaborn'):
             try:
-                import seaborn as sns
-                exec_globals['sns'] = sns
-                exec_globals['seaborn'] = sns
+                __import__(module)
             except ImportError:
                 pass
-                
+    
+    def render_dummy_chart():
+        # Builds the font cache and loads the style sheet
+        with _matplotlib_lock:
+            _execute_matplotlib_chart(WARMUP_CHART, CHART_QUALITY['preview'])
+    
+    phase('matplotlib', _pyplot)
+    phase('chart_libraries', import_chart_libraries)
+    phase('chart', render_dummy_chart)
+    phase('markdown', lambda: _markdown_processor().convert(WARMUP_MARKDOWN))
+    return timings
+
+# Pattern to match closed ```python.matplotlib code blocks
+MATPLOTLIB_BLOCK_PATTERN = r'```python\.matplotlib\n(.*?)\n```'
+
+# Marker in the document shell where client-side rendering inserts the lesson
+CLIENT_CONTENT_MARKER = '<!--ogrenix:content-->'
+
+def iter_chart_blocks(md_str):
+    """Yield (key, code) for each closed matplotlib block; key is the chart cache key"""
+    for match in re.finditer(MATPLOTLIB_BLOCK_PATTERN, md_str, flags=re.DOTALL):
+        code = match.group(1)
+        yield _chart_cache_key(code), code
+
+def generate_html_shell():
+    """Empty lesson document for client-side rendering (see CLIENT_CONTENT_MARKER)"""
+    return generate_complete_html(CLIENT_CONTENT_MARKER)
+
+def chart_element_id(chart_key, occurrence=0):
+    """
+    Element id of a chart container, stable across interim renders and
+    `asset` events; later copies of the same chart in a lesson get their
+    occurrence index, so ids stay unique (clients update every copy by
+    data-chart-key).
+    """
+    element_id = f"chart_{chart_key[:12]}"
+    return f"{element_id}_{occurrence}" if occurrence else element_id
+
+def process_matplotlib_blocks(md_str, quality='full', wait=True):
+    """Extract and execute matplotlib code blocks, replace with img tags.
+    
+    With wait=False, charts still rendering are left as data-pending
+    placeholders keyed by data-chart-key; the image is delivered separately.
+    """
+    
+    pattern = MATPLOTLIB_BLOCK_PATTERN
+    occurrences = {}  # chart key -> copies seen so far
+    
+    def replace_matplotlib(match):
+        code = match.group(1)
+        chart_key = _chart_cache_key(code)
+        chart_id = chart_element_id(chart_key, occurrences.get(chart_key, 0))
+        occurrences[chart_key] = occurrences.get(chart_key, 0) + 1
+        
+        try:
+            # Report full quality when a preview request is served by the full render
+            chart_quality = 'full' if get_cached_chart(chart_key) is not None else quality
+            future = submit_chart(code, chart_quality)
+            if not wait and not future.done():
+                return f'''<div class="chart-container" id="{chart_id}" data-chart-key="{chart_key}" data-pending="1">
+    <details class="code-toggle">
+        <summary>Kodu Göster</summary>
+        <pre class="code-block"><code class="language-python">{code}</code></pre>
+    </details>
+</div>'''
             try:
-                import pandas as pd
-                exec_globals['pd'] = pd
-                exec_globals['pandas'] = pd
-            except ImportError:
-                pass
-                
-            # Add standard library modules
-            import math
-            import random
-            exec_globals['math'] = math
-            exec_globals['random'] = random
-            
-            # Execute the cleaned matplotlib code with comprehensive warning suppression
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                exec(cleaned_code, exec_globals)
-            
-            # Save plot to base64 string with warning suppression
-            img_buffer = io.BytesIO()
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight', 
-                           facecolor='#faf9f7', edgecolor='none')
-            img_buffer.seek(0)
-            img_str = base64.b64encode(img_buffer.getvalue()).decode()
-            plt.close('all')  # Close all figures to free memory and prevent warnings
+                img_str = future.result()
+            except CancelledError:
+                # Every streaming request that wanted it left before it started
+                img_str = submit_chart(code, chart_quality).result()
             
             # Log tool usage
             agentic_logger.log_tool_usage("matplotlib", code)
             
-            # Generate unique ID for the chart
-            chart_id = f"chart_{uuid.uuid4().hex[:8]}"
-            
             # Return HTML img tag with styling
-            return f'''<div class="chart-container" id="{chart_id}">
+            return f'''<div class="chart-container" id="{chart_id}" data-chart-key="{chart_key}" data-quality="{chart_quality}">
     <img src="data:image/png;base64,{img_str}" alt="Grafik" class="chart-image"/>
     <details class="code-toggle">
         <summary>Kodu Göster</summary>
@@ -341,9 +709,6 @@ def process_matplotlib_blocks(md_str):
 </div>'''
             
         except Exception as e:
-            # Ensure cleanup even on error
-            plt.close('all')
-            
             # Log error
             agentic_logger.log_error("Matplotlib Execution Error", str(e), f"Code: {code[:100]}...")
             
@@ -465,18 +830,44 @@ def generate_complete_html(html_content):
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Ders Notları</title>
     
-    <!-- Mermaid JS -->
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/mermaid/10.9.0/mermaid.min.js"></script>
+    <!-- Mermaid, highlight.js and MathJax: inside the Ogrenix app the parent page
+         hydrates diagrams, code and math lazily (static/js/hydrate.js), so they
+         are only loaded here for standalone pages -->
+    <script>
+        const hydratedByParent = (function () {
+            try { return window.parent !== window && !!window.parent.OgrenixHydrator; } catch (e) { return false; }
+        })();
+        if (!hydratedByParent) {
+            // MathJax reads its configuration when it loads
+            window.MathJax = {
+                tex: {
+                    inlineMath: [['$', '$'], ['\\\\(', '\\\\)']],
+                    displayMath: [['$$', '$$'], ['\\\\[', '\\\\]']]
+                },
+                svg: {
+                    fontCache: 'global'
+                }
+            };
+            [
+                'https://cdnjs.cloudflare.com/ajax/libs/mermaid/10.9.0/mermaid.min.js',
+                'https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js',
+                'https://cdnjs.cloudflare.com/ajax/libs/mathjax/3.2.2/es5/tex-mml-chtml.js'
+            ].forEach(src => {
+                const script = document.createElement('script');
+                script.src = src;
+                script.async = false;  // In order, and before the window load event
+                document.head.appendChild(script);
+            });
+        }
+    </script>
     
     <!-- p5.js -->
     <script src="https://cdnjs.cloudflare.com/ajax/libs/p5.js/1.7.0/p5.min.js"></script>
     
-    <!-- Highlight.js for code syntax highlighting -->
+    <!-- Highlight.js styles for code syntax highlighting -->
     <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/styles/github.min.css">
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js"></script>
-    
-    <!-- MathJax for LaTeX rendering (correct path) -->
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/mathjax/3.2.2/es5/tex-mml-chtml.js"></script>
+    <!-- Pygments styles for server-highlighted code (highlight.js skips those blocks) -->
+    <style>{pygments_css}</style>
     
     <!-- Inter Font -->
     <link rel="preconnect" href="https://fonts.googleapis.com">
@@ -965,8 +1356,9 @@ def generate_complete_html(html_content):
     </div>
     
     <script>
-        // Initialize Mermaid once and render any present diagrams
-        (function ensureMermaidInitialized() {
+        // Initialize Mermaid once and render any present diagrams (standalone pages
+        // only; the libraries loaded in <head> are there by the window load event)
+        function ensureMermaidInitialized() {
             try {
                 if (!window.__MERMAID_INITED__) {
                     mermaid.initialize({{
@@ -1003,10 +1395,15 @@ def generate_complete_html(html_content):
             }} catch (e) {{
                 console.warn('Mermaid init error:', e);
             }}
-        }})();
+        }}
         
-        // Initialize syntax highlighting
-        hljs.highlightAll();
+        if (!hydratedByParent) {
+            window.addEventListener('load', () => {
+                ensureMermaidInitialized();
+                // Initialize syntax highlighting
+                hljs.highlightAll();
+            });
+        }
         
         // Initialize p5.js sketches after DOM and p5.js are fully loaded
         function waitForP5AndInitialize() {
@@ -1024,17 +1421,6 @@ def generate_complete_html(html_content):
             waitForP5AndInitialize();
         }
         
-        // Configure MathJax
-        window.MathJax = {
-            tex: {
-                inlineMath: [['$', '$'], ['\\(', '\\)']],
-                displayMath: [['$$', '$$'], ['\\[', '\\]']]
-            },
-            svg: {
-                fontCache: 'global'
-            }
-        };
-        
         // Add smooth scrolling for anchor links (avoid double-jump jitter)
         document.querySelectorAll('a[href^="#"]').forEach(anchor => {
             anchor.addEventListener('click', function (e) {
@@ -1062,6 +1448,7 @@ def generate_complete_html(html_content):
 
     # Normalize escaped braces used earlier for f-strings, then inject content
     normalized = html_tpl.replace("{{", "{").replace("}}", "}")
+    normalized = normalized.replace("{pygments_css}", _pygments_css())
     return normalized.replace("{html_content}", html_content)
 
 # Example usage and test
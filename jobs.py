@@ -0,0 +1,288 @@
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from shared_cache import SharedCache, shared_cache
+
+# Events kept per job for replay; older ones are summarised by a `resync` event
+JOB_EVENT_LOG_SIZE = int(os.getenv("JOB_EVENT_LOG_SIZE", "2000"))
+# A job nobody is listening to is cancelled after this long (reconnect window)
+JOB_DETACHED_GRACE_S = float(os.getenv("JOB_DETACHED_GRACE_S", "30"))
+# Finished jobs stay replayable this long
+JOB_RETENTION_S = float(os.getenv("JOB_RETENTION_S", "300"))
+JOB_KEEPALIVE_S = 15
+# Readers in another worker poll the shared cache at this interval
+JOB_POLL_S = 0.2
+# ...and give up when the owning worker has not written anything for this long
+JOB_STALL_S = 120
+# Full-HTML `content` snapshots are mirrored to the shared cache at most this often
+JOB_MIRROR_CONTENT_S = 1.0
+
+
+def _event_payload(event: str) -> Dict:
+    return json.loads(event[len("data: "):])
+
+
+class GenerationJob:
+    """
+    One lesson generation running independently of any HTTP connection.
+
+    Events ("data: {json}\\n\\n" strings) are appended to a bounded log with
+    consecutive sequence numbers, which readers replay from any point and then
+    follow live. Only the newest `content` snapshot is kept, since each one
+    replaces the previous. With a shared cache, events are mirrored there so
+    readers connected to another worker process can follow the job too.
+
+    The event generator is created by `make_events(job)`, so it can register
+    cancel hooks: cancel() runs them on the cancelling thread right away,
+    since the generator itself may be blocked (on upstream, a chart) and only
+    notices the cancellation at its next event.
+    """
+
+    def __init__(self, job_id: str, make_events: Callable[["GenerationJob"], Iterator[str]],
+                 log_size: int = JOB_EVENT_LOG_SIZE, mirror: Optional[SharedCache] = None):
+        self.id = job_id
+        self.log: deque = deque(maxlen=log_size)  # [seq, event or None if superseded, text length before it]
+        self.next_seq = 1
+        self.start_event: Optional[str] = None  # Replayed to new readers after the log wrapped
+        self.text: List[str] = []  # Raw `chunk` text, for resyncing readers that missed chunks
+        self.text_length = 0
+        self.latest_content: Optional[list] = None
+        self.readers = 0
+        self.finished_at: Optional[float] = None
+        self.cancelled = threading.Event()
+        self.cancel_hooks: List[Callable[[], None]] = []
+        self.changed = threading.Condition()
+        self.mirror = mirror
+        self.mirrored_content_at = 0.0
+        self._events = make_events(self)
+        self._mirror_head(0)  # Makes the job known to other workers right away
+        threading.Thread(target=self._run, name=f"job-{job_id[:8]}", daemon=True).start()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def _run(self):
+        try:
+            for event in self._events:
+                self._append(event)
+                if self.cancelled.is_set():
+                    break
+        except Exception as e:
+            self._append(f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n")
+            self._append(f"data: {json.dumps({'type': 'end'})}\n\n")
+        finally:
+            # On cancellation this runs the generator's cleanup (upstream, charts, admission)
+            self._events.close()
+            with self.changed:
+                self.finished_at = time.time()
+                last_seq = self.next_seq - 1
+                self.changed.notify_all()
+            self._mirror_head(last_seq)
+
+    def on_cancel(self, hook: Callable[[], None]):
+        """Run `hook` when the job is cancelled (at once if it already was)"""
+        with self.changed:
+            if not self.cancelled.is_set():
+                self.cancel_hooks.append(hook)
+                return
+        hook()
+
+    def cancel(self):
+        """Stop the job: set the flag and run the cancel hooks on this thread"""
+        with self.changed:
+            if self.cancelled.is_set() or self.finished:
+                return
+            self.cancelled.set()
+            hooks, self.cancel_hooks = self.cancel_hooks, []
+        for hook in hooks:
+            try:
+                hook()
+            except Exception:
+                pass  # The generator's own cleanup still runs when it closes
+
+    def _append(self, event: str):
+        payload = _event_payload(event)
+        with self.changed:
+            seq = self.next_seq
+            self.next_seq += 1
+            entry = [seq, event, self.text_length]
+            kind = payload.get("type")
+            if kind == "chunk":
+                self.text.append(payload["chunk"])
+                self.text_length += len(payload["chunk"])
+            elif kind == "start":
+                self.start_event = event
+            elif kind == "content":
+                if self.latest_content is not None:
+                    self.latest_content[1] = None
+                self.latest_content = entry
+            self.log.append(entry)
+            self.changed.notify_all()
+        if self.mirror is not None:
+            now = time.time()
+            if kind == "content":
+                if now - self.mirrored_content_at < JOB_MIRROR_CONTENT_S:
+                    return
+                self.mirrored_content_at = now
+            self.mirror.set("job", f"{self.id}:{seq}", event, ttl=JOB_RETENTION_S)
+            self._mirror_head(seq)
+
+    def _mirror_head(self, seq: int):
+        if self.mirror is not None:
+            head = json.dumps({"seq": seq, "finished": self.finished})
+            self.mirror.set("job", f"{self.id}:head", head, ttl=JOB_RETENTION_S)
+
+    def read(self, cursor: int, timeout: float) -> Tuple[Optional[str], List[Tuple[int, Optional[str]]], bool]:
+        """
+        Events after sequence number `cursor`, waiting up to `timeout` for new
+        ones. Returns (resync, entries, finished): resync is the chunk text
+        before the first entry when events after `cursor` were already dropped
+        from the log, else None.
+        """
+        with self.changed:
+            if self.next_seq - 1 <= cursor and not self.finished:
+                self.changed.wait(timeout)
+            first_seq = self.log[0][0] if self.log else self.next_seq
+            resync = None
+            if cursor + 1 < first_seq:
+                text_length = self.log[0][2] if self.log else self.text_length
+                resync = "".join(self.text)[:text_length]
+            entries = [(seq, event) for seq, event, _ in
+                       itertools.islice(self.log, max(0, cursor + 1 - first_seq), None)]
+            return resync, entries, self.finished
+
+    def stream(self, cursor: int = 0) -> Iterator[str]:
+        """SSE stream of the events after `cursor` (with `id:` lines), following the job live"""
+        self._attach()
+        try:
+            while True:
+                resync, entries, finished = self.read(cursor, JOB_KEEPALIVE_S)
+                if resync is not None:
+                    if cursor == 0 and self.start_event:
+                        yield self.start_event
+                    yield f"data: {json.dumps({'type': 'resync', 'markdown': resync})}\n\n"
+                for seq, event in entries:
+                    cursor = seq
+                    if event is not None:
+                        yield f"id: {seq}\n{event}"
+                if finished:
+                    return
+                if not entries and resync is None:
+                    yield ": keepalive\n\n"
+        finally:
+            self._detach()
+
+    def _attach(self):
+        with self.changed:
+            self.readers += 1
+
+    def _detach(self):
+        with self.changed:
+            self.readers -= 1
+            idle = self.readers == 0 and not self.finished
+        if idle:
+            self._schedule_idle_check()
+
+    def _schedule_idle_check(self):
+        timer = threading.Timer(JOB_DETACHED_GRACE_S, self._cancel_if_idle)
+        timer.daemon = True
+        timer.start()
+
+    def _cancel_if_idle(self):
+        with self.changed:
+            if self.readers or self.finished:
+                return
+        if self.mirror is not None:
+            heartbeat = self.mirror.get("job", f"{self.id}:reader")
+            if heartbeat and time.time() - float(heartbeat) < JOB_DETACHED_GRACE_S:
+                self._schedule_idle_check()  # Someone follows it from another worker
+                return
+        self.cancel()
+
+
+def _remote_stream(cache: SharedCache, job_id: str, cursor: int) -> Iterator[str]:
+    """Follow a job owned by another worker process through the shared cache"""
+    last_progress = last_keepalive = time.time()
+    last_heartbeat = 0.0
+    while True:
+        now = time.time()
+        if now - last_heartbeat >= JOB_DETACHED_GRACE_S / 3:
+            # Keeps the owner from cancelling the job as abandoned
+            cache.set("job", f"{job_id}:reader", str(now), ttl=JOB_DETACHED_GRACE_S)
+            last_heartbeat = now
+        head = cache.get("job", f"{job_id}:head")
+        if head is None:
+            return
+        head = json.loads(head)
+        for seq in range(cursor + 1, head["seq"] + 1):
+            event = cache.get("job", f"{job_id}:{seq}")
+            cursor = seq
+            if event is not None:  # Superseded snapshots are not mirrored
+                yield f"id: {seq}\n{event}"
+            last_progress = last_keepalive = now
+        if head["finished"] and cursor >= head["seq"]:
+            return
+        if now - last_progress > JOB_STALL_S:
+            yield f"data: {json.dumps({'type': 'error', 'error': 'Generation job stopped responding'})}\n\n"
+            yield f"data: {json.dumps({'type': 'end'})}\n\n"
+            return
+        if now - last_keepalive >= JOB_KEEPALIVE_S:
+            yield ": keepalive\n\n"
+            last_keepalive = now
+        time.sleep(JOB_POLL_S)
+
+
+class JobRegistry:
+    """Running and recently finished generation jobs of this process"""
+
+    def __init__(self, shared: Optional[SharedCache] = None, retention_s: float = JOB_RETENTION_S):
+        self.shared = shared
+        self.retention_s = retention_s
+        self.jobs: Dict[str, GenerationJob] = {}
+        self.lock = threading.Lock()
+
+    def _prune(self):
+        now = time.time()
+        with self.lock:
+            for job_id in [job_id for job_id, job in self.jobs.items()
+                           if job.finished and now - job.finished_at > self.retention_s]:
+                del self.jobs[job_id]
+
+    def start(self, make_events: Callable[[GenerationJob], Iterator[str]]) -> GenerationJob:
+        """Run the event generator made by `make_events(job)` as a detached job"""
+        self._prune()
+        job = GenerationJob(uuid.uuid4().hex, make_events, mirror=self.shared)
+        with self.lock:
+            self.jobs[job.id] = job
+        return job
+
+    def stream(self, job_id: str, cursor: int = 0) -> Optional[Iterator[str]]:
+        """SSE stream of a job's events after `cursor`, or None if the job is unknown"""
+        self._prune()
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            return job.stream(cursor)
+        if self.shared is not None and self.shared.get("job", f"{job_id}:head") is not None:
+            return _remote_stream(self.shared, job_id, cursor)
+        return None
+
+    def status(self) -> Dict:
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return {
+            "running": sum(1 for job in jobs if not job.finished),
+            "finished": sum(1 for job in jobs if job.finished),
+            "readers": sum(job.readers for job in jobs),
+        }
+
+
+# Global registry; jobs are mirrored to the shared cache when one is configured
+generation_jobs = JobRegistry(shared_cache)
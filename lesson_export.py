@@ -0,0 +1,234 @@
+"""Offline lesson bundles: ZIP archives streamed while they are built.
+
+A lesson bundle contains:
+    index.html      the rendered lesson, pointing at the files below
+    lesson.md       the source markdown
+    charts/*.png    matplotlib charts as separate images (not data URIs)
+    vendor/*        Mermaid, p5.js, highlight.js and MathJax copies
+
+A class bundle holds one folder per lesson, a single shared vendor/ folder and
+an index.html listing the lessons. Archives are written to an unseekable
+stream, so only the current file's compressed output is held in memory.
+"""
+import base64
+import html
+import os
+import re
+import threading
+import time
+import unicodedata
+import urllib.request
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from agentic_logger import agentic_logger
+from generate_html import generate_html, get_cached_chart, iter_chart_blocks
+
+# CDN assets referenced by the lesson template -> file name in vendor/
+VENDOR_ASSETS = {
+    "https://cdnjs.cloudflare.com/ajax/libs/mermaid/10.9.0/mermaid.min.js": "mermaid.min.js",
+    "https://cdnjs.cloudflare.com/ajax/libs/p5.js/1.7.0/p5.min.js": "p5.min.js",
+    "https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/styles/github.min.css": "github.min.css",
+    "https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js": "highlight.min.js",
+    "https://cdnjs.cloudflare.com/ajax/libs/mathjax/3.2.2/es5/tex-mml-chtml.js": "tex-mml-chtml.js",
+}
+
+# Local copies of the vendor assets, downloaded on first export if missing
+VENDOR_DIR = os.getenv("VENDOR_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "vendor"))
+
+COPY_BLOCK_SIZE = 64 * 1024
+
+# After a failed download, exports keep the CDN link for this long before retrying
+VENDOR_RETRY_S = 600
+
+_vendor_lock = threading.Lock()
+_vendor_failures = {}  # url -> time of the last failed download
+
+
+def vendor_file(url: str) -> Optional[str]:
+    """Path of the local copy of a vendor asset, or None if it cannot be fetched"""
+    path = os.path.join(VENDOR_DIR, VENDOR_ASSETS[url])
+    if os.path.exists(path):
+        return path
+    with _vendor_lock:
+        if os.path.exists(path):
+            return path
+        if time.time() - _vendor_failures.get(url, 0) < VENDOR_RETRY_S:
+            return None
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(VENDOR_DIR, exist_ok=True)
+            with urllib.request.urlopen(url, timeout=30) as response, open(tmp_path, "wb") as f:
+                while True:
+                    block = response.read(COPY_BLOCK_SIZE)
+                    if not block:
+                        break
+                    f.write(block)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            _vendor_failures[url] = time.time()
+            agentic_logger.log_error("Export Vendor Download Error", str(e), url)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return None
+    return path
+
+
+def available_vendor_files() -> Dict[str, str]:
+    """CDN url -> local path for every vendor asset that is available"""
+    files = {}
+    for url in VENDOR_ASSETS:
+        path = vendor_file(url)
+        if path:
+            files[url] = path
+    return files
+
+
+def lesson_slug(question: str, max_length: int = 60) -> str:
+    """ASCII file name for a lesson ("Türev nedir?" -> "turev-nedir")"""
+    text = unicodedata.normalize("NFKD", question.casefold().replace("ı", "i"))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    slug = re.sub(r"[^a-z0-9]+", "-", text).strip("-")
+    return slug[:max_length].rstrip("-") or "ders"
+
+
+def render_offline_lesson(markdown: str, vendor_files: Dict[str, str], vendor_prefix: str = "vendor/"):
+    """Render a lesson for offline use.
+
+    Returns (html, charts) where charts is a list of (file name, base64 PNG)
+    and the HTML refers to charts/<file name> and the vendored assets.
+    """
+    page = generate_html(markdown)
+    charts = []
+    for key, _ in iter_chart_blocks(markdown):
+        img_str = get_cached_chart(key)
+        data_uri = f"data:image/png;base64,{img_str}"
+        if img_str is None or data_uri not in page:
+            continue  # Failed charts are rendered as error boxes
+        charts.append((f"{key}.png", img_str))
+        page = page.replace(data_uri, f"charts/{key}.png")
+    for url in vendor_files:
+        page = page.replace(url, vendor_prefix + VENDOR_ASSETS[url])
+    return page, charts
+
+
+class _ZipStream:
+    """Write-only file object for zipfile that hands out bytes as they are written"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+class ZipBuilder:
+    """Builds a ZIP archive incrementally; each add_* method yields the bytes produced"""
+
+    def __init__(self):
+        self._stream = _ZipStream()
+        # No tell() failure but no seek() either: zipfile falls back to data descriptors
+        self._zip = zipfile.ZipFile(self._stream, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def _info(self, name: str, compress: bool) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        return info
+
+    def add_bytes(self, name: str, data: bytes, compress: bool = True) -> Iterator[bytes]:
+        self._zip.writestr(self._info(name, compress), data)
+        yield self._stream.drain()
+
+    def add_file(self, name: str, path: str, compress: bool = True) -> Iterator[bytes]:
+        with open(path, "rb") as src, self._zip.open(self._info(name, compress), "w") as dest:
+            while True:
+                block = src.read(COPY_BLOCK_SIZE)
+                if not block:
+                    break
+                dest.write(block)
+                yield self._stream.drain()
+        yield self._stream.drain()
+
+    def finish(self) -> Iterator[bytes]:
+        self._zip.close()
+        yield self._stream.drain()
+
+
+def _lesson_files(builder: ZipBuilder, lesson: Dict, vendor_files: Dict[str, str],
+                  folder: str = "", vendor_prefix: str = "vendor/") -> Iterator[bytes]:
+    page, charts = render_offline_lesson(lesson["markdown"], vendor_files, vendor_prefix)
+    yield from builder.add_bytes(f"{folder}index.html", page.encode("utf-8"))
+    yield from builder.add_bytes(f"{folder}lesson.md", lesson["markdown"].encode("utf-8"))
+    for name, img_str in charts:
+        # PNG data is already compressed
+        yield from builder.add_bytes(f"{folder}charts/{name}", base64.b64decode(img_str), compress=False)
+
+
+def _vendor_files(builder: ZipBuilder, vendor_files: Dict[str, str]) -> Iterator[bytes]:
+    for url, path in vendor_files.items():
+        yield from builder.add_file(f"vendor/{VENDOR_ASSETS[url]}", path)
+
+
+def export_lesson(lesson: Dict) -> Iterator[bytes]:
+    """Stream the ZIP bundle of one lesson"""
+    builder = ZipBuilder()
+    vendor_files = available_vendor_files()
+    yield from _lesson_files(builder, lesson, vendor_files)
+    yield from _vendor_files(builder, vendor_files)
+    yield from builder.finish()
+
+
+def _class_index(title: str, entries: List[tuple]) -> str:
+    items = "\n".join(
+        f'        <li><a href="{html.escape(folder)}index.html">{html.escape(question)}</a></li>'
+        for folder, question in entries
+    )
+    return f'''<!DOCTYPE html>
+<html lang="tr">
+<head>
+    <meta charset="UTF-8">
+    <title>{html.escape(title)}</title>
+    <style>body {{ font-family: sans-serif; max-width: 720px; margin: 3rem auto; color: #2c2a26; background: #faf9f7; }}</style>
+</head>
+<body>
+    <h1>{html.escape(title)}</h1>
+    <ol>
+{items}
+    </ol>
+</body>
+</html>
+'''
+
+
+def export_lessons(lessons: Iterable[Dict], title: str) -> Iterator[bytes]:
+    """Stream one ZIP holding several lessons (e.g. a class's history) with shared vendor files"""
+    builder = ZipBuilder()
+    vendor_files = available_vendor_files()
+    entries = []
+    for number, lesson in enumerate(lessons, 1):
+        folder = f"{number:03d}-{lesson_slug(lesson['question'])}/"
+        try:
+            yield from _lesson_files(builder, lesson, vendor_files, folder, vendor_prefix="../vendor/")
+        except Exception as e:
+            agentic_logger.log_error("Export Error", str(e), f"Lesson: {lesson['question'][:100]}")
+            continue
+        entries.append((folder, lesson["question"]))
+    yield from builder.add_bytes("index.html", _class_index(title, entries).encode("utf-8"))
+    yield from _vendor_files(builder, vendor_files)
+    yield from builder.finish()
@@ -0,0 +1,697 @@
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from prompts import add_cache_control, messages_length
+
+CLOUD_BASE_URL = "https://openrouter.ai/api/v1"
+CLOUD_MODEL = "anthropic/claude-3.7-sonnet@preset/fastest-provider"
+LOCAL_BASE_URL = "http://0.0.0.0:8000/v1"
+LOCAL_MODEL = "unsloth/GLM-4-32B-0414-unsloth-bnb-4bit"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. After `failure_threshold` failures the
+    circuit opens for `cooldown` seconds; then a single trial request is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.time() - self.opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Whether a request may be sent (reserves the half-open trial slot)"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at < self.cooldown or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+
+    def record_abandoned(self):
+        """A request was cancelled before it showed success or failure"""
+        with self.lock:
+            self.trial_in_flight = False
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent traffic (plus a small floor), so a
+    failing upstream sees at most ~ratio extra load instead of a retry storm.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10, window: float = 60.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self.requests: deque = deque()
+        self.retries: deque = deque()
+        self.lock = threading.Lock()
+
+    def _trim(self, now: float):
+        for events in (self.requests, self.retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self):
+        with self.lock:
+            now = time.time()
+            self._trim(now)
+            self.requests.append(now)
+
+    def try_withdraw(self) -> bool:
+        """Reserve one retry if the budget allows it"""
+        with self.lock:
+            now = time.time()
+            self._trim(now)
+            if len(self.retries) >= self.min_retries + self.ratio * len(self.requests):
+                return False
+            self.retries.append(now)
+            return True
+
+
+class LatencyTracker:
+    """Rolling window of time-to-first-token samples"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Nearest-rank quantile, or None until enough samples were seen"""
+        with self.lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _transport_errors() -> Tuple[type, ...]:
+    """Exception types of a failed connection or a timeout"""
+    import openai
+
+    errors: Tuple[type, ...] = (openai.APIConnectionError, OSError, NoBackendAvailable)
+    try:
+        import httpx  # The openai client's transport; broken streams surface as its errors
+        errors += (httpx.TransportError,)
+    except ImportError:
+        pass
+    return errors
+
+
+def is_backend_error(error: Exception) -> bool:
+    """Failures of the backend or the way to it, as opposed to bugs in this process"""
+    import openai
+
+    return isinstance(error, (openai.APIError,) + _transport_errors())
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transport failures, timeouts, 429 and 5xx are worth retrying; other 4xx and bugs are not"""
+    import openai
+
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return isinstance(error, _transport_errors())
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class Backend:
+    """One OpenAI-compatible endpoint (a vLLM replica or the cloud provider)"""
+
+    def __init__(self, name: str, base_url: str, model: str, api_key: str = "EMPTY",
+                 kind: str = "local", cache_control: bool = False, max_outstanding: int = 8,
+                 continuation_params: Optional[Dict] = None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.kind = kind
+        self.cache_control = cache_control
+        self.max_outstanding = max_outstanding
+        # Extra request body that makes the server continue a trailing assistant message
+        self.continuation_params = continuation_params
+        self._client = None  # Created on first use; importing openai is slow
+        self.api_key = api_key
+        self.breaker = CircuitBreaker()
+        self.healthy = True
+        self.outstanding = 0
+        self.dispatched = 0  # Breaks load ties so idle replicas take turns
+        self.upstream_waiting = 0  # Queue depth reported by the server itself (vLLM /metrics)
+        self.lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            with self.lock:
+                if self._client is None:
+                    # Local replicas fail fast so the router can move on to the next one
+                    self._client = OpenAI(base_url=self.base_url, api_key=self.api_key,
+                                          max_retries=0 if self.kind == "local" else 2)
+        return self._client
+
+    @property
+    def load(self) -> int:
+        return self.outstanding + self.upstream_waiting
+
+    def available(self) -> bool:
+        return self.healthy and self.breaker.state != "open"
+
+    def prepare_messages(self, messages: List[Dict]) -> List[Dict]:
+        return add_cache_control(messages) if self.cache_control else messages
+
+    def request_kwargs(self, continuation: bool) -> Dict:
+        if continuation and self.continuation_params:
+            return {"extra_body": dict(self.continuation_params)}
+        return {}
+
+    def probe(self, timeout: float = 2.0):
+        """Active health check; local backends also report their waiting queue"""
+        import requests  # Only the health checker needs it; keeps router imports light
+        try:
+            response = requests.get(f"{self.base_url}/models", timeout=timeout,
+                                    headers={"Authorization": f"Bearer {self.api_key}"})
+            self.healthy = response.ok
+        except requests.RequestException:
+            self.healthy = False
+            return
+        if self.kind != "local":
+            return
+        try:
+            root_url = self.base_url[:-3] if self.base_url.endswith("/v1") else self.base_url
+            metrics = requests.get(f"{root_url}/metrics", timeout=timeout)
+            if metrics.ok:
+                self.upstream_waiting = int(sum(
+                    float(line.rsplit(" ", 1)[1])
+                    for line in metrics.text.splitlines()
+                    if line.startswith("vllm:num_requests_waiting")
+                ))
+        except (requests.RequestException, ValueError, IndexError):
+            pass
+
+    def status(self) -> Dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "model": self.model,
+            "healthy": self.healthy,
+            "circuit": self.breaker.state,
+            "outstanding": self.outstanding,
+            "dispatched": self.dispatched,
+            "upstream_waiting": self.upstream_waiting,
+        }
+
+
+class NoBackendAvailable(RuntimeError):
+    pass
+
+
+class StreamCancelled(Exception):
+    """The stream was stopped through its UpstreamAbort"""
+
+
+class UpstreamAbort:
+    """
+    Lets another thread stop a router stream: open upstream responses are
+    closed, so the reading thread fails at its next read instead of passing
+    on more tokens, and the failure is neither retried nor resumed.
+    """
+
+    def __init__(self):
+        self.aborted = False
+        self.responses = set()
+        self.lock = threading.Lock()
+
+    def track(self, response) -> bool:
+        """Register an open response; False (and nothing registered) once aborted"""
+        with self.lock:
+            if self.aborted:
+                return False
+            self.responses.add(response)
+            return True
+
+    def untrack(self, response):
+        with self.lock:
+            self.responses.discard(response)
+
+    def abort(self):
+        with self.lock:
+            self.aborted = True
+            responses, self.responses = list(self.responses), set()
+        for response in responses:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+
+_STREAM_END = object()
+
+
+class _StreamPump:
+    """
+    Reads one upstream stream on a background thread and forwards each chunk
+    (then _STREAM_END or the exception) to a queue shared by racing streams.
+    A cancelled pump stops at its next chunk and closes the upstream response.
+    """
+
+    def __init__(self, backend: Backend, chunks: Iterator[str], events: queue.Queue,
+                 on_cancelled: Optional[Callable[[int], None]] = None):
+        self.backend = backend
+        self.chunks = chunks
+        self.events = events
+        self.on_cancelled = on_cancelled  # Called with the estimated tokens read
+        self.started = time.time()
+        self.received_chars = 0
+        self.cancelled = threading.Event()
+        threading.Thread(target=self._run, name=f"llm-stream-{backend.name}", daemon=True).start()
+
+    def _run(self):
+        try:
+            for content in self.chunks:
+                self.received_chars += len(content)
+                if self.cancelled.is_set():
+                    break
+                self.events.put((self, content))
+            else:
+                self.events.put((self, _STREAM_END))
+        except Exception as e:
+            self.events.put((self, e))
+        finally:
+            self.chunks.close()
+            if self.cancelled.is_set() and self.on_cancelled:
+                # Same rough estimate as for prompts: about 4 characters per token
+                self.on_cancelled(max(1, self.received_chars // 4) if self.received_chars else 0)
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class LLMRouter:
+    """
+    Spreads requests over several backends. Local replicas are preferred and
+    picked by least outstanding requests; the cloud backend takes over when
+    every local replica is unhealthy, has an open circuit or is past its queue
+    limit. A backend that fails before producing a token is skipped and the
+    next candidate is tried.
+
+    With hedging enabled, a request whose first token has not arrived within
+    the rolling `hedge_quantile` of recent time-to-first-token is sent again
+    to a different target: another candidate or one of `hedge_backends` (an
+    alternate model only used for hedging). Whichever stream yields first is
+    used and the other is cancelled. Without a distinct target the request
+    is not hedged, since repeating it would only double the spend.
+    """
+
+    def __init__(self, backends: List[Backend], probe_interval: float = 10.0, max_retries: int = 4,
+                 retry_budget: Optional[RetryBudget] = None, hedge: bool = False,
+                 hedge_quantile: float = 0.9, hedge_delay_bounds: Tuple[float, float] = (0.25, 10.0),
+                 hedge_initial_delay: float = 3.0, hedge_backends: Optional[List[Backend]] = None):
+        self.backends = backends
+        self.hedge_backends = hedge_backends or []
+        self.probe_interval = probe_interval
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget or RetryBudget()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay_bounds = hedge_delay_bounds
+        self.hedge_initial_delay = hedge_initial_delay  # Used until enough TTFT samples exist
+        self.ttft = LatencyTracker()
+        self.metrics = {"requests": 0, "retries": 0, "resumptions": 0, "budget_exhausted": 0,
+                        "hedged": 0, "hedge_wins": 0,
+                        # Estimated extra spend of hedged requests: the prompt is billed
+                        # again, plus whatever the cancelled stream had produced
+                        "hedge_extra_prompt_tokens": 0, "hedge_wasted_tokens": 0}
+        self.metrics_lock = threading.Lock()
+        self._probe_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start_health_checks(self):
+        if self._probe_thread or not self.probe_interval:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                for backend in self.backends + self.hedge_backends:
+                    backend.probe()
+                self._stop.wait(self.probe_interval)
+
+        self._probe_thread = threading.Thread(target=loop, name="llm-health-probe", daemon=True)
+        self._probe_thread.start()
+
+    def stop_health_checks(self):
+        self._stop.set()
+
+    def candidates(self) -> List[Backend]:
+        """Backends in the order they should be tried for the next request"""
+        local = sorted((b for b in self.backends if b.kind == "local" and b.available()), key=lambda b: (b.load, b.dispatched))
+        cloud = [b for b in self.backends if b.kind != "local" and b.available()]
+        ready_local = [b for b in local if b.load < b.max_outstanding]
+        deep_local = [b for b in local if b.load >= b.max_outstanding]
+        ordered = ready_local + cloud + deep_local
+        if not ordered:
+            # Everything looks down; still try in case a probe was pessimistic
+            ordered = sorted(self.backends, key=lambda b: b.load)
+        return ordered
+
+    def _acquire(self, backend: Backend) -> bool:
+        if not backend.breaker.allow():
+            return False
+        with backend.lock:
+            backend.outstanding += 1
+            backend.dispatched += 1
+        return True
+
+    def _release(self, backend: Backend):
+        with backend.lock:
+            backend.outstanding -= 1
+
+    def _count(self, metric: str, amount: int = 1):
+        with self.metrics_lock:
+            self.metrics[metric] += amount
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for a first token before sending a hedged request"""
+        low, high = self.hedge_delay_bounds
+        delay = self.ttft.quantile(self.hedge_quantile)
+        return min(high, max(low, self.hedge_initial_delay if delay is None else delay))
+
+    def stream(self, messages: List[Dict], prefix: str = "", on_finish: Optional[Callable[[str], None]] = None,
+               abort: Optional[UpstreamAbort] = None, **kwargs) -> Iterator[str]:
+        """
+        Stream content deltas from the best available backend.
+
+        If the upstream stream breaks, the request is re-issued (after jittered
+        backoff, within the retry budget) with the text received so far as an
+        assistant prefix, and the continuation is stitched onto the same
+        iterator, so callers only see one uninterrupted stream. A non-empty
+        `prefix` continues an earlier response the same way. `on_finish` is
+        called with the upstream finish reason (e.g. "length" at max_tokens).
+        `abort` stops the stream from another thread (StreamCancelled).
+        """
+        self.retry_budget.record_request()
+        self._count("requests")
+        accumulated = prefix
+        attempt = 0
+        while True:
+            last_error: Optional[Exception] = None
+            for backend in self.candidates():
+                if abort is not None and abort.aborted:
+                    raise StreamCancelled("Upstream stream aborted")
+                if not self._acquire(backend):
+                    continue
+                serving = backend  # Changes if a hedged request wins the race
+                produced = False
+                try:
+                    chunks = self._stream_backend(backend, messages, accumulated, on_finish, abort, **kwargs)
+                    if not accumulated:  # Resumptions are neither hedged nor timed
+                        if self.hedge:
+                            chunks, serving = self._hedged(backend, chunks, messages, on_finish, abort, **kwargs)
+                        else:
+                            chunks = self._timed(chunks)
+                    for content in chunks:
+                        produced = True
+                        accumulated += content
+                        yield content
+                    serving.breaker.record_success()
+                    return
+                except GeneratorExit:
+                    chunks.close()  # Close the upstream response now, not when collected
+                    serving.breaker.record_success()
+                    raise
+                except Exception as e:
+                    if abort is not None and abort.aborted:
+                        serving.breaker.record_abandoned()
+                        raise StreamCancelled("Upstream stream aborted") from e
+                    if not is_backend_error(e):
+                        raise  # A bug, not a backend failure: neither retried nor counted
+                    serving.breaker.record_failure()
+                    last_error = e
+                    if produced:
+                        break  # Mid-stream failure: resume below
+                finally:
+                    self._release(serving)
+
+            last_error = last_error or NoBackendAvailable("No LLM backend available")
+            if abort is not None and abort.aborted:
+                raise StreamCancelled("Upstream stream aborted")
+            if attempt >= self.max_retries or not is_retryable(last_error):
+                raise last_error
+            if not self.retry_budget.try_withdraw():
+                self._count("budget_exhausted")
+                raise last_error
+            attempt += 1
+            self._count("resumptions" if accumulated else "retries")
+            time.sleep(backoff_delay(attempt))
+
+    def _timed(self, chunks: Iterator[str]) -> Iterator[str]:
+        """Pass chunks through, recording the time to the first one"""
+        started = time.time()
+        for content in chunks:
+            if started is not None:
+                self.ttft.record(time.time() - started)
+                started = None
+            yield content
+
+    def _hedge_backend(self, primary: Backend) -> Optional[Backend]:
+        """Acquire a different endpoint or model for a hedged request, or None if there is none"""
+        targets = self.candidates() + [backend for backend in self.hedge_backends if backend.available()]
+        for backend in targets:
+            if (backend.base_url, backend.model) != (primary.base_url, primary.model) and self._acquire(backend):
+                return backend
+        return None
+
+    def _hedged(self, primary: Backend, chunks: Iterator[str], messages: List[Dict],
+                on_finish: Optional[Callable[[str], None]] = None, abort: Optional[UpstreamAbort] = None,
+                **kwargs) -> Tuple[Iterator[str], Backend]:
+        """
+        Race `chunks` from `primary` against a hedged request started after
+        hedge_delay() without a first token. Blocks until one stream yields
+        and returns (its chunks, its backend); the loser is cancelled and
+        released here. The caller keeps owning `primary` unless another
+        stream wins, and if both streams fail, the primary's error is raised.
+        """
+        events: queue.Queue = queue.Queue()
+        wasted = lambda count: self._count("hedge_wasted_tokens", count)
+        first = _StreamPump(primary, chunks, events, on_cancelled=wasted)
+        running = [first]
+        deadline: Optional[float] = first.started + self.hedge_delay()
+        primary_error: Optional[Exception] = None
+
+        while True:
+            try:
+                pump, item = events.get(timeout=None if deadline is None else max(0.0, deadline - time.time()))
+            except queue.Empty:
+                deadline = None
+                backend = self._hedge_backend(primary)
+                if backend is not None:
+                    self._count("hedged")
+                    self._count("hedge_extra_prompt_tokens", messages_length(messages) // 4)
+                    hedge_chunks = self._stream_backend(backend, messages, "", on_finish, abort, **kwargs)
+                    running.append(_StreamPump(backend, hedge_chunks, events, on_cancelled=wasted))
+                continue
+
+            if isinstance(item, Exception):
+                running.remove(pump)
+                if pump is first:
+                    if not running:
+                        raise item  # No hedge in flight: the caller fails over as usual
+                    primary_error = item
+                    continue
+                if is_backend_error(item) and not (abort is not None and abort.aborted):
+                    pump.backend.breaker.record_failure()
+                else:
+                    pump.backend.breaker.record_abandoned()
+                self._release(pump.backend)
+                if not running:
+                    raise primary_error
+                continue
+
+            # First chunk (or an empty response): this stream wins
+            pump.on_cancelled = None
+            for loser in running:
+                if loser is not pump:
+                    loser.cancel()
+                    loser.backend.breaker.record_abandoned()
+                    self._release(loser.backend)
+            if pump is not first:
+                self._count("hedge_wins")
+                if primary_error is not None:
+                    primary.breaker.record_failure()
+                    self._release(primary)
+            if item is not _STREAM_END:
+                self.ttft.record(time.time() - pump.started)
+            return self._drain(pump, item), pump.backend
+
+    def _drain(self, pump: _StreamPump, item) -> Iterator[str]:
+        """Chunks of the winning stream, starting with the one already received"""
+        try:
+            while item is not _STREAM_END:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                source, item = pump.events.get()
+                while source is not pump:  # Leftovers from the cancelled stream
+                    source, item = pump.events.get()
+        finally:
+            pump.cancel()
+
+    def _stream_backend(self, backend: Backend, messages: List[Dict], prefix: str,
+                        on_finish: Optional[Callable[[str], None]] = None, abort: Optional[UpstreamAbort] = None,
+                        **kwargs) -> Iterator[str]:
+        """Stream from one backend, continuing after `prefix` if it is non-empty"""
+        request_messages = backend.prepare_messages(messages)
+        skip_whitespace = 0
+        if prefix:
+            # Providers reject assistant prefills ending in whitespace; the
+            # continuation re-emits it, so drop that much leading whitespace
+            stripped = prefix.rstrip()
+            skip_whitespace = len(prefix) - len(stripped)
+            request_messages = request_messages + [{"role": "assistant", "content": stripped}]
+
+        stream = backend.client.chat.completions.create(
+            model=backend.model,
+            messages=request_messages,
+            stream=True,
+            **backend.request_kwargs(bool(prefix)),
+            **kwargs,
+        )
+        if abort is not None and not abort.track(stream):
+            stream.close()
+            raise StreamCancelled("Upstream stream aborted")
+        finish_reason = None
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    finish_reason = chunk.choices[0].finish_reason
+                if not chunk.choices or chunk.choices[0].delta.content is None:
+                    continue
+                content = chunk.choices[0].delta.content
+                while skip_whitespace and content[:1].isspace():
+                    content = content[1:]
+                    skip_whitespace -= 1
+                if content:
+                    skip_whitespace = 0
+                    yield content
+        finally:
+            if abort is not None:
+                abort.untrack(stream)
+            stream.close()
+        if finish_reason and on_finish:
+            on_finish(finish_reason)
+
+    def complete(self, messages: List[Dict], on_usage: Optional[Callable[[Dict], None]] = None, **kwargs) -> str:
+        """
+        Non-streaming completion from the best available backend. `on_usage`
+        is called with the reported prompt_tokens, completion_tokens (None if
+        the backend sent no usage) and finish_reason.
+        """
+        last_error: Optional[Exception] = None
+        for backend in self.candidates():
+            if not self._acquire(backend):
+                continue
+            try:
+                response = backend.client.chat.completions.create(
+                    model=backend.model,
+                    messages=backend.prepare_messages(messages),
+                    **kwargs,
+                )
+                backend.breaker.record_success()
+                if on_usage:
+                    usage = getattr(response, "usage", None)
+                    on_usage({"prompt_tokens": getattr(usage, "prompt_tokens", None),
+                              "completion_tokens": getattr(usage, "completion_tokens", None),
+                              "finish_reason": response.choices[0].finish_reason})
+                return response.choices[0].message.content.strip()
+            except Exception as e:
+                if not is_backend_error(e):
+                    raise
+                backend.breaker.record_failure()
+                last_error = e
+            finally:
+                self._release(backend)
+        raise last_error or NoBackendAvailable("No LLM backend available")
+
+    def status(self) -> Dict:
+        with self.metrics_lock:
+            metrics = dict(self.metrics)
+        return {"backends": [backend.status() for backend in self.backends],
+                "hedge_backends": [backend.status() for backend in self.hedge_backends], "metrics": metrics,
+                "ttft": {"p50": self.ttft.quantile(0.5), "p90": self.ttft.quantile(0.9),
+                         "hedging": self.hedge, "hedge_delay": self.hedge_delay()}}
+
+
+def build_router(mode: str = "cloud") -> LLMRouter:
+    """
+    Build a router from the environment.
+
+    mode "cloud": OpenRouter only. mode "local": the vLLM replicas in
+    VLLM_URLS (comma separated), with OpenRouter as overflow/fallback when
+    OPENROUTER_API_KEY is set. LLM_HEDGE=1 enables hedged requests;
+    LLM_HEDGE_MODEL adds an OpenRouter model they can go to.
+    """
+    backends = []
+    if mode == "local":
+        urls = [u.strip() for u in os.getenv("VLLM_URLS", LOCAL_BASE_URL).split(",") if u.strip()]
+        max_outstanding = int(os.getenv("LOCAL_MAX_OUTSTANDING", "8"))
+        for i, url in enumerate(urls):
+            backends.append(Backend(f"vllm-{i}", url, os.getenv("VLLM_MODEL", LOCAL_MODEL),
+                                    kind="local", max_outstanding=max_outstanding,
+                                    continuation_params={"continue_final_message": True,
+                                                         "add_generation_prompt": False}))
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    hedge_backends = []
+    if mode == "cloud" or api_key:
+        backends.append(Backend("openrouter", CLOUD_BASE_URL, os.getenv("OPENROUTER_MODEL", CLOUD_MODEL),
+                                api_key=api_key or "EMPTY", kind="cloud", cache_control=True))
+        if os.getenv("LLM_HEDGE_MODEL"):
+            hedge_backends.append(Backend("openrouter-hedge", CLOUD_BASE_URL, os.getenv("LLM_HEDGE_MODEL"),
+                                          api_key=api_key or "EMPTY", kind="cloud", cache_control=True))
+    return LLMRouter(backends, probe_interval=float(os.getenv("LLM_PROBE_INTERVAL", "10")),
+                     max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+                     hedge=os.getenv("LLM_HEDGE", "0") == "1",
+                     hedge_quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.9")),
+                     hedge_backends=hedge_backends)
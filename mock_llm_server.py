@@ -0,0 +1,267 @@
+"""OpenAI-compatible mock LLM server for benchmarks and local testing.
+
+Usage:
+    python3 mock_llm_server.py --port 8001 --prefill-ms-per-token 0.5 --tps 80
+
+Serves /v1/chat/completions (streaming and non-streaming) and /v1/models. It
+simulates prefill cost and an automatic prefix cache: prompts are hashed in
+fixed-size blocks like vLLM does, and only blocks not seen before pay the
+prefill delay, so time-to-first-token drops when requests share a prefix.
+
+Fault injection (--fault-after-tokens, --fault-requests, --fault-rate) drops
+streaming connections mid-response. A trailing assistant message is treated as
+a prefix to continue, so resumed streams can be checked for seamless stitching.
+max_tokens caps the streamed pieces and reports finish_reason "length".
+A `responder` callable in MockConfig can pick the reply text per request.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+PREFIX_BLOCK_CHARS = 64  # ~16 tokens per block, as in vLLM's default block size
+
+DEFAULT_LESSON = """```md
+# Örnek Ders
+
+Bu ders, sahte LLM sunucusu tarafından üretilmiştir ve gerçek içerik içermez.
+
+## Temel Kavramlar
+
+- **Birinci kavram:** Konunun temelini oluşturan fikir.
+- **İkinci kavram:** Birinci kavramın pratikteki karşılığı.
+
+| Özellik | Açıklama |
+|---------|----------|
+| Hız | Yüksek |
+| Maliyet | Düşük |
+
+```python.matplotlib
+import numpy as np
+x = np.linspace(0, 10, 100)
+plt.plot(x, np.sin(x))
+plt.title('Sinus')
+```
+
+```mermaid
+flowchart LR
+    A["Soru"] --> B["Ders"]
+```
+
+## Sonuç
+
+Bu bölüm, dersin özetini sunar ve önemli noktaları tekrar eder.
+```"""
+
+
+class MockConfig:
+    """Tunable behaviour of the mock server"""
+
+    def __init__(self, base_latency_ms=30.0, prefill_ms_per_token=0.5, tps=80.0,
+                 response_text=DEFAULT_LESSON, prefix_caching=True,
+                 fault_after_tokens=None, fault_requests=0, fault_rate=0.0, responder=None):
+        self.base_latency_ms = base_latency_ms
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.tps = tps
+        self.response_text = response_text
+        self.prefix_caching = prefix_caching
+        # Streams are cut after fault_after_tokens pieces: always for the first
+        # fault_requests streams, then with probability fault_rate
+        self.fault_after_tokens = fault_after_tokens
+        self.fault_requests = fault_requests
+        self.fault_rate = fault_rate
+        # Optional callable(messages) -> reply text, used instead of response_text
+        self.responder = responder
+
+
+class InjectedFault(ConnectionError):
+    """Raised inside a streaming response to drop the connection"""
+
+
+class PrefixCache:
+    """Chained block hashes of previously seen prompts"""
+
+    def __init__(self):
+        self.blocks = set()
+        self.lock = threading.Lock()
+
+    def uncached_chars(self, text):
+        """Return how many characters of text miss the cache, then cache them"""
+        hashes = []
+        running = hashlib.sha1()
+        full_blocks = len(text) // PREFIX_BLOCK_CHARS
+        for i in range(full_blocks):
+            running.update(text[i * PREFIX_BLOCK_CHARS:(i + 1) * PREFIX_BLOCK_CHARS].encode("utf-8"))
+            hashes.append(running.hexdigest())
+        with self.lock:
+            hit_blocks = 0
+            for block_hash in hashes:
+                if block_hash not in self.blocks:
+                    break
+                hit_blocks += 1
+            self.blocks.update(hashes)
+        return len(text) - hit_blocks * PREFIX_BLOCK_CHARS
+
+
+def _serialize_messages(messages):
+    parts = []
+    for message in messages:
+        content = message.get("content", "")
+        if not isinstance(content, str):
+            content = "".join(part.get("text", "") for part in content)
+        parts.append(f"<|{message.get('role', 'user')}|>{content}")
+    return "".join(parts)
+
+
+def _split_tokens(text):
+    """Split text into small pieces that look like streamed tokens"""
+    pieces = []
+    current = ""
+    for char in text:
+        current += char
+        if char in " \n" or len(current) >= 4:
+            pieces.append(current)
+            current = ""
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def create_app(config=None):
+    config = config or MockConfig()
+    prefix_cache = PrefixCache()
+    app = Flask(__name__)
+    app.config["MOCK"] = config
+    app.config["REQUESTS"] = []  # Received request bodies, for inspection in tests
+    # Streamed pieces ("billed tokens") and streams the client closed before the end
+    app.config["STATS"] = {"tokens_streamed": 0, "streams_closed": 0}
+    stream_counter = {"count": 0}
+    counter_lock = threading.Lock()
+
+    def should_fault():
+        if config.fault_after_tokens is None:
+            return False
+        with counter_lock:
+            stream_counter["count"] += 1
+            index = stream_counter["count"]
+        return index <= config.fault_requests or random.random() < config.fault_rate
+
+    def prefill_delay(messages):
+        prompt = _serialize_messages(messages)
+        uncached = prefix_cache.uncached_chars(prompt) if config.prefix_caching else len(prompt)
+        return (config.base_latency_ms + uncached / 4 * config.prefill_ms_per_token) / 1000
+
+    @app.route("/v1/models")
+    def models():
+        return jsonify({"object": "list", "data": [{"id": "mock-model", "object": "model"}]})
+
+    @app.route("/v1/chat/completions", methods=["POST"])
+    def chat_completions():
+        body = request.get_json(force=True)
+        app.config["REQUESTS"].append(body)
+        messages = body.get("messages", [])
+        model = body.get("model", "mock-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        delay = prefill_delay(messages)
+        text = config.responder(messages) if config.responder else config.response_text
+        if messages and messages[-1].get("role") == "assistant":
+            # Continue after the assistant prefix, like vLLM's continue_final_message
+            prefix = messages[-1].get("content", "")
+            text = text[len(prefix):] if text.startswith(prefix) else text
+
+        pieces = _split_tokens(text)
+        finish_reason = "stop"
+        if body.get("max_tokens") and len(pieces) > body["max_tokens"]:
+            pieces = pieces[:body["max_tokens"]]
+            finish_reason = "length"
+            text = "".join(pieces)
+
+        if not body.get("stream"):
+            time.sleep(delay + len(text) / 4 / config.tps)
+            return jsonify({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": finish_reason}],
+                "usage": {"prompt_tokens": len(_serialize_messages(messages)) // 4, "completion_tokens": len(text) // 4},
+            })
+
+        def event(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+        fault_at = config.fault_after_tokens if should_fault() else None
+
+        stats = app.config["STATS"]
+
+        def generate():
+            time.sleep(delay)
+            yield event({"role": "assistant", "content": ""})
+            token_delay = 1.0 / config.tps if config.tps else 0
+            finished = False
+            try:
+                for i, piece in enumerate(pieces):
+                    if fault_at is not None and i >= fault_at:
+                        raise InjectedFault(f"Injected fault after {i} tokens")
+                    yield event({"content": piece})
+                    with counter_lock:
+                        stats["tokens_streamed"] += 1
+                    if token_delay:
+                        time.sleep(token_delay)
+                yield event({}, finish_reason)
+                yield "data: [DONE]\n\n"
+                finished = True
+            finally:
+                if not finished and fault_at is None:
+                    with counter_lock:
+                        stats["streams_closed"] += 1
+
+        return Response(generate(), mimetype="text/event-stream")
+
+    return app
+
+
+def start_in_thread(port=0, config=None):
+    """Start the mock server in a daemon thread; returns (server, base_url)"""
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # Keep benchmark output readable
+    server = make_server("127.0.0.1", port, create_app(config), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--base-latency-ms", type=float, default=30.0)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.5)
+    parser.add_argument("--tps", type=float, default=80.0, help="Streamed tokens per second")
+    parser.add_argument("--no-prefix-caching", action="store_true")
+    parser.add_argument("--fault-after-tokens", type=int, default=None, help="Drop faulty streams after N tokens")
+    parser.add_argument("--fault-requests", type=int, default=0, help="Number of initial streams to drop")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="Probability of dropping later streams")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(args.base_latency_ms, args.prefill_ms_per_token, args.tps,
+                        prefix_caching=not args.no_prefix_caching,
+                        fault_after_tokens=args.fault_after_tokens,
+                        fault_requests=args.fault_requests, fault_rate=args.fault_rate)
+    create_app(config).run(host="0.0.0.0", port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,14 +24,13 @@ Make sure the questions are in Turkish and they are not too long."""
 
 
 
-GENERATE_ANSWER_PROMPT = """You are a highly skilled and experienced teacher.
+# The answer prompt is split so that everything static comes first. The long
+# instruction block is then a byte-identical prefix for every request, which
+# vLLM automatic prefix caching and provider prompt caching can reuse; only the
+# short question part at the end is new per request.
+ANSWER_INSTRUCTIONS = """You are a highly skilled and experienced teacher.
 
-TASK: Answer the following question in a detailed, understandable and engaging way in Turkish.
-
-QUESTION/TOPIC:
-```
-{question}
-```
+TASK: Answer the question/topic given at the end in a detailed, understandable and engaging way in Turkish.
 
 FORMAT REQUIREMENTS:
 1. Wrap your entire response in ```md and ``` tags
@@ -86,6 +85,105 @@ CONTENT REQUIREMENTS:
 - Avoid using cringe phrasing or emojis, keep it entertaining and engaging while not being too cringy
 - Make sure that the formats you are using exactly match the templates I provided
 - Explain the graph or diagram before you rite the code for it so the person can understand it easily
-- Do NOT make the mermaid diagrams long in height, it will break the rendering, make them horizontal if possible
+- Do NOT make the mermaid diagrams long in height, it will break the rendering, make them horizontal if possible"""
+
+ANSWER_QUESTION_TEMPLATE = """QUESTION/TOPIC:
+```
+{question}
+```
 
 Now answer the question/topic. Write your Turkish response between ```md and ``` tags."""
+
+# Single-string form (static prefix first), for callers that send one user message
+GENERATE_ANSWER_PROMPT = ANSWER_INSTRUCTIONS.replace("{", "{{").replace("}", "}}") + "\n\n" + ANSWER_QUESTION_TEMPLATE
+
+
+def build_answer_messages(question, cache_control=False):
+    """Build chat messages for a lesson: static instructions as the system
+    message, the question last.
+    """
+    messages = [
+        {"role": "system", "content": ANSWER_INSTRUCTIONS},
+        {"role": "user", "content": ANSWER_QUESTION_TEMPLATE.format(question=question)},
+    ]
+    return add_cache_control(messages) if cache_control else messages
+
+
+# Outline-first lessons: a short plan, then every section as its own request.
+# All of them share the instruction block and the question as a cached prefix;
+# section requests also share the outline and only differ in their last line.
+OUTLINE_QUESTION_TEMPLATE = """QUESTION/TOPIC:
+```
+{question}
+```
+
+Do not write the lesson yet. Plan it: give the lesson title and 3-6 sections in the order they should be taught, each with a short note on what it covers and which component (if any) it uses.
+
+Only output in the following json format:
+```json
+{{"title": "...", "sections": [{{"heading": "...", "points": "..."}}]}}
+```
+
+Write the title, headings and notes in Turkish."""
+
+SECTION_QUESTION_TEMPLATE = """QUESTION/TOPIC:
+```
+{question}
+```
+
+The lesson "{title}" is written section by section, following this outline:
+{outline}
+
+Now write ONLY section {number}: "{heading}". Start with the line `## {heading}`, do not repeat the lesson title or write the other sections, and do not wrap this part in ```md tags; the sections are joined into one lesson afterwards."""
+
+
+def build_outline_messages(question, cache_control=False):
+    """Build chat messages asking for the JSON outline of a lesson"""
+    messages = [
+        {"role": "system", "content": ANSWER_INSTRUCTIONS},
+        {"role": "user", "content": OUTLINE_QUESTION_TEMPLATE.format(question=question)},
+    ]
+    return add_cache_control(messages) if cache_control else messages
+
+
+def build_section_messages(question, outline, index, cache_control=False):
+    """Build chat messages for section `index` of a parsed outline"""
+    section = outline["sections"][index]
+    plan = "\n".join(f"{number}. {item['heading']}" + (f" - {item['points']}" if item["points"] else "")
+                     for number, item in enumerate(outline["sections"], 1))
+    messages = [
+        {"role": "system", "content": ANSWER_INSTRUCTIONS},
+        {"role": "user", "content": SECTION_QUESTION_TEMPLATE.format(
+            question=question, title=outline["title"], outline=plan, number=index + 1, heading=section["heading"])},
+    ]
+    return add_cache_control(messages) if cache_control else messages
+
+
+def add_cache_control(messages):
+    """Mark the system message as a prompt caching breakpoint.
+
+    OpenRouter forwards the hint to providers such as Anthropic that need an
+    explicit breakpoint; vLLM caches the shared prefix automatically and gets
+    the plain messages.
+    """
+    marked = []
+    for message in messages:
+        if message["role"] == "system" and isinstance(message["content"], str):
+            message = {
+                "role": "system",
+                "content": [{"type": "text", "text": message["content"], "cache_control": {"type": "ephemeral"}}],
+            }
+        marked.append(message)
+    return marked
+
+
+def messages_length(messages):
+    """Total character length of chat messages (plain or content-part form)"""
+    total = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            total += len(content)
+        else:
+            total += sum(len(part.get("text", "")) for part in content)
+    return total
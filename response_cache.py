@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared_cache import shared_cache
+
+DEFAULT_DB_PATH = os.getenv("OGRENIX_CACHE_DB", "ogrenix_cache.sqlite3")
+DEFAULT_MAX_AGE = 7 * 24 * 3600  # Lessons older than a week are regenerated
+
+
+def normalize_question(question: str) -> str:
+    """Cache key for a question: case- and whitespace-insensitive"""
+    return " ".join(question.split()).casefold()
+
+
+def lesson_id(question: str) -> str:
+    """Stable public id of a cached lesson (used in export URLs)"""
+    return hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of generated lesson markdown plus a log of incoming
+    questions. SQLite keeps it shared between the web app and offline jobs
+    such as the cache warmer. When the shared cache backend is remote (Redis),
+    responses are also kept there so servers on other hosts reuse them.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_age: float = DEFAULT_MAX_AGE):
+        self.db_path = db_path
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.shared = shared_cache if shared_cache is not None and shared_cache.remote else None
+        self._conn = None
+        self._pid = None
+        with self.lock, self._connection():
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    markdown TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS requests (
+                    key TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS requests_created_at ON requests (created_at)")
+            self._migrate()
+
+    def _migrate(self):
+        """Add columns introduced after the first release to existing databases"""
+        response_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        if "lesson_id" not in response_columns:
+            self._conn.execute("ALTER TABLE responses ADD COLUMN lesson_id TEXT")
+            self._conn.executemany(
+                "UPDATE responses SET lesson_id = ? WHERE key = ?",
+                [(lesson_id(key), key) for (key,) in self._conn.execute("SELECT key FROM responses").fetchall()],
+            )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lesson_id ON responses (lesson_id)")
+        request_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(requests)")}
+        if "class_id" not in request_columns:
+            self._conn.execute("ALTER TABLE requests ADD COLUMN class_id TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS requests_class_id ON requests (class_id, created_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """This process's connection (pre-forked workers must not share the parent's)"""
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, question: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for a question if it is still fresh"""
+        max_age = self.max_age if max_age is None else max_age
+        key = normalize_question(question)
+        if self.shared is not None:
+            value = self.shared.get("response", key)
+            entry = json.loads(value) if value is not None else None
+            if entry is not None and time.time() - entry["created_at"] <= max_age:
+                entry["lesson_id"] = lesson_id(question)
+                return entry
+        with self.lock:
+            row = self._connection().execute(
+                "SELECT question, markdown, tokens, created_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None or time.time() - row[3] > max_age:
+            return None
+        return {"question": row[0], "markdown": row[1], "tokens": row[2], "created_at": row[3],
+                "lesson_id": lesson_id(question)}
+
+    def get_lesson(self, lesson_id: str) -> Optional[Dict[str, Any]]:
+        """Return a cached lesson by its public id, regardless of age"""
+        with self.lock:
+            row = self._connection().execute(
+                "SELECT question, markdown, tokens, created_at, lesson_id FROM responses WHERE lesson_id = ?",
+                (lesson_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"question": row[0], "markdown": row[1], "tokens": row[2], "created_at": row[3], "lesson_id": row[4]}
+
+    def class_lessons(self, class_id: str, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Cached lessons a class asked for, in the order they were first asked"""
+        with self.lock:
+            rows = self._connection().execute(
+                """SELECT r.question, r.markdown, r.tokens, r.created_at, r.lesson_id, MIN(q.created_at) AS asked_at
+                   FROM requests q JOIN responses r ON r.key = q.key
+                   WHERE q.class_id = ? AND q.created_at >= ?
+                   GROUP BY r.key ORDER BY asked_at""",
+                (class_id, since or 0),
+            ).fetchall()
+        return [
+            {"question": row[0], "markdown": row[1], "tokens": row[2], "created_at": row[3], "lesson_id": row[4]}
+            for row in rows
+        ]
+
+    def is_fresh(self, question: str, max_age: Optional[float] = None) -> bool:
+        return self.get(question, max_age) is not None
+
+    def put(self, question: str, markdown: str, tokens: Optional[int] = None):
+        """Store generated markdown for a question"""
+        if tokens is None:
+            tokens = len(markdown) // 4  # Rough estimation
+        key = normalize_question(question)
+        created_at = time.time()
+        with self.lock, self._connection():
+            self._conn.execute(
+                """INSERT OR REPLACE INTO responses (key, question, markdown, tokens, created_at, lesson_id)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (key, question, markdown, tokens, created_at, lesson_id(question)),
+            )
+        if self.shared is not None:
+            entry = {"question": question, "markdown": markdown, "tokens": tokens, "created_at": created_at}
+            self.shared.set("response", key, json.dumps(entry), ttl=self.max_age)
+
+    def log_request(self, question: str, class_id: Optional[str] = None):
+        """Record an incoming question for popularity statistics and class histories"""
+        with self.lock, self._connection():
+            self._conn.execute(
+                "INSERT INTO requests (key, question, created_at, class_id) VALUES (?, ?, ?, ?)",
+                (normalize_question(question), question, time.time(), class_id),
+            )
+
+    def top_questions(self, limit: int = 20, since: Optional[float] = None) -> List[Tuple[str, int]]:
+        """Most frequently asked questions since a timestamp, as (question, count)"""
+        since = since if since is not None else time.time() - self.max_age
+        with self.lock:
+            rows = self._connection().execute(
+                """SELECT MAX(question), COUNT(*) AS hits FROM requests
+                   WHERE created_at >= ? GROUP BY key ORDER BY hits DESC LIMIT ?""",
+                (since, limit),
+            ).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+
+# Global cache instance
+response_cache = ResponseCache()
@@ -0,0 +1,151 @@
+import json
+import os
+import queue
+import re
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Section streams running at the same time for one lesson
+SECTION_PARALLELISM = int(os.getenv("SECTION_PARALLELISM", "4"))
+MAX_SECTIONS = 8
+
+_SECTION_END = object()
+# Characters held back from a wrapped section: its closing fence and whitespace around it
+_FENCE_HOLD = 8
+
+
+def parse_outline(text: str) -> Optional[Dict]:
+    """
+    The {"title", "sections": [{"heading", "points"}]} outline in an LLM
+    reply, or None when it has no usable sections.
+    """
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        outline = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(outline, dict) or not isinstance(outline.get("sections"), list):
+        return None
+    sections = []
+    for section in outline["sections"][:MAX_SECTIONS]:
+        if not isinstance(section, dict) or not str(section.get("heading") or "").strip():
+            continue
+        points = section.get("points") or ""
+        if isinstance(points, list):
+            points = "; ".join(str(point) for point in points)
+        sections.append({"heading": str(section["heading"]).strip(), "points": str(points).strip()})
+    if not sections:
+        return None
+    return {"title": str(outline.get("title") or "").strip(), "sections": sections}
+
+
+class _SectionPump:
+    """
+    Reads one section stream on a daemon thread (once a parallelism slot is
+    free) into a queue, so it makes progress while earlier sections are
+    still being sent. The thread closes the stream itself, also when the
+    pump is cancelled.
+    """
+
+    def __init__(self, open_stream: Callable[[], Iterator[str]], slots: threading.Semaphore):
+        self.open_stream = open_stream
+        self.slots = slots
+        self.queue: queue.Queue = queue.Queue()
+        self.cancelled = False
+        threading.Thread(target=self._run, name="section-pump", daemon=True).start()
+
+    def _run(self):
+        while not self.slots.acquire(timeout=0.2):
+            if self.cancelled:
+                return
+        chunks = None
+        try:
+            if self.cancelled:
+                return
+            chunks = self.open_stream()
+            for chunk in chunks:
+                if self.cancelled:
+                    return
+                self.queue.put(chunk)
+            self.queue.put(_SECTION_END)
+        except Exception as e:
+            self.queue.put(e)
+        finally:
+            if chunks is not None:
+                chunks.close()
+            self.slots.release()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def chunks(self) -> Iterator[str]:
+        """The section's text; whatever was buffered comes out as one chunk, then it follows live"""
+        while True:
+            items = [self.queue.get()]
+            while not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            text = ""
+            for item in items:
+                if item is _SECTION_END or isinstance(item, Exception):
+                    if text:
+                        yield text
+                    if item is _SECTION_END:
+                        return
+                    raise item
+                text += item
+            yield text
+
+
+def _unwrapped(chunks: Iterator[str]) -> Iterator[str]:
+    """Section text without a ```md wrapper the model added despite the prompt"""
+    head = ""
+    wrapped = None
+    tail = ""
+    for chunk in chunks:
+        if wrapped is None:
+            head += chunk
+            if "\n" not in head and len(head) < 12:
+                continue
+            first_line, _, rest = head.partition("\n")
+            wrapped = first_line.strip() in ("```md", "```markdown")
+            chunk = rest if wrapped else head
+        if not wrapped:
+            yield chunk
+            continue
+        # Hold back what could be the closing fence until the section ends
+        tail += chunk
+        if len(tail) > _FENCE_HOLD:
+            yield tail[:-_FENCE_HOLD]
+            tail = tail[-_FENCE_HOLD:]
+    if wrapped is None:
+        first_line, _, rest = head.partition("\n")
+        wrapped = first_line.strip() in ("```md", "```markdown")
+        tail = rest if wrapped else head
+    if wrapped:
+        tail = tail.rstrip()
+        if tail.endswith("```"):
+            tail = tail[:-3].rstrip("\n")
+    if tail:
+        yield tail
+
+
+def stitch_sections(openers: List[Callable[[], Iterator[str]]],
+                    parallelism: int = SECTION_PARALLELISM) -> Iterator[str]:
+    """
+    Run section streams concurrently (at most `parallelism` at a time, in
+    outline order) and yield their text in order: the first section live,
+    every later one flushed as soon as the section before it has ended.
+    Closing this generator stops all section streams.
+    """
+    slots = threading.Semaphore(max(1, parallelism))
+    pumps = [_SectionPump(open_stream, slots) for open_stream in openers]
+    try:
+        for index, pump in enumerate(pumps):
+            if index:
+                yield "\n\n"
+            yield from _unwrapped(pump.chunks())
+    finally:
+        for pump in pumps:
+            pump.cancel()
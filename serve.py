@@ -0,0 +1,117 @@
+"""Production server: N pre-forked workers sharing one listening socket.
+
+Usage:
+    python3 serve.py --mode cloud --workers 4 --port 8000
+
+The parent imports the app and runs the warmup once, then forks the workers,
+so libraries, fonts and compiled regexes are shared copy-on-write instead of
+being loaded N times. Workers share rendered charts, code highlighting and
+lesson responses through the SHARED_CACHE backend (a SQLite file by default,
+or redis://... for a Redis-compatible server shared across hosts).
+
+Admission limits and the /logs view are per worker. Generation jobs run in
+the worker that started them and mirror their events to the shared cache, so
+a client resuming /jobs/<id>/events may land on any worker.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+os.environ.setdefault("SHARED_CACHE", "sqlite:///ogrenix_shared.sqlite3")
+
+import app as app_module
+from startup import startup
+
+# Respawn workers at most this often, so a worker crashing on start cannot spin
+RESPAWN_DELAY_S = 1.0
+
+
+def run_worker(sock: socket.socket, threads: bool = True):
+    """Serve requests from the inherited socket until terminated"""
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    app_module.router.start_health_checks()  # Threads do not survive fork, start them per worker
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, app_module.app, threaded=threads, fd=sock.fileno())
+    server.serve_forever()
+
+
+def spawn_worker(sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(sock)
+        except SystemExit as e:
+            code = e.code or 0
+        except BaseException:
+            import traceback
+
+            traceback.print_exc()
+            code = 1
+        os._exit(code)
+    return pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ogrenix pre-forked production server")
+    parser.add_argument("--mode", choices=sorted(app_module.DEFAULT_PORTS), default=os.getenv("OGRENIX_MODE", "cloud"))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", os.cpu_count() or 2)))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    app_module.configure_router(args.mode)
+    startup.warmup()  # Synchronous: workers are forked warm
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port or app_module.DEFAULT_PORTS[args.mode]))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    # Keep the garbage collector from touching (and so copying) the preloaded heap
+    gc.collect()
+    gc.freeze()
+
+    workers = {spawn_worker(sock) for _ in range(max(1, args.workers))}
+    print(f"Serving on {args.host}:{sock.getsockname()[1]} with {len(workers)} workers "
+          f"(shared cache: {os.environ['SHARED_CACHE'] or 'none'})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited ({os.waitstatus_to_exitcode(status)}), respawning")
+            time.sleep(RESPAWN_DELAY_S)
+            workers.add(spawn_worker(sock))
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
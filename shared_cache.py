@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# Backend for caches that must be shared by all worker processes (rendered
+# charts, Pygments highlights, lesson responses):
+#   SHARED_CACHE unset                 -> no shared tier, per-process caches only
+#   SHARED_CACHE=sqlite:///path.sqlite3 -> local file, memory-mapped reads
+#   SHARED_CACHE=redis://host:6379/0    -> any Redis-compatible server (needs the redis package)
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE", "")
+
+
+class SharedCache:
+    """String key-value store partitioned by namespace"""
+
+    # Whether the store lives off this host; such stores also hold lesson responses
+    remote = False
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+
+class SQLiteCache(SharedCache):
+    """
+    Shared cache in a local SQLite file. Readers use a memory-mapped view of
+    the file, and each process opens its own connection so the cache is safe
+    to use from pre-forked workers.
+    """
+
+    # Expired rows are deleted by the first write after this many seconds
+    PURGE_INTERVAL_S = 600
+
+    def __init__(self, path: str, mmap_size: int = 256 * 1024 * 1024):
+        self.path = path
+        self.mmap_size = mmap_size
+        self.lock = threading.Lock()
+        self.purged_at = time.time()
+        self._conn = None
+        self._pid = None
+        with self.lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    """CREATE TABLE IF NOT EXISTS entries (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        expires_at REAL,
+                        PRIMARY KEY (namespace, key)
+                    )"""
+                )
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection inherited through fork() must not be used by the child
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        with self.lock:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, namespace: str, key: str, value: str, ttl: Optional[float] = None):
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self.lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, value, expires_at),
+                )
+                if now - self.purged_at > self.PURGE_INTERVAL_S:
+                    self.purged_at = now
+                    conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+
+
+class RedisCache(SharedCache):
+    """Shared cache on a Redis-compatible server (Redis, Valkey, KeyDB, Dragonfly)"""
+
+    remote = True
+
+    def __init__(self, url: str, prefix: str = "ogrenix"):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        return self.client.get(f"{self.prefix}:{namespace}:{key}")
+
+    def set(self, namespace: str, key: str, value: str, ttl: Optional[float] = None):
+        self.client.set(f"{self.prefix}:{namespace}:{key}", value, ex=int(ttl) if ttl else None)
+
+
+def open_shared_cache(url: str) -> Optional[SharedCache]:
+    """Create the backend for a SHARED_CACHE url, or None when unset"""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteCache(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url)
+    raise ValueError(f"Unsupported SHARED_CACHE url: {url}")
+
+
+# Global shared cache (None when running as a single process without one)
+shared_cache = open_shared_cache(SHARED_CACHE_URL)
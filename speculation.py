@@ -0,0 +1,143 @@
+import os
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+from admission import admission
+from jobs import GenerationJob
+from response_cache import normalize_question
+
+# Tokens a speculation may generate before the user actually submits
+SPECULATIVE_MAX_TOKENS = int(os.getenv("SPECULATIVE_MAX_TOKENS", "400"))
+# A capped speculation waits this long for the user to submit before it is dropped
+SPECULATIVE_HOLD_S = float(os.getenv("SPECULATIVE_HOLD_S", "60"))
+
+
+class SpeculationAbandoned(Exception):
+    """The user never submitted the question a speculation was generating"""
+
+
+class Speculation:
+    """
+    A lesson generated while the user is still typing. It runs as a regular
+    generation job on a preemptible admission slot with a token cap, until a
+    real request for the same question promotes it (lifting the cap) or it is
+    cancelled because the text changed, the slot was needed or it expired.
+    """
+
+    def __init__(self, question: str, options: Hashable, client_id: str):
+        self.key = (normalize_question(question), options)
+        self.client_id = client_id
+        self.max_tokens = SPECULATIVE_MAX_TOKENS
+        self.ticket = None
+        self.job: Optional[GenerationJob] = None
+        self.promoted = False
+        self.cancelled = False
+        self.expired = False
+        self.changed = threading.Condition()
+
+    @property
+    def live(self) -> bool:
+        return not (self.cancelled or self.expired or (self.job is not None and self.job.finished))
+
+    def promote(self) -> bool:
+        """Hand the speculation to a real request; False if it is already over"""
+        with self.changed:
+            if not self.live or not admission.promote(self.ticket):
+                return False
+            self.promoted = True
+            self.changed.notify_all()
+            return True
+
+    def cancel(self):
+        with self.changed:
+            if self.promoted:
+                return
+            self.cancelled = True
+            self.changed.notify_all()
+        if self.job is not None:
+            self.job.cancel()
+
+    def wait_for_promotion(self, timeout: float = SPECULATIVE_HOLD_S):
+        """Block a capped speculation until it is promoted; raises SpeculationAbandoned otherwise"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.promoted or self.cancelled, timeout)
+            if not self.promoted:
+                self.expired = True
+                raise SpeculationAbandoned("Speculative generation was not used")
+
+
+class SpeculationRegistry:
+    """At most one speculation per client, found again by question for the real request"""
+
+    def __init__(self):
+        self.by_client: Dict[str, Speculation] = {}
+        self.lock = threading.Lock()
+        self.metrics = {"started": 0, "no_capacity": 0, "claimed": 0, "cancelled": 0}
+
+    def start(self, client_id: str, question: str, options: Hashable,
+              start_job: Callable[[Speculation], GenerationJob]) -> Optional[Speculation]:
+        """
+        Start speculating on `question` for a client, replacing its previous
+        speculation. Raises AdmissionRejected when the client is rate-limited.
+        """
+        speculation = Speculation(question, options, client_id)
+        with self.lock:
+            previous = self.by_client.get(client_id)
+            if previous is not None and previous.live and previous.key == speculation.key:
+                return previous
+        if previous is not None:
+            self.cancel(client_id)
+        speculation.ticket = admission.try_enter_background(client_id, on_preempt=speculation.cancel)
+        if speculation.ticket is None:
+            with self.lock:
+                self.metrics["no_capacity"] += 1
+            return None
+        speculation.job = start_job(speculation)
+        if speculation.cancelled:  # Preempted before the job existed
+            speculation.job.cancel()
+        with self.lock:
+            self.by_client[client_id] = speculation
+            self.metrics["started"] += 1
+        return speculation
+
+    def claim(self, client_id: str, question: str, options: Hashable) -> Optional[Speculation]:
+        """
+        Promote the client's speculation if it generates this question. The
+        request is charged to the client's bucket as if it were admitted
+        (AdmissionRejected when it is empty, leaving the speculation in place).
+        """
+        with self.lock:
+            speculation = self.by_client.get(client_id)
+            if speculation is None or speculation.key != (normalize_question(question), options):
+                return None
+        admission.charge(client_id)
+        with self.lock:
+            if self.by_client.get(client_id) is not speculation:
+                return None  # Replaced or cancelled meanwhile
+            del self.by_client[client_id]
+        if not speculation.promote():
+            return None
+        with self.lock:
+            self.metrics["claimed"] += 1
+        return speculation
+
+    def cancel(self, client_id: str, job_id: Optional[str] = None) -> bool:
+        """Cancel the client's speculation (only if it runs `job_id`, when given)"""
+        with self.lock:
+            speculation = self.by_client.get(client_id)
+            if speculation is None or (job_id is not None and speculation.job.id != job_id):
+                return False
+            del self.by_client[client_id]
+            self.metrics["cancelled"] += 1
+        speculation.cancel()
+        return True
+
+    def status(self) -> Dict:
+        with self.lock:
+            for client_id in [c for c, s in self.by_client.items() if not s.live]:
+                del self.by_client[client_id]
+            return {"active": len(self.by_client), **self.metrics}
+
+
+# Global registry
+speculations = SpeculationRegistry()
@@ -0,0 +1,115 @@
+import os
+import zlib
+from typing import Iterable, Iterator, Optional
+
+# Optional encoders: brotli and zstandard are used when installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Off switch for deployments where a proxy already compresses
+SSE_COMPRESSION_ENABLED = os.getenv("SSE_COMPRESSION", "1") != "0"
+
+# Large windows let a `content` event reference the previous full-HTML event,
+# which is what makes repeated snapshots nearly free. 8 MB is the largest zstd
+# window browsers accept; brotli's maximum standard window is 16 MB.
+ZSTD_WINDOW_LOG = 23
+BROTLI_WINDOW_LOG = 24
+
+
+class GzipStreamCompressor:
+    """gzip with a sync flush after every event (window limited to 32 KB)"""
+
+    encoding = "gzip"
+
+    def __init__(self, level: int = 6):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress_event(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliStreamCompressor:
+    encoding = "br"
+
+    def __init__(self, quality: int = 5):
+        self.compressor = brotli.Compressor(quality=quality, lgwin=BROTLI_WINDOW_LOG)
+
+    def compress_event(self, data: bytes) -> bytes:
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+class ZstdStreamCompressor:
+    encoding = "zstd"
+
+    def __init__(self, level: int = 3):
+        params = zstandard.ZstdCompressionParameters.from_level(level, window_log=ZSTD_WINDOW_LOG)
+        self.compressor = zstandard.ZstdCompressor(compression_params=params).compressobj()
+
+    def compress_event(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+COMPRESSORS = {"gzip": GzipStreamCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = BrotliStreamCompressor
+if zstandard is not None:
+    COMPRESSORS["zstd"] = ZstdStreamCompressor
+
+# Server preference when the client accepts several encodings
+PREFERENCE = ("zstd", "br", "gzip")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported encoding from an Accept-Encoding header (q=0 excluded)"""
+    if not SSE_COMPRESSION_ENABLED or not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    candidates = [enc for enc in PREFERENCE
+                  if enc in COMPRESSORS and accepted.get(enc, accepted.get("*", 0)) > 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda enc: accepted.get(enc, accepted.get("*", 0)))
+
+
+def compress_events(events: Iterable[str], encoding: str) -> Iterator[bytes]:
+    """Compress an SSE event stream with one shared context, flushing per event
+    so the client can decode each event as soon as it arrives"""
+    compressor = COMPRESSORS[encoding]()
+    try:
+        for event in events:
+            data = compressor.compress_event(event.encode("utf-8"))
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        # Propagate client disconnects to the wrapped generator
+        close = getattr(events, "close", None)
+        if close:
+            close()
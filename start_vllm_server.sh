@@ -4,3 +4,4 @@ vllm serve unsloth/GLM-4-32B-0414-unsloth-bnb-4bit \
     --max-model-len 10000 \
     --gpu-memory-utilization 0.9 \
     --dtype bfloat16 \
+    --enable-prefix-caching
@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Dict, Optional
+
+# Imported first by app.py, so this approximates the start of module loading
+PROCESS_START = time.perf_counter()
+
+
+class Startup:
+    """
+    Tracks server startup: module import time, the warmup phase and the first
+    served lesson. The server reports ready only once warmup has finished, so
+    load balancers and health checks never route traffic to a cold process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.import_ms: Optional[float] = None
+        self.warmup_ms: Optional[float] = None
+        self.warmup_phases: Dict[str, float] = {}
+        self.warmup_error: Optional[str] = None
+        self.ready = False
+        self.first_request: Optional[Dict[str, float]] = None
+
+    def mark_imported(self):
+        with self.lock:
+            if self.import_ms is None:
+                self.import_ms = round((time.perf_counter() - PROCESS_START) * 1000, 1)
+
+    def warmup(self):
+        """Run the rendering warmup and mark the process ready (ready even if warmup fails)"""
+        from generate_html import warmup
+
+        start = time.perf_counter()
+        try:
+            phases = warmup()
+            client_start = time.perf_counter()
+            import openai  # LLM clients are created lazily on the first request
+            phases["llm_client"] = round((time.perf_counter() - client_start) * 1000, 1)
+            error = None
+        except Exception as e:
+            phases, error = {}, str(e)
+        with self.lock:
+            self.warmup_ms = round((time.perf_counter() - start) * 1000, 1)
+            self.warmup_phases = phases
+            self.warmup_error = error
+            self.ready = True
+        details = ", ".join(f"{name} {ms:.0f}" for name, ms in phases.items())
+        print(f"Startup: imports {self.import_ms} ms, warmup {self.warmup_ms} ms ({details})"
+              + (f" - warmup failed: {error}" if error else ""))
+
+    def start_warmup(self) -> threading.Thread:
+        """Warm up in the background so the process can already serve logs and readiness"""
+        thread = threading.Thread(target=self.warmup, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def record_first_request(self, first_event_s: float, total_s: float):
+        """Timings of the first lesson served by this process (later calls are ignored)"""
+        with self.lock:
+            if self.first_request is not None:
+                return
+            self.first_request = {
+                "first_event_ms": round(first_event_s * 1000, 1),
+                "total_ms": round(total_s * 1000, 1),
+                "warm": self.ready,
+            }
+        print(f"Startup: first lesson served in {self.first_request['total_ms']} ms "
+              f"(first event {self.first_request['first_event_ms']} ms, warm={self.first_request['warm']})")
+
+    def status(self) -> Dict:
+        with self.lock:
+            return {
+                "ready": self.ready,
+                "uptime_s": round(time.perf_counter() - PROCESS_START, 1),
+                "import_ms": self.import_ms,
+                "warmup_ms": self.warmup_ms,
+                "warmup_phases": dict(self.warmup_phases),
+                "warmup_error": self.warmup_error,
+                "first_request": self.first_request,
+            }
+
+
+# Global startup tracker
+startup = Startup()
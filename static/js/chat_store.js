@@ -0,0 +1,201 @@
+// Saved lessons in IndexedDB: one small metadata record per lesson for the
+// sidebar (kept in memory after startup) and a separate, gzip-compressed body
+// record that is only read when a lesson is opened. Saving one lesson no
+// longer rewrites the whole history. Lessons from the old localStorage
+// `chats` key are migrated on first load; if that fails partway, the key
+// stays for the next load, lessons not yet moved are served from it and
+// the failure is in OgrenixChatStore.error.
+(function (global) {
+    'use strict';
+
+    const DB_NAME = 'ogrenix';
+    const DB_VERSION = 1;
+    const META_STORE = 'chatMeta';
+    const BODY_STORE = 'chatBodies';
+    const LEGACY_KEY = 'chats';
+
+    // id -> {id, question, timestamp, date, size}
+    const metadata = new Map();
+    // Lesson bodies not yet written (or kept for this page when IndexedDB is unavailable)
+    const pendingBodies = new Map();
+    let db = null;
+    // Why history is not (fully) persisted, if it is not: {stage: 'open' | 'migrate', error}
+    let storeError = null;
+
+    function requestPromise(request) {
+        return new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function transactionDone(tx) {
+        return new Promise((resolve, reject) => {
+            tx.oncomplete = () => resolve();
+            tx.onerror = tx.onabort = () => reject(tx.error);
+        });
+    }
+
+    function openDatabase() {
+        const request = indexedDB.open(DB_NAME, DB_VERSION);
+        request.onupgradeneeded = () => {
+            const upgradeDb = request.result;
+            if (!upgradeDb.objectStoreNames.contains(META_STORE)) {
+                upgradeDb.createObjectStore(META_STORE, { keyPath: 'id' });
+            }
+            if (!upgradeDb.objectStoreNames.contains(BODY_STORE)) {
+                upgradeDb.createObjectStore(BODY_STORE, { keyPath: 'id' });
+            }
+        };
+        return requestPromise(request);
+    }
+
+    async function compress(text) {
+        if (typeof CompressionStream === 'undefined') return { encoding: 'none', data: text };
+        const stream = new Blob([text]).stream().pipeThrough(new CompressionStream('gzip'));
+        return { encoding: 'gzip', data: await new Response(stream).arrayBuffer() };
+    }
+
+    async function decompress(body) {
+        if (body.encoding !== 'gzip') return body.data;
+        const stream = new Blob([body.data]).stream().pipeThrough(new DecompressionStream('gzip'));
+        return new Response(stream).text();
+    }
+
+    function formatDate(timestamp) {
+        return new Date(timestamp).toLocaleDateString('tr-TR', {
+            day: '2-digit',
+            month: '2-digit',
+            hour: '2-digit',
+            minute: '2-digit'
+        });
+    }
+
+    async function writeChat(meta, html) {
+        const body = await compress(html);
+        if (!db || metadata.get(meta.id) !== meta) return;  // Deleted or saved again while compressing
+        const tx = db.transaction([META_STORE, BODY_STORE], 'readwrite');
+        tx.objectStore(META_STORE).put(meta);
+        tx.objectStore(BODY_STORE).put({ id: meta.id, ...body });
+        await transactionDone(tx);
+    }
+
+    // Lessons from the old localStorage key that are not in IndexedDB yet, served from memory for now
+    function loadLegacyChats() {
+        let legacy;
+        try {
+            legacy = JSON.parse(localStorage.getItem(LEGACY_KEY) || 'null');
+        } catch (error) {
+            legacy = null;
+        }
+        const loaded = [];
+        if (legacy && typeof legacy === 'object') {
+            for (const chat of Object.values(legacy)) {
+                if (!chat || !chat.id || !chat.question || !chat.html || !chat.timestamp) continue;
+                if (metadata.has(chat.id)) continue;
+                const meta = { id: chat.id, question: chat.question, timestamp: chat.timestamp,
+                               date: chat.date || formatDate(chat.timestamp), size: chat.html.length };
+                metadata.set(meta.id, meta);
+                pendingBodies.set(meta.id, chat.html);
+                loaded.push(meta);
+            }
+        }
+        return loaded;
+    }
+
+    // Move legacy lessons into IndexedDB; the localStorage key is only dropped once all of them are there
+    async function migrateLegacyChats(legacy) {
+        for (const meta of legacy) {
+            const html = pendingBodies.get(meta.id);
+            await writeChat(meta, html);
+            if (pendingBodies.get(meta.id) === html) pendingBodies.delete(meta.id);
+        }
+        localStorage.removeItem(LEGACY_KEY);
+    }
+
+    async function init() {
+        try {
+            db = await openDatabase();
+            const tx = db.transaction(META_STORE, 'readonly');
+            const records = await requestPromise(tx.objectStore(META_STORE).getAll());
+            records.forEach(meta => metadata.set(meta.id, meta));
+        } catch (error) {
+            // No IndexedDB (e.g. some private modes): the legacy key stays, lessons saved now live for this page only
+            console.warn('IndexedDB unavailable, chats will not persist:', error);
+            db = null;
+            storeError = { stage: 'open', error };
+            loadLegacyChats();
+            return;
+        }
+        const legacy = loadLegacyChats();
+        try {
+            await migrateLegacyChats(legacy);
+        } catch (error) {
+            // History already in IndexedDB keeps loading; the rest is retried on the next load
+            console.error('Migrating saved chats to IndexedDB failed:', error);
+            storeError = { stage: 'migrate', error };
+        }
+    }
+
+    const ready = init();
+
+    /** Sidebar entries, newest first (synchronous; valid once `ready` resolved) */
+    function list() {
+        return Array.from(metadata.values()).sort((a, b) => b.timestamp - a.timestamp);
+    }
+
+    function get(id) {
+        return metadata.get(id) || null;
+    }
+
+    /** Save a lesson; metadata updates immediately, the body is written in the background */
+    function save(id, question, html) {
+        const timestamp = Date.now();
+        const meta = { id, question, timestamp, date: formatDate(timestamp), size: html.length };
+        metadata.set(id, meta);
+        pendingBodies.set(id, html);
+        return ready.then(() => db && writeChat(meta, html)).then(() => {
+            if (db && pendingBodies.get(id) === html) pendingBodies.delete(id);
+        }).catch(error => console.error('Saving chat failed:', error));
+    }
+
+    /** The lesson HTML, read and decompressed on demand (null if unknown) */
+    async function loadHtml(id) {
+        if (pendingBodies.has(id)) return pendingBodies.get(id);
+        await ready;
+        if (!db || !metadata.has(id)) return null;
+        const tx = db.transaction(BODY_STORE, 'readonly');
+        const body = await requestPromise(tx.objectStore(BODY_STORE).get(id));
+        return body ? decompress(body) : null;
+    }
+
+    function remove(id) {
+        metadata.delete(id);
+        pendingBodies.delete(id);
+        return ready.then(() => {
+            if (!db) return;
+            const tx = db.transaction([META_STORE, BODY_STORE], 'readwrite');
+            tx.objectStore(META_STORE).delete(id);
+            tx.objectStore(BODY_STORE).delete(id);
+            return transactionDone(tx);
+        }).catch(error => console.error('Deleting chat failed:', error));
+    }
+
+    function clear() {
+        metadata.clear();
+        pendingBodies.clear();
+        localStorage.removeItem(LEGACY_KEY);
+        return ready.then(() => {
+            if (!db) return;
+            const tx = db.transaction([META_STORE, BODY_STORE], 'readwrite');
+            tx.objectStore(META_STORE).clear();
+            tx.objectStore(BODY_STORE).clear();
+            return transactionDone(tx);
+        }).catch(error => console.error('Clearing chats failed:', error));
+    }
+
+    global.OgrenixChatStore = {
+        ready, list, get, save, loadHtml, remove, clear,
+        get error() { return storeError; }
+    };
+})(window);
@@ -0,0 +1,350 @@
+// Lazy hydration of the lesson iframe. Mermaid diagrams, MathJax and
+// highlight.js only run for nodes near the iframe viewport (IntersectionObserver),
+// in idle-time slices, and load their library on first use. Results are kept
+// across body swaps: diagrams by data-mermaid-key, code by class and text,
+// math by the source markup, so streaming updates never redo finished work.
+// Rendered diagrams are also persisted in IndexedDB, so reopening a lesson
+// shows its diagrams without running Mermaid at all. OgrenixHydrator.onHydrated,
+// if set, is called with the iframe window whenever hydration changed the
+// page height (diagrams, math), e.g. to keep a streaming lesson scrolled down.
+(function (global) {
+    'use strict';
+
+    const LIBRARIES = {
+        mermaid: 'https://cdnjs.cloudflare.com/ajax/libs/mermaid/10.9.0/mermaid.min.js',
+        hljs: 'https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js',
+        MathJax: 'https://cdnjs.cloudflare.com/ajax/libs/mathjax/3.2.2/es5/tex-mml-chtml.js',
+    };
+    const MERMAID_CONFIG = {
+        startOnLoad: false,
+        theme: 'base',
+        securityLevel: 'loose',
+        flowchart: { useMaxWidth: false },
+        themeVariables: {
+            primaryColor: '#f5f4f1',
+            primaryTextColor: '#2c2a26',
+            primaryBorderColor: '#8b5a3c',
+            lineColor: '#8b5a3c',
+            sectionBkgColor: '#faf9f7',
+            altSectionBkgColor: '#f5f4f1',
+            gridColor: '#e8e6e3',
+            textColor: '#2c2a26',
+            taskBkgColor: '#f5f4f1',
+            taskTextColor: '#2c2a26',
+            activeTaskBkgColor: '#8b5a3c',
+            activeTaskBorderColor: '#7a4d33',
+            fontFamily: 'Inter, sans-serif',
+            fontSize: '14px'
+        }
+    };
+
+    const DIAGRAM_SELECTOR = '.mermaid[data-mermaid-key]:not([data-pending]):not([data-processed])';
+    const CODE_SELECTOR = 'pre code:not(.nohighlight):not([data-highlighted])';
+    const MATH_SELECTOR = 'p, li, td, th, dd, h1, h2, h3, h4, h5, h6';
+    // MathJax's default delimiters: \( \), \[ \] and $$ $$
+    const MATH_PATTERN = /\\\(|\\\[|\$\$/;
+    // Hydrate a screen or so before a node scrolls into view
+    const ROOT_MARGIN = '800px 0px';
+    const SLICE_MS = 8;
+    const CACHE_LIMIT = 500;
+
+    // Persistent diagram cache; the version part invalidates it when Mermaid or its theme changes
+    const DIAGRAM_DB = 'ogrenix-diagrams';
+    const DIAGRAM_STORE = 'diagrams';
+    const DIAGRAM_VERSION = 'mermaid-10.9.0:base';
+    const DIAGRAM_DB_LIMIT = 2000;
+
+    const diagrams = new Map();    // data-mermaid-key -> rendered .mermaid outerHTML
+    const highlights = new Map();  // class + code text -> highlighted innerHTML
+    const typeset = new Map();     // source innerHTML -> typeset innerHTML
+
+    // {win, observer, queue, scheduled} for the current iframe document
+    let state = null;
+
+    const hydrator = { observe, restore, onHydrated: null };
+
+    // Diagrams and math change the page height; let the page react (e.g. follow-scroll)
+    function hydrated(win) {
+        if (typeof hydrator.onHydrated !== 'function') return;
+        try { hydrator.onHydrated(win); } catch (error) { console.debug('onHydrated failed:', error); }
+    }
+
+    function remember(cache, key, value) {
+        cache.delete(key);
+        cache.set(key, value);
+        if (cache.size > CACHE_LIMIT) cache.delete(cache.keys().next().value);
+    }
+
+    function requestPromise(request) {
+        return new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    const diagramDb = (() => {
+        if (!global.indexedDB) return Promise.resolve(null);
+        const request = indexedDB.open(DIAGRAM_DB, 1);
+        request.onupgradeneeded = () => {
+            const store = request.result.createObjectStore(DIAGRAM_STORE, { keyPath: 'key' });
+            store.createIndex('storedAt', 'storedAt');
+        };
+        return requestPromise(request).catch(error => {
+            console.debug('Diagram cache unavailable:', error);
+            return null;
+        });
+    })();
+
+    // Persisted lookups in flight or done, so each key is read at most once per page
+    const diagramLookups = new Map();
+
+    // Load persisted diagrams into the memory cache
+    function loadPersistedDiagrams(keys) {
+        const missing = keys.filter(key => !diagrams.has(key) && !diagramLookups.has(key));
+        if (missing.length) {
+            const lookup = diagramDb.then(db => {
+                if (!db) return;
+                const store = db.transaction(DIAGRAM_STORE, 'readonly').objectStore(DIAGRAM_STORE);
+                return Promise.all(missing.map(key =>
+                    requestPromise(store.get(`${DIAGRAM_VERSION}:${key}`)).then(record => {
+                        if (record && !diagrams.has(key)) remember(diagrams, key, record.html);
+                    })));
+            }).catch(error => console.debug('Diagram cache read failed:', error));
+            missing.forEach(key => diagramLookups.set(key, lookup));
+        }
+        return Promise.all(keys.map(key => diagramLookups.get(key)));
+    }
+
+    function persistDiagram(key, html) {
+        diagramDb.then(db => {
+            if (!db) return;
+            const store = db.transaction(DIAGRAM_STORE, 'readwrite').objectStore(DIAGRAM_STORE);
+            store.put({ key: `${DIAGRAM_VERSION}:${key}`, html, storedAt: Date.now() });
+            requestPromise(store.count()).then(count => {
+                if (count <= DIAGRAM_DB_LIMIT) return;
+                // Drop the oldest entries
+                let excess = count - DIAGRAM_DB_LIMIT;
+                store.index('storedAt').openCursor().onsuccess = event => {
+                    const cursor = event.target.result;
+                    if (!cursor || excess-- <= 0) return;
+                    cursor.delete();
+                    cursor.continue();
+                };
+            });
+        }).catch(error => console.debug('Diagram cache write failed:', error));
+    }
+
+    // Cache a rendered diagram under an SVG id derived from its key, so diagrams
+    // restored from earlier pages cannot clash with Mermaid's per-page counter ids
+    function storeDiagram(div) {
+        const key = div.getAttribute('data-mermaid-key');
+        const svgId = div.querySelector('svg').id;
+        let html = div.outerHTML;
+        if (svgId) {
+            const escaped = svgId.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+            html = html.replace(new RegExp(`${escaped}(?!\\d)`, 'g'), `ogrenix-${key}`);
+        }
+        remember(diagrams, key, html);
+        persistDiagram(key, html);
+    }
+
+    // Swap cached diagrams into the live document; returns the nodes still to render
+    function applyCachedDiagrams(nodes) {
+        return nodes.filter(div => {
+            const rendered = diagrams.get(div.getAttribute('data-mermaid-key'));
+            if (rendered === undefined) return true;
+            if (div.isConnected) div.outerHTML = rendered;
+            return false;
+        });
+    }
+
+    function codeKey(code) {
+        return code.className.replace(/\s*hljs\b/, '') + '\u0000' + code.textContent;
+    }
+
+    // Outermost text blocks with untypeset math (a nested list is typeset with its parent item)
+    function mathBlocks(doc) {
+        return Array.from(doc.querySelectorAll(MATH_SELECTOR)).filter(el =>
+            !el.hasAttribute('data-hydrated') && MATH_PATTERN.test(el.textContent || '')
+            && !(el.parentElement && el.parentElement.closest(MATH_SELECTOR)));
+    }
+
+    function loadScriptOnce(doc, id, src, onload) {
+        let el = doc.getElementById(id);
+        if (el) { el.addEventListener('load', onload, { once: true }); return; }
+        el = doc.createElement('script');
+        el.id = id;
+        el.src = src;
+        el.async = true;
+        el.onload = onload;
+        (doc.head || doc.body || doc.documentElement).appendChild(el);
+    }
+
+    function libraryReady(win, name) {
+        if (name === 'MathJax') return typeof win.MathJax?.typesetPromise === 'function';
+        return !!win[name];
+    }
+
+    // Load a library into the iframe; nodes waiting for it are re-queued once it is there
+    function requireLibrary(win, name, nodes) {
+        if (libraryReady(win, name)) return true;
+        if (name === 'MathJax') {
+            // Only typeset what the scheduler hands over, not the whole page on startup
+            win.MathJax = { startup: { typeset: false } };
+        }
+        loadScriptOnce(win.document, `ogrenix-${name.toLowerCase()}`, LIBRARIES[name], () => {
+            const ready = name === 'MathJax' ? win.MathJax.startup.promise : Promise.resolve();
+            ready.then(() => {
+                if (state && state.win === win) {
+                    nodes.forEach(node => state.queue.add(node));
+                    schedule();
+                }
+            });
+        });
+        return false;
+    }
+
+    function renderDiagrams(win, nodes) {
+        // Consult the diagram cache before loading or running Mermaid
+        const keys = nodes.map(div => div.getAttribute('data-mermaid-key'));
+        loadPersistedDiagrams(keys).then(() => {
+            const connected = nodes.filter(div => div.isConnected);
+            nodes = applyCachedDiagrams(connected);
+            if (nodes.length < connected.length) hydrated(win);
+            if (nodes.length) runMermaid(win, nodes);
+        });
+    }
+
+    function runMermaid(win, nodes) {
+        if (!requireLibrary(win, 'mermaid', nodes)) return;
+        if (!win.__ogrenixMermaidReady) {
+            win.mermaid.initialize(MERMAID_CONFIG);
+            win.__ogrenixMermaidReady = true;
+        }
+        const done = () => {
+            nodes.forEach(div => {
+                if (!div.querySelector('svg')) return;
+                div.removeAttribute('data-pending');
+                div.style.color = '';
+                storeDiagram(div);
+            });
+            hydrated(win);
+        };
+        Promise.resolve(win.mermaid.run({ nodes })).then(done, error => {
+            console.debug('Mermaid render error:', error);
+            done();
+        });
+    }
+
+    function highlightCode(win, code) {
+        if (!requireLibrary(win, 'hljs', [code])) return;
+        const key = codeKey(code);
+        win.hljs.highlightElement(code);
+        remember(highlights, key, code.innerHTML);
+    }
+
+    function typesetMath(win, nodes) {
+        if (!requireLibrary(win, 'MathJax', nodes)) return;
+        const sources = nodes.map(el => el.innerHTML);
+        win.MathJax.typesetPromise(nodes).then(() => {
+            nodes.forEach((el, i) => {
+                el.setAttribute('data-hydrated', '1');
+                remember(typeset, sources[i], el.innerHTML);
+            });
+            hydrated(win);
+        }).catch(error => console.debug('MathJax typeset error:', error));
+    }
+
+    function runSlice(s, deadline) {
+        s.scheduled = false;
+        if (s !== state || !s.queue.size) return;
+        const diagramNodes = [];
+        const mathNodes = [];
+        // Always make progress, then continue while the idle period lasts
+        do {
+            const node = s.queue.values().next().value;
+            s.queue.delete(node);
+            if (!node.isConnected) continue;
+            if (node.matches('.mermaid')) diagramNodes.push(node);
+            else if (node.matches('pre code')) highlightCode(s.win, node);
+            else mathNodes.push(node);
+        } while (s.queue.size && deadline.timeRemaining() > 1);
+        if (diagramNodes.length) renderDiagrams(s.win, diagramNodes);
+        if (mathNodes.length) typesetMath(s.win, mathNodes);
+        if (s.queue.size) schedule();
+    }
+
+    function schedule() {
+        if (!state || state.scheduled || !state.queue.size) return;
+        const s = state;
+        s.scheduled = true;
+        if (s.win.requestIdleCallback) {
+            s.win.requestIdleCallback(deadline => runSlice(s, deadline), { timeout: 200 });
+        } else {
+            s.win.setTimeout(() => {
+                const end = performance.now() + SLICE_MS;
+                runSlice(s, { timeRemaining: () => Math.max(0, end - performance.now()) });
+            }, 16);
+        }
+    }
+
+    function onIntersect(entries) {
+        entries.forEach(entry => {
+            if (!entry.isIntersecting) return;
+            state.observer.unobserve(entry.target);
+            state.queue.add(entry.target);
+        });
+        schedule();
+    }
+
+    /** Apply cached results to a parsed document before its body is swapped in */
+    function restore(doc) {
+        doc.querySelectorAll('.mermaid[data-mermaid-key]').forEach(div => {
+            const rendered = diagrams.get(div.getAttribute('data-mermaid-key'));
+            if (rendered !== undefined) div.outerHTML = rendered;
+        });
+        doc.querySelectorAll(CODE_SELECTOR).forEach(code => {
+            const highlighted = highlights.get(codeKey(code));
+            if (highlighted === undefined) return;
+            code.innerHTML = highlighted;
+            code.classList.add('hljs');
+            code.dataset.highlighted = 'yes';
+        });
+        mathBlocks(doc).forEach(el => {
+            const result = typeset.get(el.innerHTML);
+            if (result === undefined) return;
+            el.innerHTML = result;
+            el.setAttribute('data-hydrated', '1');
+        });
+    }
+
+    /** (Re)start hydration for the iframe's current document, e.g. after a body swap */
+    function observe(iframe) {
+        const win = iframe?.contentWindow;
+        const doc = win?.document;
+        if (!doc || !doc.body || !win.IntersectionObserver) return;
+        if (!state || state.win !== win) {
+            if (state) state.observer.disconnect();
+            state = { win, queue: new Set(), scheduled: false, observer: null };
+            state.observer = new win.IntersectionObserver(onIntersect, { root: doc, rootMargin: ROOT_MARGIN });
+        }
+        // The previous body's nodes are gone; watch the new ones
+        state.observer.disconnect();
+        state.queue.clear();
+        const diagramNodes = Array.from(doc.querySelectorAll(DIAGRAM_SELECTOR))
+            .filter(div => !div.querySelector('svg') && (div.textContent || '').trim());
+        diagramNodes.forEach(div => state.observer.observe(div));
+        // Reopened lessons: show persisted diagrams right away, without Mermaid
+        loadPersistedDiagrams(diagramNodes.map(div => div.getAttribute('data-mermaid-key'))).then(() => {
+            diagramNodes.forEach(div => {
+                if (!diagrams.has(div.getAttribute('data-mermaid-key'))) return;
+                if (state && state.win === win) state.observer.unobserve(div);
+            });
+            if (applyCachedDiagrams(diagramNodes).length < diagramNodes.length) hydrated(win);
+        });
+        doc.querySelectorAll(CODE_SELECTOR).forEach(code => state.observer.observe(code));
+        mathBlocks(doc).forEach(el => state.observer.observe(el));
+    }
+
+    global.OgrenixHydrator = hydrator;
+})(window);
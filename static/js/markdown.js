@@ -0,0 +1,274 @@
+// Minimal streaming-tolerant Markdown renderer for client-side rendering mode.
+// Mirrors the subset produced by the server (python-markdown + our special
+// fences) closely enough for interim updates; the final `complete` event still
+// carries the canonical server-rendered HTML.
+(function (global) {
+    'use strict';
+
+    // Synchronous SHA-1 over UTF-8, so chart keys match the server's block hash
+    function sha1(text) {
+        const bytes = new TextEncoder().encode(text);
+        const bitLength = bytes.length * 8;
+        const padded = new Uint8Array(((bytes.length + 9 + 63) >> 6) << 6);
+        padded.set(bytes);
+        padded[bytes.length] = 0x80;
+        const view = new DataView(padded.buffer);
+        view.setUint32(padded.length - 8, Math.floor(bitLength / 0x100000000));
+        view.setUint32(padded.length - 4, bitLength >>> 0);
+
+        let h0 = 0x67452301, h1 = 0xEFCDAB89, h2 = 0x98BADCFE, h3 = 0x10325476, h4 = 0xC3D2E1F0;
+        const w = new Uint32Array(80);
+        for (let offset = 0; offset < padded.length; offset += 64) {
+            for (let i = 0; i < 16; i++) w[i] = view.getUint32(offset + i * 4);
+            for (let i = 16; i < 80; i++) {
+                const x = w[i - 3] ^ w[i - 8] ^ w[i - 14] ^ w[i - 16];
+                w[i] = (x << 1) | (x >>> 31);
+            }
+            let a = h0, b = h1, c = h2, d = h3, e = h4;
+            for (let i = 0; i < 80; i++) {
+                let f, k;
+                if (i < 20) { f = (b & c) | (~b & d); k = 0x5A827999; }
+                else if (i < 40) { f = b ^ c ^ d; k = 0x6ED9EBA1; }
+                else if (i < 60) { f = (b & c) | (b & d) | (c & d); k = 0x8F1BBCDC; }
+                else { f = b ^ c ^ d; k = 0xCA62C1D6; }
+                const temp = (((a << 5) | (a >>> 27)) + f + e + k + w[i]) >>> 0;
+                e = d; d = c; c = (b << 30) | (b >>> 2); b = a; a = temp;
+            }
+            h0 = (h0 + a) >>> 0; h1 = (h1 + b) >>> 0; h2 = (h2 + c) >>> 0;
+            h3 = (h3 + d) >>> 0; h4 = (h4 + e) >>> 0;
+        }
+        return [h0, h1, h2, h3, h4].map(h => h.toString(16).padStart(8, '0')).join('');
+    }
+
+    function escapeHtml(text) {
+        return text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+    }
+
+    function slugify(text) {
+        return text.toLowerCase().replace(/<[^>]+>/g, '').replace(/[^\p{L}\p{N}\s-]/gu, '').trim().replace(/\s+/g, '-');
+    }
+
+    // Inline formatting; code spans and math are shielded from emphasis rules
+    function renderInline(text) {
+        const stash = [];
+        const protect = html => `\u0000${stash.push(html) - 1}\u0000`;
+        text = text.replace(/(`+)([\s\S]*?[^`])\1(?!`)/g, (_, ticks, code) => protect(`<code>${escapeHtml(code.trim())}</code>`));
+        text = text.replace(/\$\$[\s\S]+?\$\$|\$[^$\n]+?\$/g, math => protect(escapeHtml(math)));
+        text = text.replace(/<\/?[A-Za-z][^<>]*>/g, tag => protect(tag));
+        text = escapeHtml(text);
+        text = text.replace(/!\[([^\]]*)\]\(([^)\s]+)(?:\s+&quot;([^&]*)&quot;)?\)/g,
+            (_, alt, src, title) => protect(`<img src="${src}" alt="${alt}"${title ? ` title="${title}"` : ''}/>`));
+        text = text.replace(/\[([^\]]+)\]\(([^)\s]+)\)/g, '<a href="$2">$1</a>');
+        text = text.replace(/(\*\*|__)(?=\S)([\s\S]*?\S)\1/g, '<strong>$2</strong>');
+        text = text.replace(/(^|[^\w*])\*(?=\S)([^*]*?\S)\*/g, '$1<em>$2</em>');
+        text = text.replace(/(^|[^\w])_(?=\S)([^_]*?\S)_(?!\w)/g, '$1<em>$2</em>');
+        text = text.replace(/~~(?=\S)([\s\S]*?\S)~~/g, '<del>$1</del>');
+        text = text.replace(/ {2,}\n/g, '<br />\n');
+        return text.replace(/\u0000(\d+)\u0000/g, (_, i) => stash[Number(i)]);
+    }
+
+    // Same fixes as sanitize_mermaid_code on the server, so diagram keys (and
+    // what Mermaid parses) match the final HTML
+    function sanitizeMermaid(code) {
+        if (!code) return code;
+        code = code.replace(/→|⇒|—>/g, '-->').replace(/->/g, '-->').replace(/[“”]/g, '"').replace(/’/g, "'");
+        // One-line flowcharts: break before each node/edge so Mermaid can parse them
+        if (!code.includes('\n') && /^(flowchart|graph)/.test(code.trim())) {
+            const match = /^(\s*(?:flowchart|graph)\s+\w+)\s+(.*)$/.exec(code.trim());
+            if (match) {
+                const rest = match[2]
+                    .replace(/\s+(?=[A-Za-z][A-Za-z0-9_]*\s*(?:\[|\(|-->|==|===|<-|->))/g, '\n')
+                    .replace(/\](?=\s*[A-Za-z][A-Za-z0-9_]*\s*(?:\[|\(|-->|==|===|<-|->))/g, ']\n')
+                    .replace(/\)(?=\s*[A-Za-z][A-Za-z0-9_]*\s*(?:\[|\(|-->|==|===|<-|->))/g, ')\n');
+                code = `${match[1]}\n${rest}`;
+            }
+        }
+        return code;
+    }
+
+    function codeToggle(code, language, summary = 'Kodu Göster') {
+        return `<details class="code-toggle">
+        <summary>${summary}</summary>
+        <pre class="code-block"><code class="language-${language}">${escapeHtml(code)}</code></pre>
+    </details>`;
+    }
+
+    // Chart key -> copies rendered so far in the current render() call
+    let chartOccurrences = new Map();
+
+    // Same as chart_element_id on the server: later copies of a chart get their occurrence index
+    function chartElementId(key) {
+        const occurrence = chartOccurrences.get(key) || 0;
+        chartOccurrences.set(key, occurrence + 1);
+        return occurrence ? `chart_${key.slice(0, 12)}_${occurrence}` : `chart_${key.slice(0, 12)}`;
+    }
+
+    // Same markup as preprocess_incomplete_blocks / process_*_blocks on the server
+    function renderFence(language, code, closed, assets) {
+        if (language === 'python.matplotlib') {
+            if (!closed) return '<div class="chart-container" data-pending="1"></div>';
+            const key = sha1(code);
+            const asset = assets[key];
+            if (asset && asset.error) {
+                return `<div class="error-box">
+    <div class="error-title">Grafik Hatası</div>
+    <div class="error-message">${escapeHtml(asset.error)}</div>
+    ${codeToggle(code, 'python', 'Kod')}
+</div>`;
+            }
+            const image = asset ? `<img src="${asset.src}" alt="Grafik" class="chart-image"/>` : '';
+            const state = asset ? ` data-quality="${asset.quality || 'full'}"` : ' data-pending="1"';
+            return `<div class="chart-container" id="${chartElementId(key)}" data-chart-key="${key}"${state}>
+    ${image}
+    ${codeToggle(code, 'python')}
+</div>`;
+        }
+        if (language === 'mermaid') {
+            if (!closed) return `<div class="diagram-container"><div class="mermaid" data-pending="1"></div></div>`;
+            const diagram = sanitizeMermaid(code.trim());
+            return `<div class="diagram-container">
+    <div class="mermaid" data-mermaid-key="${sha1(diagram).slice(0, 16)}">${escapeHtml(diagram)}</div>
+    ${codeToggle(diagram, 'mermaid')}
+</div>`;
+        }
+        if (language === 'p5js') {
+            // Sketches only run from the final server HTML
+            return `<div class="p5js-container"><div class="p5js" data-pending="1"><div class="p5js-canvas"></div></div>${closed ? codeToggle(code.trim(), 'javascript') : ''}</div>`;
+        }
+        const languageClass = language ? ` class="language-${escapeHtml(language)}"` : '';
+        return `<div class="highlight"><pre><code${languageClass}>${escapeHtml(code)}</code></pre></div>`;
+    }
+
+    const LIST_ITEM = /^(\s*)([-*+]|\d+[.)])\s+(.*)$/;
+    const TABLE_SEPARATOR = /^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$/;
+
+    function splitRow(line) {
+        return line.trim().replace(/^\|/, '').replace(/\|$/, '').split('|').map(cell => cell.trim());
+    }
+
+    function isBlockStart(line, next) {
+        return /^\s*(```|~~~|#{1,6}\s|>|<\/?[A-Za-z])/.test(line) || LIST_ITEM.test(line)
+            || /^\s*([-*_])(\s*\1){2,}\s*$/.test(line)
+            || (line.includes('|') && next !== undefined && TABLE_SEPARATOR.test(next));
+    }
+
+    function renderList(lines, assets) {
+        const ordered = /\d/.test(LIST_ITEM.exec(lines[0])[2]);
+        const baseIndent = LIST_ITEM.exec(lines[0])[1].length;
+        const items = [];
+        for (const line of lines) {
+            const match = LIST_ITEM.exec(line);
+            if (match && match[1].length <= baseIndent) {
+                items.push([match[3]]);
+            } else {
+                items[items.length - 1].push(line.slice(Math.min(baseIndent + 2, line.search(/\S|$/))));
+            }
+        }
+        const body = items.map(([first, ...rest]) => {
+            const nested = rest.some(line => line.trim()) ? '\n' + renderBlocks(rest.map(l => l.replace(/^\s{0,4}/, '')), assets) : '';
+            return `<li>${renderInline(first)}${nested}</li>`;
+        }).join('\n');
+        return ordered ? `<ol>\n${body}\n</ol>` : `<ul>\n${body}\n</ul>`;
+    }
+
+    function renderBlocks(lines, assets) {
+        const out = [];
+        let i = 0;
+        while (i < lines.length) {
+            const line = lines[i];
+            if (!line.trim()) { i++; continue; }
+
+            const fence = /^\s*(```|~~~)\s*([\w.+-]*)\s*$/.exec(line);
+            if (fence) {
+                const body = [];
+                i++;
+                while (i < lines.length && !lines[i].trim().startsWith(fence[1])) body.push(lines[i++]);
+                const closed = i < lines.length;
+                i++;
+                out.push(renderFence(fence[2], body.join('\n'), closed, assets));
+                continue;
+            }
+
+            const heading = /^(#{1,6})\s+(.*?)\s*#*\s*$/.exec(line);
+            if (heading) {
+                const level = heading[1].length;
+                out.push(`<h${level} id="${slugify(heading[2])}">${renderInline(heading[2])}</h${level}>`);
+                i++;
+                continue;
+            }
+
+            if (/^\s*([-*_])(\s*\1){2,}\s*$/.test(line)) { out.push('<hr />'); i++; continue; }
+
+            if (/^\s*>/.test(line)) {
+                const quoted = [];
+                while (i < lines.length && /^\s*>/.test(lines[i])) quoted.push(lines[i++].replace(/^\s*>\s?/, ''));
+                out.push(`<blockquote>\n${renderBlocks(quoted, assets)}\n</blockquote>`);
+                continue;
+            }
+
+            if (line.includes('|') && i + 1 < lines.length && TABLE_SEPARATOR.test(lines[i + 1])) {
+                const header = splitRow(line);
+                const aligns = splitRow(lines[i + 1]).map(cell =>
+                    cell.startsWith(':') && cell.endsWith(':') ? 'center' : cell.endsWith(':') ? 'right' : cell.startsWith(':') ? 'left' : '');
+                const cell = (tag, text, j) => `<${tag}${aligns[j] ? ` style="text-align: ${aligns[j]};"` : ''}>${renderInline(text || '')}</${tag}>`;
+                const rows = [];
+                i += 2;
+                while (i < lines.length && lines[i].includes('|') && lines[i].trim()) rows.push(splitRow(lines[i++]));
+                out.push(`<table>\n<thead>\n<tr>${header.map((h, j) => cell('th', h, j)).join('')}</tr>\n</thead>\n<tbody>\n`
+                    + rows.map(r => `<tr>${header.map((_, j) => cell('td', r[j], j)).join('')}</tr>`).join('\n')
+                    + '\n</tbody>\n</table>');
+                continue;
+            }
+
+            if (LIST_ITEM.test(line)) {
+                const listLines = [];
+                const baseIndent = LIST_ITEM.exec(line)[1].length;
+                while (i < lines.length) {
+                    const current = lines[i];
+                    const indent = current.search(/\S/);
+                    if (!current.trim()) {
+                        // A blank line ends the list unless the list continues after it
+                        const next = lines[i + 1];
+                        if (next === undefined || !(LIST_ITEM.test(next) || next.search(/\S/) > baseIndent)) break;
+                    } else if (listLines.length && indent <= baseIndent && !LIST_ITEM.test(current)) {
+                        break;
+                    }
+                    listLines.push(current);
+                    i++;
+                }
+                out.push(renderList(listLines, assets));
+                continue;
+            }
+
+            if (/^\s*<\/?[A-Za-z]/.test(line)) {
+                // Raw HTML block, passed through until a blank line
+                const html = [];
+                while (i < lines.length && lines[i].trim()) html.push(lines[i++]);
+                out.push(html.join('\n'));
+                continue;
+            }
+
+            const paragraph = [line];
+            i++;
+            while (i < lines.length && lines[i].trim() && !isBlockStart(lines[i], lines[i + 1])) paragraph.push(lines[i++]);
+            out.push(`<p>${renderInline(paragraph.join('\n'))}</p>`);
+        }
+        return out.join('\n');
+    }
+
+    /**
+     * Render (possibly incomplete) lesson markdown to HTML.
+     * assets maps chart block keys to {src, quality} or {error} from the server's `asset` events.
+     */
+    function render(markdown, assets = {}) {
+        chartOccurrences = new Map();
+        return renderBlocks(markdown.replace(/\r\n?/g, '\n').split('\n'), assets);
+    }
+
+    // Same unwrapping as clean_markdown_response on the server
+    function cleanResponse(markdown) {
+        return markdown.replace(/^```(md|markdown)\n/, '').replace(/\n?```\s*$/, '').trim();
+    }
+
+    global.OgrenixMarkdown = { render, cleanResponse, sha1 };
+})(window);
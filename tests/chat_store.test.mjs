@@ -0,0 +1,135 @@
+// node --test tests/
+// static/js/chat_store.js against a small in-memory IndexedDB and localStorage.
+import { test } from 'node:test';
+import assert from 'node:assert/strict';
+import { readFileSync } from 'node:fs';
+import { runInThisContext } from 'node:vm';
+
+const SOURCE = readFileSync(new URL('../static/js/chat_store.js', import.meta.url), 'utf8');
+
+// Just enough of IndexedDB for chat_store.js; writes of ids in `failPuts` abort their transaction
+function fakeIndexedDB(stores, failPuts = new Set()) {
+    const later = fn => setTimeout(fn, 0);
+    const request = (run) => {
+        const req = {};
+        later(() => {
+            try {
+                req.result = run();
+                req.onsuccess && req.onsuccess();
+            } catch (error) {
+                req.error = error;
+                req.onerror && req.onerror();
+            }
+        });
+        return req;
+    };
+    const db = {
+        objectStoreNames: { contains: name => stores.has(name) },
+        createObjectStore: name => stores.set(name, new Map()),
+        transaction(names) {
+            const tx = { error: null };
+            let pending = 0;
+            const settle = () => later(() => {
+                if (pending) return;
+                if (tx.error) tx.onabort && tx.onabort();
+                else tx.oncomplete && tx.oncomplete();
+            });
+            const track = run => {
+                pending++;
+                return request(() => {
+                    try {
+                        return run();
+                    } catch (error) {
+                        tx.error = error;
+                        throw error;
+                    } finally {
+                        pending--;
+                        settle();
+                    }
+                });
+            };
+            tx.objectStore = name => {
+                const store = stores.get(name);
+                return {
+                    getAll: () => track(() => Array.from(store.values())),
+                    get: id => track(() => store.get(id)),
+                    put: value => track(() => {
+                        if (failPuts.has(value.id)) throw new Error(`QuotaExceededError: ${value.id}`);
+                        store.set(value.id, value);
+                    }),
+                    delete: id => track(() => store.delete(id)),
+                    clear: () => track(() => store.clear()),
+                };
+            };
+            return tx;
+        },
+    };
+    return {
+        open() {
+            const req = {};
+            later(() => {
+                req.result = db;
+                if (!stores.size) req.onupgradeneeded && req.onupgradeneeded();
+                req.onsuccess && req.onsuccess();
+            });
+            return req;
+        },
+    };
+}
+
+function fakeLocalStorage(items) {
+    const map = new Map(Object.entries(items));
+    return {
+        getItem: key => (map.has(key) ? map.get(key) : null),
+        setItem: (key, value) => map.set(key, String(value)),
+        removeItem: key => map.delete(key),
+    };
+}
+
+function legacyChat(id, timestamp) {
+    return { id, question: `Soru ${id}`, html: `<p>Ders ${id}</p>`, timestamp, date: '01.01' };
+}
+
+async function loadStore(indexedDB, localStorage) {
+    globalThis.window = globalThis;
+    globalThis.indexedDB = indexedDB;
+    globalThis.localStorage = localStorage;
+    runInThisContext(SOURCE);
+    await window.OgrenixChatStore.ready;
+    return window.OgrenixChatStore;
+}
+
+test('a failing migration keeps stored history and the unmigrated legacy chats', async () => {
+    const stores = new Map([['chatMeta', new Map()], ['chatBodies', new Map()]]);
+    // Saved in IndexedDB by an earlier page load
+    stores.get('chatMeta').set('stored', { id: 'stored', question: 'Eski', timestamp: 1, date: '01.01', size: 9 });
+    stores.get('chatBodies').set('stored', { id: 'stored', encoding: 'none', data: '<p>Eski</p>' });
+    const legacy = { a: legacyChat('a', 2), b: legacyChat('b', 3) };
+    const localStorage = fakeLocalStorage({ chats: JSON.stringify(legacy) });
+    const consoleError = console.error;
+    console.error = () => {};
+    let store;
+    try {
+        store = await loadStore(fakeIndexedDB(stores, new Set(['b'])), localStorage);
+    } finally {
+        console.error = consoleError;
+    }
+
+    assert.equal(store.error?.stage, 'migrate');
+    assert.deepEqual(store.list().map(chat => chat.id).sort(), ['a', 'b', 'stored']);
+    assert.equal(await store.loadHtml('stored'), '<p>Eski</p>');
+    assert.equal(await store.loadHtml('b'), '<p>Ders b</p>');
+    // Retried on the next load
+    assert.notEqual(localStorage.getItem('chats'), null);
+});
+
+test('a successful migration moves legacy chats and drops the old key', async () => {
+    const stores = new Map();
+    const localStorage = fakeLocalStorage({ chats: JSON.stringify({ a: legacyChat('a', 2) }) });
+    const store = await loadStore(fakeIndexedDB(stores), localStorage);
+
+    assert.equal(store.error, null);
+    assert.equal(localStorage.getItem('chats'), null);
+    assert.equal(stores.get('chatMeta').get('a').question, 'Soru a');
+    assert.equal(await store.loadHtml('a'), '<p>Ders a</p>');
+});
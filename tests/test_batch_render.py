@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from batch_render import check_lesson_id, render_batch
+
+
+@pytest.mark.parametrize("lesson_id", ["../escape", "..", "a/b", "a\\b", "x..y", ""])
+def test_check_lesson_id_rejects_paths(lesson_id):
+    with pytest.raises(ValueError):
+        check_lesson_id(lesson_id)
+
+
+def test_check_lesson_id_accepts_plain_ids():
+    check_lesson_id("ders_1")
+    check_lesson_id("Işık ve Renk.v2")
+
+
+def test_render_batch_does_not_write_outside_out_dir(tmp_path):
+    source = tmp_path / "lessons.jsonl"
+    lessons = [{"id": "../escape", "markdown": "# Kaçış"}, {"id": "ders", "markdown": "# Ders"}]
+    source.write_text("\n".join(json.dumps(lesson) for lesson in lessons), encoding="utf-8")
+    out_dir = tmp_path / "out"
+
+    timings, failures = render_batch(str(source), str(out_dir), workers=1, chart_cache_dir=None)
+
+    assert not (tmp_path / "escape.html").exists()
+    assert [lesson_id for lesson_id, _ in failures] == ["../escape"]
+    assert [lesson_id for lesson_id, _ in timings] == ["ders"]
+    assert (out_dir / "ders.html").exists()
@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("OGRENIX_CACHE_DB", os.path.join(tempfile.mkdtemp(), "test_cache.sqlite3"))
+
+import app as app_module
+from agentic_logger import agentic_logger
+
+
+def read_frames(response, count):
+    """The first `count` SSE frames of a streaming response"""
+    frames = []
+    buffer = ""
+    for data in response.response:
+        buffer += data.decode("utf-8")
+        while "\n\n" in buffer:
+            frame, buffer = buffer.split("\n\n", 1)
+            frames.append(frame)
+            if len(frames) == count:
+                return frames
+    return frames
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, "LOG_STREAM_KEEPALIVE_S", 0.1)
+    return app_module.app.test_client()
+
+
+def test_cursor_from_before_a_restart_starts_over(client):
+    agentic_logger.log_error("Test", "yeniden başlatma")
+    last_seq = agentic_logger.last_seq
+    # The viewer saw many more entries from the server's previous run
+    response = client.get("/logs/stream", headers={"Last-Event-ID": str(last_seq + 500)}, buffered=False)
+    frames = read_frames(response, 2)
+    response.close()
+
+    assert frames[0] == "event: clear\ndata: {}"
+    first_id, data = frames[1].split("\n", 1)
+    assert first_id.startswith("id: ")
+    assert int(first_id[len("id: "):]) <= last_seq
+    assert json.loads(data[len("data: "):])["seq"] <= last_seq
+
+
+def test_current_cursor_follows_new_entries(client):
+    last_seq = agentic_logger.last_seq
+    agentic_logger.log_error("Test", "yeni kayıt")
+    response = client.get("/logs/stream", headers={"Last-Event-ID": str(last_seq)}, buffered=False)
+    frames = read_frames(response, 1)
+    response.close()
+
+    assert frames[0].startswith(f"id: {last_seq + 1}\n")
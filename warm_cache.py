@@ -0,0 +1,177 @@
+"""Pre-generate lessons into the response cache during off-peak hours.
+
+Usage:
+    python3 warm_cache.py --topics topics.txt --token-budget 200000
+    python3 warm_cache.py --from-log 50 --days 3 --concurrency 2 --until 06:00
+
+Topics come from a file (one question per line) and/or the most frequent
+questions in the request log. Entries that are already fresh in the cache are
+skipped; generation stops once the token budget is spent or the --until time
+is reached. With a budget, each lesson reserves its prompt plus
+--lesson-tokens before it starts (and is capped at that many output tokens),
+so parallel workers cannot overspend; the reservation is then settled with
+the usage the API reports.
+"""
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from prompts import build_answer_messages, messages_length
+from response_cache import normalize_question, response_cache
+
+
+def load_topics(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def _parse_until(value):
+    """Turn HH:MM into the next matching timestamp"""
+    if not value:
+        return None
+    now = datetime.now()
+    target = datetime.strptime(value, "%H:%M").replace(year=now.year, month=now.month, day=now.day)
+    if target <= now:
+        target += timedelta(days=1)
+    return target.timestamp()
+
+
+class TokenBudget:
+    """Thread-safe token allowance shared by warming workers"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.spent = 0
+        self.reserved = 0
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens):
+        """Set aside a lesson's worst-case cost; False if it no longer fits"""
+        with self.lock:
+            if self.limit is not None and self.spent + self.reserved + tokens > self.limit:
+                return False
+            self.reserved += tokens
+            return True
+
+    def settle(self, reserved, tokens):
+        """Replace a reservation with the tokens actually spent"""
+        with self.lock:
+            self.reserved -= reserved
+            self.spent += tokens
+
+
+class LessonTruncated(Exception):
+    """The lesson hit the per-lesson token cap; it is not cached"""
+
+
+def warm(topics, llm, clean_markdown_response, concurrency=2, token_budget=None, max_age=None, until=None,
+         lesson_tokens=8000):
+    """Generate missing or stale lessons for the given topics.
+
+    Returns a dict with generated/skipped/failed/truncated counts and tokens spent.
+    """
+    budget = TokenBudget(token_budget)
+    stats = {"generated": 0, "skipped": 0, "failed": 0, "not_started": 0, "truncated": 0}
+
+    pending = []
+    seen = set()
+    for topic in topics:
+        key = normalize_question(topic)
+        if key in seen:
+            continue
+        seen.add(key)
+        if response_cache.is_fresh(topic, max_age):
+            stats["skipped"] += 1
+            print(f"[ATLANDI] {topic} (önbellekte güncel)")
+        else:
+            pending.append(topic)
+
+    def generate_one(topic):
+        # Re-check limits when the worker actually starts, not when queued
+        messages = build_answer_messages(topic)
+        prompt_tokens = messages_length(messages) // 4
+        reserved = prompt_tokens + lesson_tokens
+        if (until and time.time() >= until) or not budget.reserve(reserved):
+            return topic, None, 0.0
+        start_time = time.time()
+        usage = {}
+        response = ""
+        try:
+            response = llm(messages, max_tokens=lesson_tokens, capped=token_budget is not None,
+                           on_usage=usage.update)
+        finally:
+            # Rough estimates where the API reported no usage (or failed)
+            tokens = (usage.get("prompt_tokens") or prompt_tokens) + \
+                (usage.get("completion_tokens") or len(response) // 4)
+            budget.settle(reserved, tokens)
+        if usage.get("finish_reason") == "length":
+            raise LessonTruncated(f"{lesson_tokens} token sınırında kesildi")
+        md_content = clean_markdown_response(response)
+        response_cache.put(topic, md_content, tokens)
+        return topic, tokens, time.time() - start_time
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(generate_one, topic): topic for topic in pending}
+        for future in as_completed(futures):
+            topic = futures[future]
+            try:
+                _, tokens, elapsed = future.result()
+            except LessonTruncated as e:
+                stats["truncated"] += 1
+                print(f"[KESİLDİ] {topic}: {e}", file=sys.stderr)
+                continue
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"[HATA] {topic}: {e}", file=sys.stderr)
+                continue
+            if tokens is None:
+                stats["not_started"] += 1
+                continue
+            stats["generated"] += 1
+            print(f"[ÜRETİLDİ] {topic} ({tokens} token, {elapsed:.1f} sn)")
+
+    stats["tokens"] = budget.spent
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm the lesson response cache")
+    parser.add_argument("--topics", help="File with one topic/question per line")
+    parser.add_argument("--from-log", type=int, default=0, metavar="N",
+                        help="Also warm the N most frequent questions from the request log")
+    parser.add_argument("--days", type=float, default=7, help="Request log window in days (default: 7)")
+    parser.add_argument("--concurrency", type=int, default=2, help="Parallel generations (default: 2)")
+    parser.add_argument("--token-budget", type=int, default=None, help="Stop after spending this many tokens")
+    parser.add_argument("--lesson-tokens", type=int, default=8000,
+                        help="Output tokens reserved for (and allowed to) each lesson under a budget (default: 8000)")
+    parser.add_argument("--max-age", type=float, default=None,
+                        help="Entries younger than this many hours count as fresh (default: cache setting)")
+    parser.add_argument("--until", help="Do not start new generations after this time (HH:MM)")
+    parser.add_argument("--backend", choices=["cloud", "local"], default="cloud", help="LLM router mode (default: cloud)")
+    args = parser.parse_args(argv)
+
+    topics = load_topics(args.topics) if args.topics else []
+    if args.from_log:
+        since = time.time() - args.days * 24 * 3600
+        topics += [question for question, _ in response_cache.top_questions(args.from_log, since)]
+    if not topics:
+        parser.error("no topics: use --topics and/or --from-log")
+
+    import app as app_module
+
+    app_module.configure_router(args.backend)
+    max_age = args.max_age * 3600 if args.max_age is not None else None
+
+    stats = warm(topics, app_module.llm, app_module.clean_markdown_response, args.concurrency,
+                 args.token_budget, max_age, _parse_until(args.until), args.lesson_tokens)
+    print(f"\n{stats['generated']} üretildi, {stats['skipped']} atlandı, {stats['failed']} hata, "
+          f"{stats['truncated']} kesildi, "
+          f"{stats['not_started']} başlatılmadı (bütçe/süre), {stats['tokens']} token harcandı")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())